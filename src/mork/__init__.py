@@ -1,8 +1,9 @@
 # -*- coding=utf-8 -*-
 
 from __future__ import absolute_import, unicode_literals
+from .fleet import Fleet
 from .virtualenv import VirtualEnv
 
 __version__ = '0.1.5.dev0'
 
-__all__ = ["VirtualEnv"]
+__all__ = ["Fleet", "VirtualEnv"]
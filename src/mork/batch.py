@@ -0,0 +1,187 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import io
+import json
+import os
+import sys
+
+import vistir
+
+from .fleet import OPERATIONS, execute_operation
+
+
+#: Job keys which select what to run, rather than being passed to the operation
+JOB_KEYS = ("id", "operation", "venv", "venvs")
+
+
+def _load_toml(text):
+    try:
+        import tomllib
+        return tomllib.loads(text)
+    except ImportError:
+        pass
+    try:
+        import toml
+    except ImportError:
+        raise ImportError(
+            "Reading TOML job files requires python 3.11 or the toml package, install "
+            "mork[toml]"
+        )
+    return toml.loads(text)
+
+
+class Job(object):
+    """A single operation to run against one or more environments.
+
+    :param str operation: The name of the operation, see :data:`~mork.fleet.OPERATIONS`
+    :param list venvs: The prefixes of the environments to run against
+    :param dict kwargs: The arguments of the operation
+    :param str id: The identifier reported with every result of the job
+    """
+
+    def __init__(self, operation, venvs, kwargs=None, id=None):
+        if operation not in OPERATIONS:
+            raise ValueError("Unknown operation: {0!r}".format(operation))
+        if not venvs:
+            raise ValueError("No environments given for job {0!r}".format(id))
+        self.operation = operation
+        self.venvs = [vistir.compat.Path(venv).as_posix() for venv in venvs]
+        self.kwargs = kwargs or {}
+        self.id = id
+
+    def __repr__(self):
+        return "<Job {0!r} operation={1!r} venvs={2}>".format(
+            self.id, self.operation, len(self.venvs)
+        )
+
+    @classmethod
+    def from_dict(cls, data, default_venvs=None, id=None):
+        if not isinstance(data, dict):
+            raise ValueError("Job {0!r} must be a table, not {1!r}".format(id, data))
+        if "operation" not in data:
+            raise ValueError("Job {0!r} has no operation".format(data.get("id", id)))
+        venvs = data.get("venvs")
+        if venvs is None:
+            venvs = [data["venv"]] if "venv" in data else default_venvs
+        kwargs = dict((k, v) for k, v in data.items() if k not in JOB_KEYS)
+        return cls(data["operation"], venvs, kwargs=kwargs, id=data.get("id", id))
+
+
+class Batch(object):
+    """A list of jobs executed in order in the calling process.
+
+    Environments are loaded once and reused by every job which targets them, so the
+    import of mork, the introspection of each environment and the pooled index
+    sessions are all paid for once per batch.
+
+    A job file is JSON or TOML holding a list of ``jobs``, each with an ``operation``,
+    the ``venv`` or ``venvs`` to run against (defaulting to the top-level ``venvs``) and
+    the arguments of the operation::
+
+        venvs = ["/envs/api", "/envs/worker"]
+
+        [[jobs]]
+        operation = "install"
+        requirement = "requests>=2.20"
+
+        [[jobs]]
+        operation = "run"
+        venv = "/envs/api"
+        command = ["python", "-m", "api.migrate"]
+
+    :param list jobs: The :class:`Job` instances to run
+    :param bool fail_fast: Whether to stop at the first failed job
+    """
+
+    def __init__(self, jobs, fail_fast=False):
+        self.jobs = jobs
+        self.fail_fast = fail_fast
+        #: Loaded environments by prefix, shared by every job
+        self.venvs = {}
+
+    def __repr__(self):
+        return "<Batch jobs={0}>".format(len(self.jobs))
+
+    @classmethod
+    def from_data(cls, data, **kwargs):
+        """Build a batch from the parsed contents of a job file.
+
+        :param data: A mapping with ``jobs`` and optional default ``venvs``, or a list
+            of jobs
+        :rtype: :class:`~mork.batch.Batch`
+        :raises ValueError: If a job is invalid
+        """
+
+        if isinstance(data, list):
+            data = {"jobs": data}
+        elif not isinstance(data, dict):
+            raise ValueError("A job file must hold a table or a list of jobs")
+        default_venvs = data.get("venvs")
+        jobs = [
+            Job.from_dict(job, default_venvs=default_venvs, id=str(index))
+            for index, job in enumerate(data.get("jobs", []))
+        ]
+        return cls(jobs, **kwargs)
+
+    @classmethod
+    def load(cls, path, format=None, **kwargs):
+        """Load a batch from a JSON or TOML job file.
+
+        :param str path: The job file, or ``-`` to read JSON from standard input
+        :param str format: ``json`` or ``toml``, defaults to guessing from the extension
+        :rtype: :class:`~mork.batch.Batch`
+        """
+
+        if path == "-":
+            text = sys.stdin.read()
+        else:
+            with io.open(path, "r", encoding="utf-8") as fh:
+                text = fh.read()
+        if format is None:
+            format = "toml" if os.path.splitext(path)[1].lower() == ".toml" else "json"
+        if format == "toml":
+            data = _load_toml(text)
+        elif format == "json":
+            data = json.loads(text)
+        else:
+            raise ValueError("Unknown job file format: {0!r}".format(format))
+        return cls.from_data(data, **kwargs)
+
+    def close(self):
+        for venv in self.venvs.values():
+            venv.close()
+        self.venvs = {}
+
+    def __iter__(self):
+        """Run every job, yielding ``(job, result)`` pairs as each environment finishes."""
+        try:
+            for job in self.jobs:
+                failed = False
+                for prefix in job.venvs:
+                    result = execute_operation(
+                        prefix, job.operation, kwargs=job.kwargs, venvs=self.venvs
+                    )
+                    failed = failed or not result.ok
+                    yield job, result
+                if failed and self.fail_fast:
+                    return
+        finally:
+            self.close()
+
+    def write_json_lines(self, stream=None):
+        """Run the batch, writing each result as a line of JSON as soon as it is available.
+
+        :param stream: A text stream to write to, defaults to :data:`sys.stdout`
+        :return: Whether every job succeeded
+        :rtype: bool
+        """
+
+        stream = stream if stream is not None else sys.stdout
+        ok = True
+        for job, result in self:
+            ok = ok and result.ok
+            stream.write(json.dumps(dict(result.as_dict(), job=job.id), sort_keys=True) + "\n")
+            stream.flush()
+        return ok
@@ -0,0 +1,231 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import io
+import json
+import multiprocessing
+import os
+import subprocess
+import tempfile
+import time
+
+import vistir
+
+
+#: Runs before ``setup.py`` in the build interpreter.  It prefixes the compilers with
+#: the launcher, compiles the objects of each extension on a pool of threads limited to
+#: the number of jobs across every extension, and writes the effective compiler
+#: configuration and the time spent building each extension to the report file.
+BUILD_SHIM = """
+import atexit, json, os, sys, threading, time
+import setuptools, sysconfig
+from distutils import ccompiler
+from setuptools.command import build_ext as _build_ext_module
+_jobs = int(os.environ.get('MORK_BUILD_JOBS') or 1)
+_launcher = os.environ.get('MORK_COMPILER_LAUNCHER')
+_report = {'jobs': _jobs, 'compiler_launcher': _launcher, 'extensions': [], 'build_ext': None}
+if _launcher:
+    for _var in ('CC', 'CXX'):
+        _command = os.environ.get(_var) or sysconfig.get_config_var(_var)
+        if _command and not _command.startswith(_launcher + ' '):
+            os.environ[_var] = _launcher + ' ' + _command
+for _var in ('CC', 'CXX', 'LDSHARED', 'CFLAGS'):
+    _report[_var] = os.environ.get(_var) or sysconfig.get_config_var(_var)
+if _jobs > 1:
+    _slots = threading.BoundedSemaphore(_jobs)
+    def _parallel_compile(self, sources, output_dir=None, macros=None, include_dirs=None,
+                          debug=0, extra_preargs=None, extra_postargs=None, depends=None):
+        from multiprocessing.pool import ThreadPool
+        macros, objects, extra_postargs, pp_opts, build = self._setup_compile(
+            output_dir, macros, include_dirs, sources, depends, extra_postargs)
+        cc_args = self._get_cc_args(pp_opts, debug, extra_preargs)
+        def _compile_one(obj):
+            if obj not in build:
+                return
+            src, ext = build[obj]
+            with _slots:
+                self._compile(obj, src, ext, cc_args, extra_postargs, pp_opts)
+        pool = ThreadPool(min(_jobs, max(1, len(objects))))
+        try:
+            pool.map(_compile_one, objects)
+        finally:
+            pool.close()
+            pool.join()
+        return objects
+    ccompiler.CCompiler.compile = _parallel_compile
+_build_ext = _build_ext_module.build_ext
+_build_extension, _run = _build_ext.build_extension, _build_ext.run
+def _timed_build_extension(self, ext):
+    start = time.time()
+    try:
+        return _build_extension(self, ext)
+    finally:
+        _report['extensions'].append({'name': ext.name, 'duration': time.time() - start})
+def _timed_run(self):
+    start = time.time()
+    try:
+        return _run(self)
+    finally:
+        _report['build_ext'] = (_report['build_ext'] or 0) + time.time() - start
+_build_ext.build_extension, _build_ext.run = _timed_build_extension, _timed_run
+def _write_report():
+    if os.environ.get('MORK_BUILD_REPORT'):
+        with open(os.environ['MORK_BUILD_REPORT'], 'w') as fh:
+            json.dump(_report, fh)
+atexit.register(_write_report)
+"""
+
+
+def get_cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        pass
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+
+class BuildOptions(object):
+    """Options for compiling the native extensions of packages built from source.
+
+    :param int jobs: The number of compilers to run at once, ``0`` for one per CPU;
+        extensions are built in parallel with ``build_ext --parallel`` and the sources of
+        each extension are compiled in parallel as well
+    :param str compiler_launcher: A command to prefix the C and C++ compilers with, such
+        as ``ccache`` or ``sccache``
+    :param dict env: Additional environment variables for the build, e.g. ``CFLAGS`` or
+        ``CCACHE_DIR``
+    """
+
+    def __init__(self, jobs=1, compiler_launcher=None, env=None):
+        if jobs is None or int(jobs) < 0:
+            raise ValueError("Invalid number of build jobs: {0!r}".format(jobs))
+        self.jobs = int(jobs) or get_cpu_count()
+        self.compiler_launcher = compiler_launcher
+        self.env = env or {}
+
+    def __repr__(self):
+        return "<BuildOptions jobs={0} compiler_launcher={1!r}>".format(
+            self.jobs, self.compiler_launcher
+        )
+
+    def get_shim(self, setup_shim):
+        """Prefix the code which runs ``setup.py`` with :data:`BUILD_SHIM`."""
+        return BUILD_SHIM + setup_shim
+
+    def get_command_args(self):
+        """Get the commands to run ahead of the install or wheel command."""
+        if self.jobs > 1:
+            return ["build_ext", "--parallel={0}".format(self.jobs)]
+        return []
+
+    def get_environ(self, env, report_path=None):
+        """Update an environment for running a build with these options.
+
+        :param dict env: The environment to start from
+        :param str report_path: The file the build writes its report to
+        :rtype: dict
+        """
+
+        env = dict(env)
+        env.update((k, vistir.compat.fs_str(v)) for k, v in self.env.items())
+        env["MORK_BUILD_JOBS"] = vistir.compat.fs_str(str(self.jobs))
+        if self.compiler_launcher:
+            env["MORK_COMPILER_LAUNCHER"] = vistir.compat.fs_str(self.compiler_launcher)
+        else:
+            env.pop("MORK_COMPILER_LAUNCHER", None)
+        if report_path:
+            env["MORK_BUILD_REPORT"] = vistir.compat.fs_str(report_path)
+        return env
+
+    def as_dict(self):
+        return {
+            "jobs": self.jobs,
+            "compiler_launcher": self.compiler_launcher,
+            "env": dict(self.env),
+        }
+
+
+class BuildRecord(object):
+    """The configuration and timings of building a single package from source."""
+
+    def __init__(self, name, command, returncode, duration, config=None,
+                 compile_duration=None, extensions=None, out="", err=""):
+        self.name = name
+        #: The setup command which was run, e.g. ``install`` or ``bdist_wheel``
+        self.command = command
+        self.returncode = returncode
+        #: Seconds the whole build took
+        self.duration = duration
+        #: The effective options and compiler settings, as seen by the build
+        self.config = config or {}
+        #: Seconds spent in ``build_ext``, or None if it never ran
+        self.compile_duration = compile_duration
+        #: ``(extension name, seconds)`` for each extension built
+        self.extensions = extensions or []
+        self.out = out
+        self.err = err
+
+    def __repr__(self):
+        return "<BuildRecord {0} {1} returncode={2} duration={3:.2f}>".format(
+            self.name, self.command, self.returncode, self.duration
+        )
+
+    @property
+    def ok(self):
+        return self.returncode == 0
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "command": self.command,
+            "returncode": self.returncode,
+            "duration": self.duration,
+            "config": self.config,
+            "compile_duration": self.compile_duration,
+            "extensions": [list(extension) for extension in self.extensions],
+        }
+
+
+def run_build(name, command, cmd, cwd, env, options):
+    """Run a ``setup.py`` command with build options and record how it went.
+
+    :param str name: The name of the package being built
+    :param str command: The setup command being run, for the record
+    :param list cmd: The full command line, whose code already includes the shim
+    :param str cwd: The directory of the unpacked package
+    :param dict env: The environment of the virtualenv
+    :param options: The build options
+    :type options: :class:`~mork.build.BuildOptions`
+    :rtype: :class:`~mork.build.BuildRecord`
+    """
+
+    fd, report_path = tempfile.mkstemp(prefix="mork-build-", suffix=".json")
+    os.close(fd)
+    try:
+        start = time.time()
+        proc = subprocess.Popen(
+            cmd, cwd=cwd, env=options.get_environ(env, report_path),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        out, err = proc.communicate()
+        duration = time.time() - start
+        try:
+            with io.open(report_path, "r", encoding="utf-8") as fh:
+                report = json.load(fh)
+        except ValueError:
+            report = {}
+    finally:
+        os.unlink(report_path)
+    extensions = [(ext["name"], ext["duration"]) for ext in report.pop("extensions", [])]
+    compile_duration = report.pop("build_ext", None)
+    config = options.as_dict()
+    config.update(report)
+    return BuildRecord(
+        name, command, proc.returncode, duration, config=config,
+        compile_duration=compile_duration, extensions=extensions,
+        out=vistir.misc.to_text(out), err=vistir.misc.to_text(err)
+    )
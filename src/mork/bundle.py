@@ -0,0 +1,397 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+import vistir
+
+
+#: The file inside a bundle directory describing its layout
+MANIFEST_NAME = "bundle.json"
+
+ARCHIVE_NAME = "site-packages.zip"
+
+OVERFLOW_NAME = "site-packages"
+
+#: Every archive member gets the same timestamp, which the compiled bytecode records as
+#: the modification time of its source so :mod:`zipimport` accepts it
+DATE_TIME = (2000, 1, 1, 0, 0, 0)
+
+#: Files which can't be imported from a zip archive and must stay on disk
+EXTENSION_SUFFIXES = (".so", ".pyd", ".dll", ".dylib")
+
+#: Non-python files which packages may contain without losing their place in the archive
+ZIP_SAFE_SUFFIXES = (".py", ".pyi", ".pyc", "py.typed")
+
+METADATA_SUFFIXES = (".dist-info", ".egg-info")
+
+#: Variables which would let the interpreter import from outside the layout being run
+ISOLATED_ENV_VARS = ("PYTHONPATH", "PYTHONHOME")
+
+#: Compiles the sources listed in a JSON file with the interpreter running it, writing
+#: legacy ``module.pyc`` files stamped with the archive timestamp
+COMPILE_SCRIPT = """
+import json, marshal, struct, sys, time
+try:
+    from importlib.util import MAGIC_NUMBER
+except ImportError:
+    import imp
+    MAGIC_NUMBER = imp.get_magic()
+with open(sys.argv[1]) as fh:
+    spec = json.load(fh)
+mtime = int(time.mktime(tuple(spec["date_time"]) + (0, 0, -1))) & 0xFFFFFFFF
+for source, target, filename in spec["files"]:
+    with open(source, "rb") as fh:
+        data = fh.read()
+    try:
+        code = compile(data, filename, "exec", dont_inherit=True, optimize=spec["optimize"])
+    except TypeError:
+        code = compile(data, filename, "exec", dont_inherit=True)
+    except SyntaxError:
+        continue
+    if sys.version_info >= (3, 7):
+        header = MAGIC_NUMBER + struct.pack("<III", 0, mtime, len(data) & 0xFFFFFFFF)
+    elif sys.version_info >= (3, 3):
+        header = MAGIC_NUMBER + struct.pack("<II", mtime, len(data) & 0xFFFFFFFF)
+    else:
+        header = MAGIC_NUMBER + struct.pack("<I", mtime)
+    with open(target, "wb") as fh:
+        fh.write(header + marshal.dumps(code))
+"""
+
+#: Times importing a set of modules in a fresh interpreter with a given ``sys.path`` prefix
+BENCHMARK_SCRIPT = """
+import json, sys, time
+spec = json.loads(sys.argv[1])
+start = time.time()
+sys.path[:0] = spec["path"]
+if spec["sitedir"]:
+    import site
+    site.addsitedir(spec["sitedir"])
+for name in spec["modules"]:
+    __import__(name)
+print(json.dumps(time.time() - start))
+"""
+
+
+def _run(cmd, env=None):
+    env = dict(os.environ if env is None else env)
+    for name in ISOLATED_ENV_VARS:
+        env.pop(name, None)
+    c = subprocess.Popen(
+        cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True
+    )
+    out, err = c.communicate()
+    return c.returncode, out, err
+
+
+def is_zip_safe(path):
+    """Whether a top-level entry of a library directory can be imported from a zip.
+
+    Modules and packages holding only python sources, and distribution metadata, are
+    zip safe.  Extension modules, ``.pth`` files and packages shipping data files which
+    they may open through ``__file__`` are not.
+
+    :param str path: A file or directory directly inside a library directory
+    :rtype: bool
+    """
+
+    name = os.path.basename(path)
+    if os.path.isfile(path):
+        return name.endswith(".py")
+    if not os.path.isdir(path):
+        return False
+    if name.endswith(METADATA_SUFFIXES):
+        return True
+    for root, dirs, files in os.walk(path):
+        dirs[:] = [d for d in dirs if d != "__pycache__"]
+        for filename in files:
+            if filename.endswith(EXTENSION_SUFFIXES) or not filename.endswith(ZIP_SAFE_SUFFIXES):
+                return False
+    return True
+
+
+class BundlePlan(object):
+    """The split of a library directory between the archive and the disk."""
+
+    def __init__(self, lib_dir):
+        self.lib_dir = lib_dir
+        #: Top-level entries which are written to the archive
+        self.zipped = []
+        #: Top-level entries which are copied next to the archive
+        self.on_disk = []
+
+    def __repr__(self):
+        return "<BundlePlan {0!r} zipped={1} on_disk={2}>".format(
+            self.lib_dir, len(self.zipped), len(self.on_disk)
+        )
+
+    @classmethod
+    def from_lib_dir(cls, lib_dir):
+        plan = cls(lib_dir)
+        for entry in sorted(os.listdir(lib_dir)):
+            if entry == "__pycache__":
+                continue
+            if is_zip_safe(os.path.join(lib_dir, entry)):
+                plan.zipped.append(entry)
+            else:
+                plan.on_disk.append(entry)
+        return plan
+
+    def iter_zipped_files(self):
+        """Yield the relative paths of every file to write to the archive."""
+        for entry in self.zipped:
+            path = os.path.join(self.lib_dir, entry)
+            if os.path.isfile(path):
+                yield entry
+                continue
+            for root, dirs, files in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+                for filename in sorted(files):
+                    if not filename.endswith((".pyc", ".pyo")):
+                        yield os.path.relpath(os.path.join(root, filename), self.lib_dir)
+
+
+class Bundle(object):
+    """An exported library directory: a precompiled zip archive plus whatever must stay
+    on disk.
+
+    The layout of a bundle directory is::
+
+        bundle.json          the manifest, mapping every top-level name to its location
+        site-packages.zip    modules, packages and metadata, with bytecode alongside
+        site-packages/       extension modules, data-carrying packages and .pth files
+
+    :param str path: The bundle directory
+    """
+
+    def __init__(self, path):
+        self.path = vistir.compat.Path(path)
+        self._manifest = None
+
+    def __repr__(self):
+        return "<Bundle {0!r}>".format(self.path.as_posix())
+
+    @property
+    def manifest(self):
+        if self._manifest is None:
+            with io.open(self.path.joinpath(MANIFEST_NAME).as_posix(), "r", encoding="utf-8") as fh:
+                self._manifest = json.load(fh)
+        return self._manifest
+
+    @property
+    def archive(self):
+        return self.path.joinpath(self.manifest["archive"]).as_posix()
+
+    @property
+    def overflow(self):
+        return self.path.joinpath(self.manifest["overflow"]).as_posix()
+
+    @property
+    def index(self):
+        """A mapping of every top-level importable name to ``zip`` or ``disk``."""
+        return self.manifest["index"]
+
+    def activate(self):
+        """Put the bundle on :data:`sys.path` of the running interpreter.
+
+        The archive goes first, so names it provides never cause a stat of the
+        directory on disk, which is added as a site directory so its ``.pth`` files are
+        processed.
+        """
+
+        import site
+        sys.path.insert(0, self.archive)
+        site.addsitedir(self.overflow)
+
+    @classmethod
+    def export(cls, lib_dir, target, python=None, optimize=0, env=None):
+        """Export a library directory as a bundle.
+
+        :param str lib_dir: The library directory to export, usually ``purelib``
+        :param str target: The bundle directory to create, which must not exist
+        :param str python: The interpreter to compile bytecode for, defaults to the
+            running interpreter
+        :param int optimize: The optimization level to compile bytecode with
+        :param dict env: The environment to run the interpreter with
+        :return: The new bundle
+        :rtype: :class:`~mork.bundle.Bundle`
+        :raises RuntimeError: If the bytecode can't be compiled
+        """
+
+        target = os.path.abspath(target)
+        if os.path.exists(target):
+            raise OSError("Bundle target already exists: {0}".format(target))
+        parent = os.path.dirname(target)
+        vistir.path.mkdir_p(parent)
+        build_dir = tempfile.mkdtemp(prefix="mork-bundle", dir=parent)
+        compile_dir = None
+        try:
+            plan = BundlePlan.from_lib_dir(lib_dir)
+            archive = os.path.join(build_dir, ARCHIVE_NAME)
+            final_archive = os.path.join(target, ARCHIVE_NAME)
+            files = list(plan.iter_zipped_files())
+            compile_dir = tempfile.mkdtemp(prefix="mork-bytecode", dir=parent)
+            compiled = cls._compile(
+                lib_dir, files, compile_dir, final_archive, python=python,
+                optimize=optimize, env=env
+            )
+            with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as zf:
+                for relpath in files:
+                    arcname = relpath.replace(os.sep, "/")
+                    with open(os.path.join(lib_dir, relpath), "rb") as fh:
+                        cls._write(zf, arcname, fh.read())
+                    if relpath in compiled:
+                        with open(compiled[relpath], "rb") as fh:
+                            cls._write(zf, arcname[:-len(".py")] + ".pyc", fh.read())
+            overflow = os.path.join(build_dir, OVERFLOW_NAME)
+            os.mkdir(overflow)
+            for entry in plan.on_disk:
+                source = os.path.join(lib_dir, entry)
+                if os.path.islink(source):
+                    os.symlink(os.readlink(source), os.path.join(overflow, entry))
+                elif os.path.isdir(source):
+                    shutil.copytree(source, os.path.join(overflow, entry), symlinks=True)
+                else:
+                    shutil.copy2(source, os.path.join(overflow, entry))
+            manifest = {
+                "archive": ARCHIVE_NAME,
+                "overflow": OVERFLOW_NAME,
+                "optimize": optimize,
+                "index": cls._get_index(plan),
+            }
+            with io.open(os.path.join(build_dir, MANIFEST_NAME), "w", encoding="utf-8") as fh:
+                fh.write(vistir.misc.to_text(json.dumps(manifest, indent=2, sort_keys=True)))
+            os.rename(build_dir, target)
+        finally:
+            for path in (build_dir, compile_dir):
+                if path is not None and os.path.exists(path):
+                    shutil.rmtree(path, ignore_errors=True)
+        return cls(target)
+
+    @staticmethod
+    def _write(zf, arcname, data):
+        info = zipfile.ZipInfo(arcname, date_time=DATE_TIME)
+        info.compress_type = zipfile.ZIP_STORED
+        info.external_attr = 0o644 << 16
+        zf.writestr(info, data)
+
+    @staticmethod
+    def _compile(lib_dir, files, compile_dir, archive, python=None, optimize=0, env=None):
+        compiled = {}
+        spec = {"date_time": list(DATE_TIME), "optimize": optimize, "files": []}
+        for index, relpath in enumerate(files):
+            if relpath.endswith(".py"):
+                compiled[relpath] = os.path.join(compile_dir, "{0}.pyc".format(index))
+                spec["files"].append([
+                    os.path.join(lib_dir, relpath), compiled[relpath],
+                    os.path.join(archive, relpath)
+                ])
+        spec_path = os.path.join(compile_dir, "spec.json")
+        with io.open(spec_path, "w", encoding="utf-8") as fh:
+            fh.write(vistir.misc.to_text(json.dumps(spec)))
+        returncode, _, err = _run([python or sys.executable, "-c", COMPILE_SCRIPT, spec_path], env=env)
+        if returncode != 0:
+            raise RuntimeError("Failed compiling bundle: {0}".format(err.strip()))
+        # Sources with syntax errors for the target interpreter are shipped uncompiled
+        return dict((k, v) for k, v in compiled.items() if os.path.exists(v))
+
+    @staticmethod
+    def _get_index(plan):
+        index = {}
+        for location, entries in (("disk", plan.on_disk), ("zip", plan.zipped)):
+            for entry in entries:
+                if entry.endswith((".pth", ".egg-link")) or entry.endswith(METADATA_SUFFIXES):
+                    continue
+                name = entry.split(".", 1)[0] if os.path.splitext(entry)[1] else entry
+                index.setdefault(name, location)
+        return index
+
+
+class BundleBenchmark(object):
+    """Import times, in microseconds, of an unpacked environment and its bundle."""
+
+    def __init__(self, modules, unpacked_us, bundled_us):
+        self.modules = modules
+        #: The time of every run importing from the library directory
+        self.unpacked_us = unpacked_us
+        #: The time of every run importing from the bundle
+        self.bundled_us = bundled_us
+
+    def __repr__(self):
+        return "<BundleBenchmark unpacked={0}us bundled={1}us>".format(
+            self.unpacked, self.bundled
+        )
+
+    @staticmethod
+    def _median(values):
+        values = sorted(values)
+        return values[len(values) // 2] if values else 0
+
+    @property
+    def unpacked(self):
+        return self._median(self.unpacked_us)
+
+    @property
+    def bundled(self):
+        return self._median(self.bundled_us)
+
+    @property
+    def speedup(self):
+        """The median unpacked time divided by the median bundled time."""
+        return float(self.unpacked) / self.bundled if self.bundled else 0.0
+
+    def as_dict(self):
+        return {
+            "modules": self.modules,
+            "unpacked_us": self.unpacked_us,
+            "bundled_us": self.bundled_us,
+            "speedup": self.speedup,
+        }
+
+
+def benchmark_bundle(bundle, lib_dir, modules, python=None, repeat=5, env=None):
+    """Compare importing a set of modules from a bundle and from the unpacked directory.
+
+    Each run uses a fresh interpreter started with ``-S`` and without ``PYTHONPATH`` or
+    ``PYTHONHOME``, so only the library directory or the bundle is searched beyond the
+    standard library.  Runs alternate between the two layouts to spread the effect of a
+    warming filesystem cache evenly.
+
+    :param bundle: The bundle exported from ``lib_dir``
+    :type bundle: :class:`~mork.bundle.Bundle`
+    :param str lib_dir: The unpacked library directory
+    :param list modules: The modules to import
+    :param str python: The interpreter to run, defaults to the running interpreter
+    :param int repeat: The number of runs of each layout
+    :param dict env: The environment to run the interpreter with
+    :rtype: :class:`~mork.bundle.BundleBenchmark`
+    :raises RuntimeError: If a module fails to import
+    """
+
+    layouts = (
+        ("unpacked", {"path": [], "sitedir": lib_dir}),
+        ("bundled", {"path": [bundle.archive], "sitedir": bundle.overflow}),
+    )
+    results = {"unpacked": [], "bundled": []}
+    for _ in range(repeat):
+        for name, spec in layouts:
+            spec = dict(spec, modules=list(modules))
+            returncode, out, err = _run(
+                [python or sys.executable, "-S", "-c", BENCHMARK_SCRIPT, json.dumps(spec)],
+                env=env
+            )
+            if returncode != 0:
+                raise RuntimeError("Failed benchmarking {0} imports: {1}".format(
+                    name, err.strip()
+                ))
+            results[name].append(int(json.loads(out.strip().splitlines()[-1]) * 1000000))
+    return BundleBenchmark(list(modules), results["unpacked"], results["bundled"])
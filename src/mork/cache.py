@@ -0,0 +1,194 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import functools
+import os
+import threading
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+
+CACHE_BACKENDS = ("poll", "inotify")
+
+
+def get_file_signature(path):
+    """Get a cheap signature of the state of a file or directory.
+
+    :param str path: The path to stat, following symlinks
+    :return: A tuple of the modification time, size, inode and device of the path, or
+        None if it doesn't exist
+    :rtype: tuple or None
+    """
+
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (getattr(st, "st_mtime_ns", st.st_mtime), st.st_size, st.st_ino, st.st_dev)
+
+
+class InotifyWatcher(object):
+    """A shared inotify instance which counts the events seen for each watched path.
+
+    Trackers using this watcher remember the counts when they are created, and only need
+    to stat their dependencies once a count has moved on, rather than on every access.
+    Since nothing is consumed, any number of trackers can watch the same path.
+    """
+
+    MASK_NAMES = (
+        "MODIFY", "ATTRIB", "CLOSE_WRITE", "CREATE", "DELETE", "MOVED_FROM", "MOVED_TO",
+        "DELETE_SELF", "MOVE_SELF",
+    )
+
+    def __init__(self):
+        self.inotify = inotify_simple.INotify()
+        self.mask = 0
+        for name in self.MASK_NAMES:
+            self.mask |= getattr(inotify_simple.flags, name)
+        self.watches = {}
+        self.paths = {}
+        self.generations = {}
+        self.lock = threading.Lock()
+
+    def watch(self, path):
+        with self.lock:
+            if path in self.paths:
+                return True
+            target = path if os.path.exists(path) else os.path.dirname(path)
+            try:
+                wd = self.inotify.add_watch(target, self.mask)
+            except OSError:
+                return False
+            self.watches.setdefault(wd, set()).add(path)
+            self.paths[path] = wd
+            return True
+
+    def get_generations(self, paths):
+        """Return the number of events seen so far for each of the supplied paths."""
+        with self.lock:
+            for event in self.inotify.read(timeout=0):
+                for path in self.watches.get(event.wd, ()):
+                    self.generations[path] = self.generations.get(path, 0) + 1
+            return tuple(self.generations.get(path, 0) for path in paths)
+
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def get_inotify_watcher():
+    """Get the process-wide inotify watcher, or None if inotify isn't available."""
+    global _watcher
+    if inotify_simple is None:
+        return None
+    with _watcher_lock:
+        if _watcher is None:
+            try:
+                _watcher = InotifyWatcher()
+            except OSError:
+                return None
+    return _watcher
+
+
+class DependencyTracker(object):
+    """Records the state of the files a cached value was computed from.
+
+    :param list paths: The files and directories the value depends on
+    :param str backend: ``poll`` to stat every dependency on each check, or ``inotify``
+        to only stat them after an inotify event; ``inotify`` falls back to polling if it
+        isn't available
+    """
+
+    def __init__(self, paths, backend="poll"):
+        self.paths = tuple(sorted(set(p for p in paths if p)))
+        self.watcher = None
+        self.generations = None
+        if backend == "inotify":
+            watcher = get_inotify_watcher()
+            if watcher is not None and all(watcher.watch(path) for path in self.paths):
+                self.watcher = watcher
+                self.generations = watcher.get_generations(self.paths)
+        self.signature = self.get_signature()
+
+    def __repr__(self):
+        return "<DependencyTracker paths={0!r}>".format(self.paths)
+
+    def get_signature(self):
+        return tuple(get_file_signature(path) for path in self.paths)
+
+    def changed(self):
+        """Whether any dependency changed since the tracker was created."""
+        if self.watcher is not None:
+            generations = self.watcher.get_generations(self.paths)
+            if generations == self.generations:
+                return False
+            if self.get_signature() != self.signature:
+                return True
+            # The events didn't change anything we look at, don't stat again until
+            # there are new ones
+            self.generations = generations
+            return False
+        return self.get_signature() != self.signature
+
+
+class tracked_property(object):
+    """A cached property which is recomputed when the files it depends on change.
+
+    The owning class must implement ``get_cache_tracker(name)``, returning a
+    :class:`DependencyTracker` for the named property or None to cache it permanently.
+    Deleting the attribute resets the property, and assigning to it stores a value
+    which is tracked as if it had been computed.
+    """
+
+    def __init__(self, func):
+        self.__doc__ = getattr(func, "__doc__")
+        self.func = func
+        self.name = func.__name__
+
+    @staticmethod
+    def get_cache(obj):
+        return obj.__dict__.setdefault("_tracked_properties", {})
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        cache = self.get_cache(obj)
+        entry = cache.get(self.name)
+        if entry is not None:
+            value, tracker = entry
+            if tracker is None or not tracker.changed():
+                return value
+        # Record the state of the dependencies before computing, so that changes made
+        # while computing the value are picked up on the next access
+        tracker = obj.get_cache_tracker(self.name)
+        value = self.func(obj)
+        cache[self.name] = (value, tracker)
+        return value
+
+    def __set__(self, obj, value):
+        self.get_cache(obj)[self.name] = (value, obj.get_cache_tracker(self.name))
+
+    def __delete__(self, obj):
+        self.get_cache(obj).pop(self.name, None)
+
+
+def invalidates(*names):
+    """Decorate a method which changes the environment, discarding the named
+    :class:`tracked_property` values of the instance once the method returns.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                cache = tracked_property.get_cache(self)
+                for name in names:
+                    cache.pop(name, None)
+        return wrapper
+    return decorator
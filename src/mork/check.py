@@ -0,0 +1,246 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import collections
+
+import pkg_resources
+
+from .utils import canonicalize_name, iter_metadata_dirs
+
+
+class InstalledRequirements(object):
+    """The name, version and declared requirements of an installed distribution."""
+
+    __slots__ = ("name", "version", "requirements")
+
+    def __init__(self, name, version, requirements):
+        self.name = name
+        self.version = version
+        self.requirements = requirements
+
+    def __repr__(self):
+        return "<InstalledRequirements {0}=={1}>".format(self.name, self.version)
+
+    @classmethod
+    def from_metadata_dir(cls, metadata_dir):
+        """Read the requirements of an installed distribution.
+
+        Only the headers of ``METADATA`` or ``PKG-INFO`` are parsed; legacy ``.egg-info``
+        entries are read from ``requires.txt``.
+
+        :param metadata_dir: The metadata entry of the distribution
+        :type metadata_dir: :class:`~mork.utils.MetadataDir`
+        :rtype: :class:`~mork.check.InstalledRequirements`
+        """
+
+        headers = read_headers(
+            metadata_dir.read_text("METADATA" if metadata_dir.kind == "dist-info" else "PKG-INFO")
+        )
+        name = headers.get("name", [metadata_dir.name])[0]
+        version = headers.get("version", [metadata_dir.version])[0]
+        if metadata_dir.kind == "dist-info":
+            lines = headers.get("requires-dist", [])
+        else:
+            lines = parse_requires_txt(metadata_dir.read_text("requires.txt"))
+        requirements = []
+        for line in lines:
+            try:
+                requirements.append(pkg_resources.Requirement.parse(line))
+            except ValueError:
+                continue
+        return cls(name, version, requirements)
+
+
+class RequirementProblem(object):
+    """A requirement of an installed distribution which the environment doesn't meet."""
+
+    __slots__ = ("dist", "version", "requirement", "installed_version", "extra")
+
+    def __init__(self, dist, version, requirement, installed_version=None, extra=None):
+        #: The name of the distribution declaring the requirement
+        self.dist = dist
+        #: The version of the distribution declaring the requirement
+        self.version = version
+        #: The unmet requirement
+        self.requirement = requirement
+        #: The installed version of the required distribution, or None if it is missing
+        self.installed_version = installed_version
+        #: The extra of the declaring distribution which pulled in the requirement
+        self.extra = extra
+
+    def __repr__(self):
+        return "<RequirementProblem {0!r}>".format(str(self))
+
+    def __str__(self):
+        requirement = "{0}{1}".format(self.requirement.project_name, self.requirement.specifier)
+        dist = "{0} {1}".format(self.dist, self.version)
+        if self.extra:
+            dist = "{0} [{1}]".format(dist, self.extra)
+        if self.installed_version is None:
+            return "{0} requires {1}, which is not installed.".format(dist, requirement)
+        return "{0} has requirement {1}, but you have {2} {3}.".format(
+            dist, requirement, self.requirement.project_name, self.installed_version
+        )
+
+    @property
+    def missing(self):
+        return self.installed_version is None
+
+    def as_dict(self):
+        return {
+            "dist": self.dist,
+            "version": self.version,
+            "requirement": str(self.requirement),
+            "installed_version": self.installed_version,
+            "extra": self.extra,
+        }
+
+
+class CheckResult(object):
+    """The outcome of checking the requirements of every distribution in an environment."""
+
+    def __init__(self, missing=None, conflicts=None, checked=0):
+        #: Requirements whose distribution isn't installed
+        self.missing = missing or []
+        #: Requirements whose distribution is installed at a version outside the specifier
+        self.conflicts = conflicts or []
+        #: The number of distributions which were checked
+        self.checked = checked
+
+    def __repr__(self):
+        return "<CheckResult checked={0} missing={1} conflicts={2}>".format(
+            self.checked, len(self.missing), len(self.conflicts)
+        )
+
+    @property
+    def ok(self):
+        return not (self.missing or self.conflicts)
+
+    @property
+    def problems(self):
+        return self.missing + self.conflicts
+
+    def as_dict(self):
+        return {
+            "checked": self.checked,
+            "missing": [problem.as_dict() for problem in self.missing],
+            "conflicts": [problem.as_dict() for problem in self.conflicts],
+        }
+
+
+def read_headers(text):
+    """Parse the RFC 822 style headers of a ``METADATA`` or ``PKG-INFO`` file.
+
+    Parsing stops at the first blank line, so the long description is never scanned.
+
+    :param str text: The contents of the file
+    :return: A mapping of lower cased header names to lists of values
+    :rtype: dict
+    """
+
+    headers = {}
+    for line in (text or "").splitlines():
+        if not line.strip():
+            break
+        if line[0] in " \t":
+            continue
+        name, sep, value = line.partition(":")
+        if sep:
+            headers.setdefault(name.strip().lower(), []).append(value.strip())
+    return headers
+
+
+def parse_requires_txt(text):
+    """Convert the sections of an ``.egg-info`` ``requires.txt`` into requirement lines.
+
+    :param str text: The contents of the file
+    :return: Requirement lines with the section's extra and marker folded into a marker
+    :rtype: list
+    """
+
+    lines = []
+    marker = None
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("[") and line.endswith("]"):
+            extra, _, condition = line[1:-1].partition(":")
+            markers = []
+            if condition.strip():
+                markers.append("({0})".format(condition.strip()))
+            if extra.strip():
+                markers.append('extra == "{0}"'.format(extra.strip()))
+            marker = " and ".join(markers) or None
+            continue
+        lines.append("{0}; {1}".format(line, marker) if marker else line)
+    return lines
+
+
+def check_paths(lib_dirs, environment):
+    """Check the requirements of every distribution installed on a set of library paths.
+
+    An index of installed names and versions is built in a single scan, after which the
+    ``Requires-Dist`` entries of every distribution are evaluated against it.  Extras
+    requested by a satisfied requirement are followed, so the requirements they add are
+    checked as well.  Every problem is collected rather than stopping at the first one.
+
+    :param list lib_dirs: The library directories of the environment
+    :param dict environment: The marker environment to evaluate requirement markers in
+    :return: The missing and conflicting requirements of the environment
+    :rtype: :class:`~mork.check.CheckResult`
+    """
+
+    index = {}
+    for metadata_dir in iter_metadata_dirs(lib_dirs):
+        if metadata_dir.key not in index:
+            index[metadata_dir.key] = InstalledRequirements.from_metadata_dir(metadata_dir)
+    result = CheckResult(checked=len(index))
+    queue = collections.deque((key, "") for key in sorted(index))
+    seen = set()
+    while queue:
+        key, extra = queue.popleft()
+        if (key, extra) in seen:
+            continue
+        seen.add((key, extra))
+        dist = index[key]
+        for requirement in dist.requirements:
+            if not applies(requirement, environment, extra):
+                continue
+            target_key = canonicalize_name(requirement.project_name)
+            target = index.get(target_key)
+            if target is None:
+                result.missing.append(RequirementProblem(
+                    dist.name, dist.version, requirement, extra=extra or None
+                ))
+                continue
+            try:
+                satisfied = requirement.specifier.contains(target.version, prereleases=True)
+            except ValueError:
+                # Versions which can't be parsed can't be compared either
+                satisfied = True
+            if not satisfied:
+                result.conflicts.append(RequirementProblem(
+                    dist.name, dist.version, requirement, installed_version=target.version,
+                    extra=extra or None
+                ))
+                continue
+            for requested in requirement.extras:
+                queue.append((target_key, canonicalize_name(requested)))
+    return result
+
+
+def applies(requirement, environment, extra=""):
+    """Whether a requirement applies to an environment when installed with an extra.
+
+    Requirements which apply without the extra are skipped when ``extra`` is given, as
+    they are already covered by the check of the distribution itself.
+    """
+
+    marker = requirement.marker
+    if marker is None:
+        return not extra
+    if not marker.evaluate(dict(environment, extra=extra)):
+        return False
+    return not extra or not marker.evaluate(dict(environment, extra=""))
@@ -0,0 +1,50 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import argparse
+import sys
+
+
+def get_parser():
+    from . import __version__
+    parser = argparse.ArgumentParser(
+        prog="mork", description="Install and manage packages across virtualenvs."
+    )
+    parser.add_argument("--version", action="version", version=__version__)
+    subparsers = parser.add_subparsers(dest="command")
+    batch = subparsers.add_parser(
+        "batch", help="Run a JSON or TOML job file in one process, streaming JSON lines"
+    )
+    batch.add_argument("jobfile", help="The job file to run, or - to read JSON from stdin")
+    batch.add_argument(
+        "--format", choices=("json", "toml"), default=None,
+        help="The format of the job file, guessed from its extension by default"
+    )
+    batch.add_argument(
+        "--fail-fast", action="store_true", help="Stop after the first failed job"
+    )
+    return parser
+
+
+def main(argv=None):
+    """The ``mork`` console script.
+
+    :param list argv: The command line arguments, defaults to :data:`sys.argv`
+    :return: The exit status, 0 if every job succeeded, 1 if any failed and 2 if the job
+        file is invalid
+    :rtype: int
+    """
+
+    parser = get_parser()
+    options = parser.parse_args(argv)
+    if options.command is None:
+        parser.print_help()
+        return 2
+    from .batch import Batch
+    try:
+        batch = Batch.load(options.jobfile, format=options.format, fail_fast=options.fail_fast)
+    except (IOError, OSError, ImportError, ValueError) as e:
+        print("mork: error: {0}".format(e), file=sys.stderr)
+        return 2
+    return 0 if batch.write_json_lines() else 1
@@ -0,0 +1,310 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import base64
+import binascii
+import errno
+import hashlib
+import os
+import stat
+import tempfile
+
+import vistir
+
+from .utils import iter_metadata_dirs
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+#: The ``FICLONE`` ioctl, which shares the blocks of one file with another on
+#: filesystems such as btrfs and xfs
+FICLONE = 0x40049409
+
+DEDUP_MODES = ("auto", "reflink", "hardlink")
+
+MARKER_XATTR = "user.mork.dedup"
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_record_digest(digest):
+    """Convert a hex encoded sha256 digest to the form used in ``RECORD`` files."""
+    return "sha256={0}".format(vistir.misc.to_text(
+        base64.urlsafe_b64encode(binascii.unhexlify(digest)).rstrip(b"=")
+    ))
+
+
+def reflink(source, target):
+    """Create ``target`` as a copy-on-write clone of ``source``.
+
+    :raises OSError: If the platform or filesystem doesn't support reflinks
+    """
+
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "Reflinks are not supported on this platform")
+    with open(source, "rb") as src:
+        fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            fcntl.ioctl(fd, FICLONE, src.fileno())
+        except (IOError, OSError):
+            os.close(fd)
+            os.unlink(target)
+            raise
+        os.close(fd)
+
+
+class DedupReport(object):
+    """The outcome of deduplicating the files of a set of environments."""
+
+    def __init__(self):
+        #: The number of recorded files which were considered
+        self.scanned = 0
+        #: The number of files replaced with links to the store
+        self.linked = 0
+        #: The number of files which already shared their data with the store
+        self.already_linked = 0
+        #: The number of bytes which are no longer stored more than once
+        self.reclaimed = 0
+        #: Pairs of ``(path, error message)`` for files which couldn't be replaced
+        self.errors = []
+
+    def __repr__(self):
+        return "<DedupReport scanned={0} linked={1} reclaimed={2}>".format(
+            self.scanned, self.linked, self.reclaimed
+        )
+
+    def as_dict(self):
+        return {
+            "scanned": self.scanned,
+            "linked": self.linked,
+            "already_linked": self.already_linked,
+            "reclaimed": self.reclaimed,
+            "errors": [list(error) for error in self.errors],
+        }
+
+
+class DedupStore(object):
+    """A content addressed store which identical installed files are linked to.
+
+    Files are deduplicated with reflinks where the filesystem supports them, so every
+    environment keeps an independent copy-on-write file, or otherwise with hardlinks.
+    Installers replace files rather than writing into them, so a later install or
+    uninstall in one environment never changes the files seen by the others; editing a
+    hardlinked file in place, however, changes it everywhere.
+
+    The store must be on the same filesystem as the environments.
+
+    :param str root: The store directory, defaults to ``$MORK_DEDUP_STORE`` or
+        ``$XDG_CACHE_HOME/mork/files``
+    :param str mode: ``reflink``, ``hardlink`` or ``auto`` to try reflinks first
+    """
+
+    def __init__(self, root=None, mode="auto"):
+        if mode not in DEDUP_MODES:
+            raise ValueError("Unknown dedup mode: {0!r}".format(mode))
+        if root is None:
+            root = self.get_default_root()
+        self.root = vistir.compat.Path(root)
+        self.mode = mode
+
+    def __repr__(self):
+        return "<DedupStore {0!r} mode={1}>".format(self.root.as_posix(), self.mode)
+
+    @classmethod
+    def get_default_root(cls):
+        cache_dir = os.environ.get("MORK_DEDUP_STORE")
+        if not cache_dir:
+            cache_dir = os.path.join(
+                os.environ.get("XDG_CACHE_HOME", "~/.cache"), "mork", "files"
+            )
+        return vistir.compat.Path(os.path.expandvars(cache_dir)).expanduser()
+
+    def get_path(self, digest, mode):
+        # Hardlinks share permissions, so files are only shared with identical modes
+        return os.path.join(
+            self.root.as_posix(), digest[:2], "{0}-{1:o}".format(digest, stat.S_IMODE(mode))
+        )
+
+    def add(self, path, digest, mode):
+        """Store a file, returning the path of the stored copy."""
+        store_path = self.get_path(digest, mode)
+        if os.path.exists(store_path):
+            return store_path
+        vistir.path.mkdir_p(os.path.dirname(store_path))
+        try:
+            self._clone(path, store_path)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        return store_path
+
+    def _clone(self, source, target):
+        if self.mode == "hardlink":
+            os.link(source, target)
+            return
+        try:
+            reflink(source, target)
+        except (IOError, OSError):
+            if self.mode == "reflink":
+                raise
+            self.mode = "hardlink"
+            os.link(source, target)
+
+    def replace(self, path, store_path):
+        """Atomically replace a file with a link or clone of a stored file."""
+        directory = os.path.dirname(path)
+        fd, tmp_path = tempfile.mkstemp(prefix=".mork-dedup", dir=directory)
+        os.close(fd)
+        os.unlink(tmp_path)
+        try:
+            self._clone(store_path, tmp_path)
+            if self.mode != "hardlink":
+                st = os.stat(store_path)
+                os.chmod(tmp_path, stat.S_IMODE(st.st_mode))
+                os.utime(tmp_path, (st.st_atime, st.st_mtime))
+            os.rename(tmp_path, path)
+        finally:
+            if os.path.lexists(tmp_path):
+                os.unlink(tmp_path)
+
+    def shares_data(self, st, store_path):
+        try:
+            store_st = os.stat(store_path)
+        except OSError:
+            return False
+        return (st.st_ino, st.st_dev) == (store_st.st_ino, store_st.st_dev)
+
+    def prune(self):
+        """Remove stored hardlinks which no environment refers to any more.
+
+        :return: The number of bytes freed
+        :rtype: int
+        """
+
+        freed = 0
+        for root, _, files in os.walk(self.root.as_posix()):
+            for filename in files:
+                path = os.path.join(root, filename)
+                st = os.lstat(path)
+                if st.st_nlink == 1:
+                    os.unlink(path)
+                    freed += st.st_size
+        return freed
+
+
+def iter_recorded_files(lib_dirs):
+    """Find the installed files which are recorded with a hash.
+
+    :param list lib_dirs: The library directories to scan
+    :return: ``(path, recorded hash, recorded size)`` tuples
+    :rtype: iterator(tuple)
+    """
+
+    for metadata_dir in iter_metadata_dirs(lib_dirs):
+        if metadata_dir.kind != "dist-info":
+            continue
+        for path, digest, size in metadata_dir.get_installed_files():
+            if digest and size:
+                yield path, digest, size
+
+
+def get_marker(st, digest):
+    return "{0}:{1}:{2}".format(digest, getattr(st, "st_mtime_ns", st.st_mtime), st.st_size)
+
+
+def read_marker(path):
+    try:
+        return vistir.misc.to_text(os.getxattr(path, MARKER_XATTR))
+    except (AttributeError, OSError):
+        return None
+
+
+def write_marker(path, digest):
+    """Tag a reflinked file with its content hash and modification time.
+
+    Reflinked files share their data without sharing an inode, so this is how later
+    runs recognise them; editing or replacing the file invalidates the tag.
+    """
+
+    try:
+        os.setxattr(path, MARKER_XATTR, vistir.misc.to_bytes(get_marker(os.stat(path), digest)))
+    except (AttributeError, OSError):
+        pass
+
+
+def deduplicate(lib_dirs, store=None, dry_run=False):
+    """Link identical installed files across a set of environments to a shared store.
+
+    Candidates are grouped by the hash and size recorded in each ``RECORD`` file, so
+    only files which have a recorded twin are read, and every candidate is hashed
+    again before it is replaced in case it was changed after installation.  The first
+    copy of each file stays in place and is added to the store.
+
+    :param list lib_dirs: The library directories of every environment
+    :param store: The store to link files to
+    :type store: :class:`~mork.dedup.DedupStore`
+    :param bool dry_run: Whether to only report what would be reclaimed
+    :return: A summary of the files linked and the space reclaimed
+    :rtype: :class:`~mork.dedup.DedupReport`
+    """
+
+    store = store if store is not None else DedupStore()
+    report = DedupReport()
+    groups = {}
+    for path, digest, size in iter_recorded_files(lib_dirs):
+        report.scanned += 1
+        groups.setdefault((digest, size), []).append(path)
+    stored = set()
+    for (recorded, size), paths in sorted(groups.items()):
+        if len(paths) < 2:
+            continue
+        seen_inodes = set()
+        for path in paths:
+            try:
+                st = os.lstat(path)
+                if not stat.S_ISREG(st.st_mode) or st.st_size != size:
+                    continue
+                if (st.st_ino, st.st_dev) in seen_inodes:
+                    report.already_linked += 1
+                    continue
+                seen_inodes.add((st.st_ino, st.st_dev))
+                marker = read_marker(path)
+                if marker and marker == get_marker(st, marker.split(":", 1)[0]):
+                    report.already_linked += 1
+                    continue
+                digest = hash_file(path)
+                if get_record_digest(digest) != recorded:
+                    # Changed since it was installed, so it can't be shared safely
+                    continue
+                store_path = store.get_path(digest, st.st_mode)
+                if store.shares_data(st, store_path):
+                    report.already_linked += 1
+                    continue
+                if store_path not in stored and not os.path.exists(store_path):
+                    stored.add(store_path)
+                    if not dry_run:
+                        store.add(path, digest, st.st_mode)
+                        if store.mode != "hardlink":
+                            write_marker(path, digest)
+                    continue
+                if not dry_run:
+                    store.replace(path, store_path)
+                    if store.mode != "hardlink":
+                        write_marker(path, digest)
+            except (IOError, OSError) as e:
+                report.errors.append((path, "{0}: {1}".format(e.__class__.__name__, e)))
+                continue
+            report.linked += 1
+            if st.st_nlink == 1:
+                report.reclaimed += st.st_size
+    return report
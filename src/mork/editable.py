@@ -0,0 +1,336 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import ast
+import base64
+import hashlib
+import io
+import json
+import os
+import re
+
+import distlib.scripts
+import six
+import vistir
+
+from six.moves import configparser
+
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        try:
+            import toml as tomllib
+        except ImportError:
+            tomllib = None
+
+
+SCRIPT_GROUPS = ("console_scripts", "gui_scripts")
+
+
+def normalize_dist_name(name):
+    return re.sub(r"[-_.]+", "_", name)
+
+
+def get_record_hash(data):
+    digest = hashlib.sha256(data).digest()
+    return "sha256={0}".format(
+        vistir.misc.to_text(base64.urlsafe_b64encode(digest).rstrip(b"="))
+    )
+
+
+class EditableProject(object):
+    """The static metadata of a project which is to be installed in editable mode.
+
+    Metadata is read from the ``[project]`` table of ``pyproject.toml`` or the
+    declarative ``setup.cfg`` configuration, without executing ``setup.py``.  Projects
+    whose ``setup.py`` passes any arguments to ``setup()`` are not read statically, as
+    those arguments may add to or override the declarative metadata.
+    """
+
+    def __init__(self, path, name, version, source_root=None, requires=None, extras=None,
+                 requires_python=None, summary=None, entry_points=None):
+        self.path = os.path.abspath(path)
+        self.name = name
+        self.version = version
+        self.source_root = source_root if source_root else self.path
+        self.requires = requires or []
+        self.extras = extras or {}
+        self.requires_python = requires_python
+        self.summary = summary
+        self.entry_points = entry_points or {}
+
+    def __repr__(self):
+        return "<EditableProject {0}=={1} ({2!r})>".format(self.name, self.version, self.path)
+
+    @property
+    def dist_info_name(self):
+        return "{0}-{1}.dist-info".format(
+            normalize_dist_name(self.name), self.version.replace("-", "_")
+        )
+
+    @classmethod
+    def from_path(cls, path):
+        """Read the metadata of a project without running its build backend.
+
+        :param str path: The root directory of the project
+        :return: The project, or None if its metadata can't be determined statically
+        :rtype: :class:`~mork.editable.EditableProject` or None
+        """
+
+        path = os.path.abspath(path)
+        if not cls._has_bare_setup_py(path):
+            return None
+        for reader in (cls._from_pyproject, cls._from_setup_cfg):
+            project = reader(path)
+            if project is not None:
+                return project
+        return None
+
+    @classmethod
+    def _has_bare_setup_py(cls, path):
+        """Whether ``setup.py`` is missing or only calls ``setup()`` without arguments."""
+        setup_py = os.path.join(path, "setup.py")
+        if not os.path.isfile(setup_py):
+            return True
+        with io.open(setup_py, "rb") as fh:
+            try:
+                tree = ast.parse(fh.read())
+            except (SyntaxError, ValueError):
+                return False
+        calls = [
+            node for node in ast.walk(tree)
+            if isinstance(node, ast.Call)
+            if getattr(node.func, "id", getattr(node.func, "attr", None)) == "setup"
+        ]
+        arguments = [
+            [node.args, node.keywords, getattr(node, "starargs", None),
+             getattr(node, "kwargs", None)]
+            for node in calls
+        ]
+        return bool(calls) and not any(any(args) for args in arguments)
+
+    @classmethod
+    def _find_source_root(cls, path, package_dir=None):
+        if package_dir:
+            return os.path.normpath(os.path.join(path, package_dir))
+        src = os.path.join(path, "src")
+        if os.path.isdir(src) and not os.path.exists(os.path.join(src, "__init__.py")):
+            return src
+        return path
+
+    @classmethod
+    def _from_pyproject(cls, path):
+        pyproject = os.path.join(path, "pyproject.toml")
+        if tomllib is None or not os.path.isfile(pyproject):
+            return None
+        with io.open(pyproject, "r", encoding="utf-8") as fh:
+            try:
+                data = tomllib.loads(fh.read())
+            except Exception:
+                return None
+        project = data.get("project", {})
+        if not project.get("name") or not project.get("version"):
+            return None
+        package_dir = data.get("tool", {}).get("setuptools", {}).get("package-dir", {})
+        entry_points = dict(
+            (group, dict(eps)) for group, eps in project.get("entry-points", {}).items()
+        )
+        if project.get("scripts"):
+            entry_points["console_scripts"] = dict(project["scripts"])
+        if project.get("gui-scripts"):
+            entry_points["gui_scripts"] = dict(project["gui-scripts"])
+        return cls(
+            path, project["name"], project["version"],
+            source_root=cls._find_source_root(path, package_dir.get("")),
+            requires=project.get("dependencies", []),
+            extras=project.get("optional-dependencies", {}),
+            requires_python=project.get("requires-python"),
+            summary=project.get("description"), entry_points=entry_points,
+        )
+
+    @classmethod
+    def _from_setup_cfg(cls, path):
+        setup_cfg = os.path.join(path, "setup.cfg")
+        if not os.path.isfile(setup_cfg):
+            return None
+        parser = configparser.RawConfigParser()
+        try:
+            parser.read(setup_cfg)
+        except configparser.Error:
+            return None
+
+        def get(section, option, default=None):
+            if parser.has_option(section, option):
+                return parser.get(section, option).strip()
+            return default
+
+        def get_list(section, option):
+            return [line.strip() for line in get(section, option, "").splitlines() if line.strip()]
+
+        package_dir = dict(
+            (key.strip(), value.strip())
+            for key, _, value in (
+                line.partition("=") for line in get_list("options", "package_dir")
+            )
+        )
+        source_root = cls._find_source_root(path, package_dir.get(""))
+        name = get("metadata", "name")
+        version = cls._resolve_version(path, source_root, get("metadata", "version"))
+        if not name or not version:
+            return None
+        extras = {}
+        if parser.has_section("options.extras_require"):
+            for extra in parser.options("options.extras_require"):
+                extras[extra] = get_list("options.extras_require", extra)
+        entry_points = {}
+        if parser.has_section("options.entry_points"):
+            for group in parser.options("options.entry_points"):
+                entry_points[group] = dict(
+                    (key.strip(), value.strip()) for key, _, value in (
+                        line.partition("=")
+                        for line in get_list("options.entry_points", group)
+                    )
+                )
+        return cls(
+            path, name, version, source_root=source_root,
+            requires=get_list("options", "install_requires"), extras=extras,
+            requires_python=get("options", "python_requires"),
+            summary=get("metadata", "description"), entry_points=entry_points,
+        )
+
+    @classmethod
+    def _resolve_version(cls, path, source_root, version):
+        if not version:
+            return None
+        if version.startswith("file:"):
+            version_file = os.path.join(path, version[len("file:"):].strip())
+            try:
+                with io.open(version_file, "r", encoding="utf-8") as fh:
+                    return fh.read().strip()
+            except (IOError, OSError):
+                return None
+        if version.startswith("attr:"):
+            return cls._read_attr(source_root, version[len("attr:"):].strip())
+        return version
+
+    @classmethod
+    def _read_attr(cls, source_root, dotted_name):
+        module_name, _, attr = dotted_name.rpartition(".")
+        module_path = os.path.join(source_root, *module_name.split("."))
+        for candidate in (os.path.join(module_path, "__init__.py"), module_path + ".py"):
+            if os.path.isfile(candidate):
+                break
+        else:
+            return None
+        with io.open(candidate, "r", encoding="utf-8") as fh:
+            try:
+                tree = ast.parse(fh.read())
+            except SyntaxError:
+                return None
+        for node in tree.body:
+            if not isinstance(node, ast.Assign):
+                continue
+            for target in node.targets:
+                if isinstance(target, ast.Name) and target.id == attr:
+                    try:
+                        return six.text_type(ast.literal_eval(node.value))
+                    except ValueError:
+                        return None
+        return None
+
+    def get_metadata(self):
+        lines = [
+            "Metadata-Version: 2.1",
+            "Name: {0}".format(self.name),
+            "Version: {0}".format(self.version),
+        ]
+        if self.summary:
+            lines.append("Summary: {0}".format(self.summary))
+        if self.requires_python:
+            lines.append("Requires-Python: {0}".format(self.requires_python))
+        for requirement in self.requires:
+            lines.append("Requires-Dist: {0}".format(requirement))
+        for extra in sorted(self.extras):
+            lines.append("Provides-Extra: {0}".format(extra))
+            for requirement in self.extras[extra]:
+                requirement, _, marker = requirement.partition(";")
+                marker = "({0}) and ".format(marker.strip()) if marker.strip() else ""
+                lines.append('Requires-Dist: {0}; {1}extra == "{2}"'.format(
+                    requirement.strip(), marker, extra
+                ))
+        return "\n".join(lines) + "\n"
+
+    def get_entry_points(self):
+        sections = []
+        for group in sorted(self.entry_points):
+            entries = self.entry_points[group]
+            sections.append("[{0}]".format(group))
+            sections.extend(
+                "{0} = {1}".format(name, entries[name]) for name in sorted(entries)
+            )
+            sections.append("")
+        return "\n".join(sections)
+
+
+def install_editable(project, paths, python):
+    """Install a project in editable mode by writing its files directly.
+
+    A ``.pth`` file pointing at the project's source root and a minimal ``.dist-info``
+    directory are written into ``purelib``, and console scripts are generated with
+    :class:`distlib.scripts.ScriptMaker`.
+
+    :param project: The project to install
+    :type project: :class:`~mork.editable.EditableProject`
+    :param dict paths: The installation paths of the target environment
+    :param str python: The interpreter which generated scripts should use
+    :return: The paths of every file which was written
+    :rtype: list
+    """
+
+    purelib = paths["purelib"]
+    dist_info = os.path.join(purelib, project.dist_info_name)
+    vistir.path.mkdir_p(dist_info)
+    records = []
+
+    def write(path, content):
+        data = vistir.misc.to_bytes(content)
+        with open(path, "wb") as fh:
+            fh.write(data)
+        records.append((path, get_record_hash(data), len(data)))
+
+    write(
+        os.path.join(purelib, "__editable__.{0}.pth".format(normalize_dist_name(project.name))),
+        "{0}\n".format(project.source_root)
+    )
+    write(os.path.join(dist_info, "METADATA"), project.get_metadata())
+    write(os.path.join(dist_info, "INSTALLER"), "mork\n")
+    write(os.path.join(dist_info, "direct_url.json"), json.dumps({
+        "url": vistir.path.path_to_url(project.path), "dir_info": {"editable": True}
+    }))
+    if project.entry_points:
+        write(os.path.join(dist_info, "entry_points.txt"), project.get_entry_points())
+    maker = distlib.scripts.ScriptMaker(None, paths["scripts"])
+    maker.executable = python
+    maker.variants = set([""])
+    for group in SCRIPT_GROUPS:
+        entries = project.entry_points.get(group, {})
+        specs = ["{0} = {1}".format(name, value) for name, value in sorted(entries.items())]
+        if specs:
+            for script in maker.make_multiple(specs, {"gui": group == "gui_scripts"}):
+                with open(script, "rb") as fh:
+                    data = fh.read()
+                records.append((script, get_record_hash(data), len(data)))
+    record_path = os.path.join(dist_info, "RECORD")
+    lines = [
+        "{0},{1},{2}".format(
+            os.path.relpath(path, purelib).replace(os.sep, "/"), digest, size
+        ) for path, digest, size in records
+    ]
+    lines.append("{0},,".format(os.path.relpath(record_path, purelib).replace(os.sep, "/")))
+    with open(record_path, "w") as fh:
+        fh.write("\n".join(lines) + "\n")
+    return [path for path, _, _ in records] + [record_path]
@@ -0,0 +1,144 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import os
+
+from .utils import canonicalize_name, iter_metadata_dirs, parse_entry_points
+
+
+SCRIPT_GROUPS = ("console_scripts", "gui_scripts")
+
+SCRIPT_SUFFIXES = (".exe", "-script.py", "-script.pyw", ".py", ".pyw")
+
+
+def normalize_script_name(filename):
+    """Strip the platform specific suffixes from the name of an installed script"""
+    name = os.path.basename(filename)
+    for suffix in SCRIPT_SUFFIXES:
+        if name.lower().endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+class EntryPoint(object):
+    """An entry point advertised by an installed distribution."""
+
+    __slots__ = ("group", "name", "value", "dist", "version")
+
+    def __init__(self, group, name, value, dist, version=None):
+        self.group = group
+        self.name = name
+        self.value = value
+        self.dist = dist
+        self.version = version
+
+    def __repr__(self):
+        return "<EntryPoint {0} = {1} [{2}] ({3})>".format(
+            self.name, self.value, self.group, self.dist
+        )
+
+    @property
+    def module(self):
+        return self.value.split(":", 1)[0].strip()
+
+    @property
+    def attr(self):
+        module, _, attr = self.value.partition(":")
+        return attr.split("[", 1)[0].strip() or None
+
+
+class EntryPointIndex(object):
+    """An index of the entry points and scripts installed in an environment.
+
+    The index is built from one pass over the metadata directories of the environment,
+    after which every lookup is a dictionary access.
+
+    >>> index = venv.entry_point_index
+    >>> index.get_group("pytest11")
+    {'xdist.plugin': <EntryPoint xdist.plugin = xdist.plugin [pytest11] (pytest-xdist)>}
+    >>> index.get_script_provider("pip3")
+    'pip'
+    """
+
+    def __init__(self):
+        #: Mapping of group names to mappings of entry point names to entry points
+        self.groups = {}
+        #: Mapping of canonical distribution names to their entry points
+        self.distributions = {}
+        #: Mapping of script names to the canonical name of the distribution providing them
+        self.scripts = {}
+
+    def __repr__(self):
+        return "<EntryPointIndex distributions={0} groups={1}>".format(
+            len(self.distributions), len(self.groups)
+        )
+
+    @classmethod
+    def from_paths(cls, lib_dirs, scripts_dir=None):
+        """Build an index from the distributions installed on a set of library paths.
+
+        :param list lib_dirs: The library directories to scan
+        :param str scripts_dir: The scripts directory of the environment, used to index
+            scripts which aren't generated from entry points
+        :return: The index of the installed entry points
+        :rtype: :class:`~mork.entrypoints.EntryPointIndex`
+        """
+
+        index = cls()
+        scripts_dir = os.path.normcase(os.path.abspath(scripts_dir)) if scripts_dir else None
+        seen = set()
+        for metadata_dir in iter_metadata_dirs(lib_dirs):
+            key = metadata_dir.key
+            if key in seen:
+                continue
+            seen.add(key)
+            entry_points = parse_entry_points(metadata_dir.read_text("entry_points.txt"))
+            dist_entry_points = index.distributions.setdefault(key, [])
+            for group, entries in entry_points.items():
+                for name, value in entries.items():
+                    entry_point = EntryPoint(group, name, value, key, metadata_dir.version)
+                    index.groups.setdefault(group, {}).setdefault(name, entry_point)
+                    dist_entry_points.append(entry_point)
+                    if group in SCRIPT_GROUPS:
+                        index.scripts.setdefault(name, key)
+            if scripts_dir is None:
+                continue
+            for path, _, _ in metadata_dir.get_installed_files():
+                if os.path.normcase(os.path.dirname(path)) == scripts_dir:
+                    index.scripts.setdefault(normalize_script_name(path), key)
+        return index
+
+    def get_group(self, group):
+        """Get every entry point in a group.
+
+        :param str group: The name of the group, e.g. ``console_scripts``
+        :return: A mapping of entry point names to entry points
+        :rtype: dict
+        """
+
+        return self.groups.get(group, {})
+
+    def get(self, group, name):
+        """Get a single entry point by group and name, or None if it isn't installed."""
+        return self.groups.get(group, {}).get(name)
+
+    def get_script_provider(self, filename):
+        """Find the distribution which installed a script.
+
+        :param str filename: The name or path of the script
+        :return: The canonical name of the providing distribution, or None
+        :rtype: str or None
+        """
+
+        return self.scripts.get(normalize_script_name(filename))
+
+    def get_distribution_entry_points(self, dist_name):
+        """Get the entry points advertised by a distribution.
+
+        :param str dist_name: The name of the distribution
+        :return: The entry points of the distribution
+        :rtype: list
+        """
+
+        return self.distributions.get(canonicalize_name(dist_name), [])
@@ -0,0 +1,96 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import hashlib
+import os
+import re
+
+import vistir
+
+from .metadata import PYVENV_CFG
+from .utils import METADATA_DIR_RE
+
+
+#: Bumped whenever the inputs of a fingerprint change, so old digests never match
+FINGERPRINT_VERSION = 1
+
+#: Entries of a library directory which change what is importable without any
+#: distribution metadata changing, e.g. editable installs
+PATH_ENTRY_RE = re.compile(r"^.+\.(?:pth|egg-link)$")
+
+
+def _stat_token(st):
+    mtime = getattr(st, "st_mtime_ns", None)
+    if mtime is None:
+        mtime = repr(st.st_mtime)
+    return "{0}:{1}".format(mtime, st.st_size)
+
+
+def _scan(path):
+    """List ``(name, stat token)`` for the entries of a directory with a single pass."""
+    scandir = getattr(os, "scandir", None)
+    if scandir is None:
+        names = os.listdir(path)
+        return [
+            (name, _stat_token(os.lstat(os.path.join(path, name))))
+            for name in names if METADATA_DIR_RE.match(name) or PATH_ENTRY_RE.match(name)
+        ]
+    entries = []
+    iterator = scandir(path)
+    try:
+        for entry in iterator:
+            if METADATA_DIR_RE.match(entry.name) or PATH_ENTRY_RE.match(entry.name):
+                entries.append((entry.name, _stat_token(entry.stat(follow_symlinks=False))))
+    finally:
+        # Only python 3.6+ can close the iterator early
+        getattr(iterator, "close", lambda: None)()
+    return entries
+
+
+def get_fingerprint(prefix, lib_dirs, python=None):
+    """Compute a digest which changes whenever an environment changes.
+
+    The digest covers the identity of the interpreter the environment runs, the
+    contents of its ``pyvenv.cfg`` and the name, modification time and size of every
+    ``.dist-info``, ``.egg-info``, ``.pth`` and ``.egg-link`` entry of its library
+    directories.  Each directory is listed once and no metadata is read, so this takes
+    milliseconds even for thousands of distributions.  Installers create or replace the
+    metadata directory of every distribution they install, so any install, upgrade or
+    uninstall changes the digest.
+
+    :param str prefix: The root of the environment
+    :param list lib_dirs: The library directories of the environment
+    :param str python: The interpreter of the environment
+    :return: A hex encoded sha256 digest
+    :rtype: str
+    """
+
+    digest = hashlib.sha256()
+
+    def update(*fields):
+        digest.update(vistir.misc.to_bytes("\0".join(fields) + "\n", encoding="utf-8"))
+
+    update("mork-fingerprint", str(FINGERPRINT_VERSION))
+    if python is not None:
+        interpreter = os.path.realpath(python)
+        try:
+            token = _stat_token(os.stat(interpreter))
+        except OSError:
+            token = "missing"
+        update("python", interpreter, token)
+    try:
+        with open(os.path.join(prefix, PYVENV_CFG), "rb") as fh:
+            digest.update(fh.read())
+    except (IOError, OSError):
+        update("no-config")
+    for lib_dir in lib_dirs:
+        try:
+            entries = _scan(lib_dir)
+        except OSError:
+            update("missing", lib_dir)
+            continue
+        update("lib", lib_dir)
+        for name, token in sorted(entries):
+            update(name, token)
+    return digest.hexdigest()
@@ -0,0 +1,375 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+import vistir
+
+from .metadata import PYVENV_CFG, EnvironmentMetadata
+
+
+CACHE_ENV_VARS = ("PIP_CACHE_DIR", "PACKAGEBUILDER_CACHE_DIR", "PASSA_CACHE_DIR", "PIPENV_CACHE_DIR")
+
+
+class FleetResult(object):
+    """The outcome of a single operation against a single environment."""
+
+    def __init__(self, prefix, operation, ok, result=None, error=None, duration=0.0):
+        self.prefix = prefix
+        self.operation = operation
+        self.ok = ok
+        self.result = result
+        self.error = error
+        self.duration = duration
+
+    def __repr__(self):
+        return "<FleetResult {0!r} operation={1!r} ok={2!r}>".format(
+            self.prefix, self.operation, self.ok
+        )
+
+    def as_dict(self):
+        return {
+            "prefix": self.prefix,
+            "operation": self.operation,
+            "ok": self.ok,
+            "result": self.result,
+            "error": self.error,
+            "duration": self.duration,
+        }
+
+
+class FleetReport(object):
+    """A streamable report of an operation running across a :class:`Fleet`.
+
+    Results are yielded in completion order as workers finish; every result that has
+    been yielded is also retained in :attr:`results` for merged reporting.  Leaving the
+    report early, by breaking out of the loop or the ``with`` block, waits for the
+    outstanding operations to finish so no environment is left half-modified; use
+    :meth:`cancel` to stop them instead.
+    """
+
+    def __init__(self, operation, results, pool=None):
+        self.operation = operation
+        self.results = []
+        self._iterator = results
+        self._pool = pool
+
+    def __iter__(self):
+        try:
+            for result in self._iterator:
+                self.results.append(result)
+                yield result
+        finally:
+            self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Wait for the outstanding operations to finish and shut down the workers."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def cancel(self):
+        """Kill the workers immediately, abandoning any operation in progress.
+
+        Environments being modified when this is called may be left half-modified.
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def wait(self):
+        """Consume any outstanding results and return all of them.
+
+        :return: All results of the operation
+        :rtype: list(:class:`~mork.fleet.FleetResult`)
+        """
+
+        for _ in self:
+            pass
+        return self.results
+
+    @property
+    def failed(self):
+        return [result for result in self.results if not result.ok]
+
+    def merged(self):
+        """Merge the results of every environment into a single mapping.
+
+        :return: A mapping of environment prefixes to their results
+        :rtype: dict
+        """
+
+        return {result.prefix: result.as_dict() for result in self.wait()}
+
+    def write_json_lines(self, stream=None):
+        """Write each result as a line of JSON as soon as it is available.
+
+        :param stream: A text stream to write to, defaults to :data:`sys.stdout`
+        """
+
+        stream = stream if stream is not None else sys.stdout
+        for result in self:
+            stream.write(json.dumps(result.as_dict(), sort_keys=True) + "\n")
+            stream.flush()
+
+
+def _initialize_worker(cache_dir):
+    for env_var in CACHE_ENV_VARS:
+        os.environ[env_var] = vistir.compat.fs_str(cache_dir)
+
+
+def _dist_info(dist):
+    return {"name": dist.project_name, "version": dist.version}
+
+
+def _install(venv, requirement, sources=None, build=None):
+    import requirementslib
+    from .build import BuildOptions
+    req = requirementslib.Requirement.from_line(requirement)
+    build_options = BuildOptions(**build) if build else None
+    recorded = len(venv.build_records)
+    returncode = venv.install(req, sources=sources or [], build_options=build_options)
+    result = {"requirement": requirement, "returncode": returncode}
+    if build_options is not None:
+        result["builds"] = [record.as_dict() for record in venv.build_records[recorded:]]
+    return returncode == 0, result
+
+
+def _uninstall(venv, package):
+    with venv.uninstall(package) as uninstaller:
+        paths = sorted(uninstaller.paths) if uninstaller else []
+    # Environments which don't have the package are skipped rather than failed
+    return True, {"package": package, "paths": paths, "skipped": uninstaller is None}
+
+
+def _run(venv, command, cwd=None):
+    c = venv.run(command, cwd=cwd or os.curdir)
+    return c.returncode == 0, {
+        "command": command, "returncode": c.returncode, "out": c.out, "err": c.err
+    }
+
+
+def _outdated(venv, offline=False):
+    from .index import IndexCache
+    return True, [
+        dict(_dist_info(dist), latest_version=str(dist.latest_version))
+        for dist in venv.get_outdated_packages(cache=IndexCache(), offline=offline)
+    ]
+
+
+def _installed(venv):
+    return True, sorted(
+        (_dist_info(dist) for dist in venv.get_distributions()),
+        key=lambda info: info["name"].lower()
+    )
+
+
+def _check(venv):
+    result = venv.check()
+    return result.ok, result.as_dict()
+
+
+def _fingerprint(venv):
+    return True, {"fingerprint": venv.fingerprint()}
+
+
+def _verify(venv):
+    c = venv.run_py(["import sys; print(sys.prefix)"])
+    ok = c.returncode == 0
+    return ok, {"python": venv.python, "version": venv.python_version, "returncode": c.returncode}
+
+
+OPERATIONS = {
+    "install": _install,
+    "uninstall": _uninstall,
+    "run": _run,
+    "outdated": _outdated,
+    "installed": _installed,
+    "verify": _verify,
+    "check": _check,
+    "fingerprint": _fingerprint,
+}
+
+
+def execute_operation(prefix, operation, args=(), kwargs=None, venvs=None):
+    """Run an operation against a single environment in the calling process.
+
+    :param str prefix: The prefix of the environment
+    :param str operation: The name of the operation, a key of :data:`OPERATIONS`
+    :param tuple args: Positional arguments of the operation
+    :param dict kwargs: Keyword arguments of the operation
+    :param dict venvs: Environments by prefix to reuse, and to add newly loaded ones to,
+        so their cached state is shared between operations
+    :return: The outcome of the operation, failing rather than raising on any error
+    :rtype: :class:`~mork.fleet.FleetResult`
+    """
+
+    from .virtualenv import VirtualEnv
+    start = time.time()
+    try:
+        venv = venvs.get(prefix) if venvs is not None else None
+        if venv is None:
+            venv = VirtualEnv(prefix)
+            if venvs is not None:
+                venvs[prefix] = venv
+        ok, result = OPERATIONS[operation](venv, *args, **(kwargs or {}))
+    except Exception as e:
+        return FleetResult(
+            prefix, operation, False, error="{0}: {1}\n{2}".format(
+                e.__class__.__name__, e, traceback.format_exc()
+            ), duration=time.time() - start
+        )
+    return FleetResult(prefix, operation, ok, result=result, duration=time.time() - start)
+
+
+def _run_operation(task):
+    prefix, operation, args, kwargs = task
+    return execute_operation(prefix, operation, args, kwargs)
+
+
+class Fleet(object):
+    """A collection of environments which operations can be run across in parallel.
+
+    Each operation is executed on a pool of worker processes, one environment per task,
+    and all workers share the same package and build caches.
+
+    >>> fleet = Fleet.from_workon_home()
+    >>> for result in fleet.install("requests"):
+            print(result.prefix, result.ok)
+    """
+
+    def __init__(self, environments, processes=None, cache_dir=None):
+        self.prefixes = []
+        for env in environments:
+            prefix = getattr(env, "prefix", env)
+            self.prefixes.append(vistir.compat.Path(prefix).as_posix())
+        self.processes = processes
+        if cache_dir is None:
+            cache_dir = next(iter(
+                os.environ[env_var] for env_var in CACHE_ENV_VARS if os.environ.get(env_var)
+            ), None)
+        if cache_dir is None:
+            cache_dir = vistir.path.create_tracked_tempdir(prefix="mork-fleet")
+        self.cache_dir = cache_dir
+
+    def __len__(self):
+        return len(self.prefixes)
+
+    def __iter__(self):
+        return iter(self.prefixes)
+
+    @classmethod
+    def from_workon_home(cls, workon_home=None, **kwargs):
+        """Build a fleet from every environment found in a workon home directory.
+
+        :param str workon_home: The directory to scan, defaults to
+            :meth:`~mork.virtualenv.VirtualEnv.get_workon_home`
+        :return: A fleet of the environments found
+        :rtype: :class:`~mork.fleet.Fleet`
+        """
+
+        from .virtualenv import VirtualEnv
+        if workon_home is None:
+            workon_home = VirtualEnv.get_workon_home()
+        workon_home = vistir.compat.Path(workon_home)
+        if not workon_home.is_dir():
+            return cls([], **kwargs)
+        environments = sorted(
+            path.as_posix() for path in workon_home.iterdir()
+            if path.joinpath(PYVENV_CFG).exists() or
+            path.joinpath("bin", "python").exists() or
+            path.joinpath("Scripts", "python.exe").exists()
+        )
+        return cls(environments, **kwargs)
+
+    def run(self, operation, *args, **kwargs):
+        """Run an operation across every environment in the fleet.
+
+        :param str operation: The name of an operation, a key of :data:`OPERATIONS`
+        :return: A report which yields results as they complete
+        :rtype: :class:`~mork.fleet.FleetReport`
+        """
+
+        if operation not in OPERATIONS:
+            raise ValueError("Unknown fleet operation: {0!r}".format(operation))
+        tasks = [(prefix, operation, args, kwargs) for prefix in self.prefixes]
+        if not tasks:
+            return FleetReport(operation, iter([]))
+        processes = min(self.processes or multiprocessing.cpu_count(), len(tasks))
+        pool = multiprocessing.Pool(
+            processes, initializer=_initialize_worker, initargs=(self.cache_dir,)
+        )
+        results = pool.imap_unordered(_run_operation, tasks)
+        return FleetReport(operation, results, pool=pool)
+
+    def install(self, line, sources=None, build=None):
+        """Install a requirement, given as a requirement line, into every environment.
+
+        :param dict build: Arguments of :class:`~mork.build.BuildOptions` for packages
+            built from source, whose build records are included in the results
+        """
+        return self.run("install", line, sources=sources, build=build)
+
+    def uninstall(self, package):
+        """Uninstall a package from every environment which has it installed.
+
+        Environments without the package succeed with ``skipped`` set in their result.
+        """
+        return self.run("uninstall", package)
+
+    def outdated(self, offline=False):
+        """Report outdated packages for every environment.
+
+        Index pages are shared between workers through the persistent
+        :class:`~mork.index.IndexCache`; pass ``offline=True`` to answer from it alone.
+        """
+        return self.run("outdated", offline=offline)
+
+    def installed(self):
+        """List the installed distributions of every environment."""
+        return self.run("installed")
+
+    def verify(self):
+        """Verify that the interpreter of every environment is usable."""
+        return self.run("verify")
+
+    def check(self):
+        """Check that the requirements of every installed distribution are met."""
+        return self.run("check")
+
+    def fingerprint(self):
+        """Compute a digest of the installed state of every environment."""
+        return self.run("fingerprint")
+
+    def dedup(self, store=None, dry_run=False):
+        """Link identical installed files across every environment to a shared store.
+
+        This runs in the calling process, since it has to compare files across all of
+        the environments at once.
+
+        :param store: The store to link files to
+        :type store: :class:`~mork.dedup.DedupStore`
+        :param bool dry_run: Whether to only report what would be reclaimed
+        :return: A summary of the files linked and the space reclaimed
+        :rtype: :class:`~mork.dedup.DedupReport`
+        """
+
+        from .dedup import deduplicate
+        lib_dirs = []
+        for prefix in self.prefixes:
+            lib_dirs.extend(EnvironmentMetadata.load(prefix).lib_dirs)
+        return deduplicate(lib_dirs, store=store, dry_run=dry_run)
@@ -0,0 +1,485 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import email.utils
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import time
+
+import pkg_resources
+import vistir
+
+from six.moves import html_parser
+from six.moves.urllib import parse as urllib_parse
+
+from .tags import WheelFilename
+from .utils import canonicalize_name, is_python_compatible
+
+
+DEFAULT_SOURCES = [{"name": "pypi", "url": "https://pypi.org/simple", "verify_ssl": True}]
+
+ARCHIVE_EXTENSIONS = (".whl", ".tar.gz", ".tar.bz2", ".tar.xz", ".tgz", ".zip")
+
+CACHE_FORMAT_VERSION = 1
+
+DEFAULT_TTL = 600
+
+#: The number of connections kept alive per host by :func:`make_session`
+POOL_MAXSIZE = 10
+
+DEFAULT_RETRIES = 3
+
+
+def make_session(pool_maxsize=POOL_MAXSIZE, retries=DEFAULT_RETRIES):
+    """Create a session which keeps connections to every index alive for reuse.
+
+    :param int pool_maxsize: The number of connections to keep open per host
+    :param int retries: The number of times to retry failed connections
+    :rtype: :class:`requests.Session`
+    """
+
+    import requests
+    import requests.adapters
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=pool_maxsize, pool_maxsize=pool_maxsize, max_retries=retries
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def split_filename(filename, project):
+    """Get the version of a distribution file listed on a project's index page.
+
+    :param str filename: The name of a wheel or sdist
+    :param str project: The name of the project the page belongs to
+    :return: The version encoded in the filename, or None if it isn't a distribution
+        of the project
+    :rtype: str or None
+    """
+
+    if filename.endswith(".whl"):
+        parts = filename[:-len(".whl")].split("-")
+        if len(parts) < 5 or canonicalize_name(parts[0]) != canonicalize_name(project):
+            return None
+        return parts[1]
+    for extension in ARCHIVE_EXTENSIONS:
+        if filename.lower().endswith(extension):
+            stem = filename[:-len(extension)]
+            break
+    else:
+        return None
+    # The project name may itself contain dashes, so match it against the prefix
+    name_parts = re.split(r"[-_.]+", canonicalize_name(project))
+    match = re.match(
+        r"^{0}-(?P<version>.+)$".format(r"[-_.]+".join(re.escape(p) for p in name_parts)),
+        stem, re.IGNORECASE
+    )
+    if not match:
+        return None
+    return match.group("version")
+
+
+class Candidate(object):
+    """A distribution file listed on a simple index page."""
+
+    __slots__ = ("name", "version", "filename", "url", "requires_python", "yanked")
+
+    def __init__(self, name, version, filename, url, requires_python=None, yanked=False):
+        self.name = name
+        self.version = version
+        self.filename = filename
+        self.url = url
+        self.requires_python = requires_python
+        self.yanked = yanked
+
+    def __repr__(self):
+        return "<Candidate {0}=={1} ({2})>".format(self.name, self.version, self.filename)
+
+    @property
+    def parsed_version(self):
+        return pkg_resources.parse_version(self.version)
+
+    @property
+    def is_wheel(self):
+        return self.filename.endswith(".whl")
+
+    @property
+    def is_prerelease(self):
+        return self.parsed_version.is_prerelease
+
+    @property
+    def tags(self):
+        """The tags of a wheel, or None for an sdist."""
+        if not self.is_wheel:
+            return None
+        filename = WheelFilename.parse(self.filename)
+        return filename.tags if filename is not None else frozenset()
+
+    def is_compatible(self, python_version=None, supported_tags=None):
+        """Whether the file can be installed in an environment.
+
+        :param str python_version: The full python version of the environment, or None to
+            ignore ``Requires-Python``
+        :param supported_tags: The wheel tags of the environment, or None to accept every
+            wheel
+        :rtype: bool
+        """
+
+        if python_version and not is_python_compatible(self.requires_python, python_version):
+            return False
+        if supported_tags is not None and self.is_wheel:
+            return not self.tags.isdisjoint(supported_tags)
+        return True
+
+    def as_list(self):
+        return [self.name, self.version, self.filename, self.url, self.requires_python, self.yanked]
+
+
+class LinkParser(html_parser.HTMLParser):
+    """Collect the anchors of a :pep:`503` simple index page."""
+
+    def __init__(self):
+        html_parser.HTMLParser.__init__(self)
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != "a":
+            return
+        attrs = dict(attrs)
+        if attrs.get("href"):
+            self.links.append(attrs)
+
+
+def parse_links(project, page_url, html):
+    """Parse the candidates listed on a project's simple index page.
+
+    :param str project: The name of the project
+    :param str page_url: The URL of the page, which relative links are resolved against
+    :param str html: The contents of the page
+    :return: The distribution files linked from the page
+    :rtype: list(:class:`~mork.index.Candidate`)
+    """
+
+    parser = LinkParser()
+    parser.feed(html)
+    parser.close()
+    candidates = []
+    for attrs in parser.links:
+        url = urllib_parse.urljoin(page_url, attrs["href"])
+        filename = urllib_parse.unquote(
+            urllib_parse.urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1]
+        )
+        version = split_filename(filename, project)
+        if version is None:
+            continue
+        candidates.append(Candidate(
+            project, version, filename, url,
+            requires_python=attrs.get("data-requires-python"), yanked="data-yanked" in attrs
+        ))
+    return candidates
+
+
+class IndexCache(object):
+    """A persistent store of the candidate lists of simple index pages.
+
+    Each page is stored with the ``ETag`` and ``Last-Modified`` values it was served
+    with, so stale entries can be revalidated with a conditional request instead of
+    downloading and parsing the page again.
+
+    :param str root: The cache directory, defaults to ``$MORK_INDEX_CACHE`` or
+        ``$XDG_CACHE_HOME/mork/index``
+    :param int ttl: The number of seconds a page is used without revalidating it,
+        defaults to 600
+    """
+
+    def __init__(self, root=None, ttl=DEFAULT_TTL):
+        if root is None:
+            root = self.get_default_root()
+        self.root = vistir.compat.Path(root)
+        self.ttl = ttl
+
+    def __repr__(self):
+        return "<IndexCache {0!r} ttl={1}>".format(self.root.as_posix(), self.ttl)
+
+    @classmethod
+    def get_default_root(cls):
+        cache_dir = os.environ.get("MORK_INDEX_CACHE")
+        if not cache_dir:
+            cache_dir = os.path.join(
+                os.environ.get("XDG_CACHE_HOME", "~/.cache"), "mork", "index"
+            )
+        return vistir.compat.Path(os.path.expandvars(cache_dir)).expanduser()
+
+    def get_path(self, index_url, project):
+        index_hash = hashlib.sha256(vistir.misc.to_bytes(index_url.rstrip("/"))).hexdigest()
+        return self.root.joinpath(index_hash[:16], "{0}.json".format(canonicalize_name(project)))
+
+    def get(self, index_url, project):
+        """Load the cached entry for a project page.
+
+        :return: A mapping with the ``etag``, ``last_modified`` and ``fetched`` time of
+            the page and its ``candidates``, or None if the page isn't cached
+        :rtype: dict or None
+        """
+
+        path = self.get_path(index_url, project)
+        try:
+            with io.open(path.as_posix(), "r", encoding="utf-8") as fh:
+                entry = json.load(fh)
+        except (IOError, OSError, ValueError):
+            return None
+        if entry.get("format") != CACHE_FORMAT_VERSION:
+            return None
+        entry["candidates"] = [Candidate(*item) for item in entry["candidates"]]
+        return entry
+
+    def set(self, index_url, project, candidates, etag=None, last_modified=None, fetched=None):
+        """Store the candidates of a project page, replacing any previous entry atomically."""
+        path = self.get_path(index_url, project)
+        vistir.path.mkdir_p(path.parent.as_posix())
+        data = json.dumps({
+            "format": CACHE_FORMAT_VERSION,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched": fetched if fetched is not None else time.time(),
+            "candidates": [candidate.as_list() for candidate in candidates],
+        }, separators=(",", ":"))
+        fd, tmp_path = tempfile.mkstemp(prefix=".mork-index", dir=path.parent.as_posix())
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(vistir.misc.to_bytes(data))
+            getattr(os, "replace", os.rename)(tmp_path, path.as_posix())
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def is_fresh(self, entry, now=None):
+        now = now if now is not None else time.time()
+        return entry["fetched"] + self.ttl > now
+
+
+class SimpleIndex(object):
+    """A client for :pep:`503` simple indexes backed by an :class:`IndexCache`.
+
+    ``http(s)://`` and ``file://`` indexes are supported.  A ``file://`` index is a
+    directory with one subdirectory per project, holding either an ``index.html`` page
+    or the distribution files themselves.
+
+    The finder is meant to be long-lived: parsed pages are kept in memory and reused
+    for as long as they are fresh, and connections stay open in the pool of its session
+    until :meth:`close` is called.
+
+    :param list sources: Pipfile style source dictionaries with ``url`` and ``verify_ssl``
+        keys, defaults to PyPI
+    :param cache: The cache of index pages, or None to fetch every page
+    :type cache: :class:`~mork.index.IndexCache`
+    :param bool offline: Whether to answer only from the cache, never contacting an index
+    :param bool prereleases: Whether prereleases are considered by
+        :meth:`find_best_candidate`
+    :param str python_version: The full python version of the target environment, which
+        excludes candidates whose ``Requires-Python`` it doesn't satisfy
+    :param list supported_tags: The wheel tags of the target environment, which exclude
+        wheels with none of them
+    :param session: The session to fetch pages with, created when first needed; a
+        supplied session is shared and isn't closed by :meth:`close`
+    :type session: :class:`requests.Session`
+    :param int ttl: The number of seconds parsed pages are used without revalidating
+        them, defaults to the ``ttl`` of the cache
+    """
+
+    def __init__(self, sources=None, cache=None, offline=False, prereleases=False, session=None,
+                 ttl=None, python_version=None, supported_tags=None):
+        self.sources = sources if sources else DEFAULT_SOURCES
+        self.cache = cache
+        self.offline = offline
+        self.prereleases = prereleases
+        self.python_version = python_version
+        self.supported_tags = supported_tags
+        self.ttl = ttl
+        #: Parsed pages by ``(index url, project)``, in the same form as cache entries
+        self.pages = {}
+        self._session = session
+        self._owns_session = session is None
+
+    def __repr__(self):
+        return "<SimpleIndex {0!r} offline={1}>".format(
+            [source["url"] for source in self.sources], self.offline
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def session(self):
+        if self._session is None:
+            self._session = make_session()
+            self._owns_session = True
+        return self._session
+
+    def close(self):
+        """Close the connections of the session if the finder created it.
+
+        A shared session is left in place, so the finder keeps using its owner's pool.
+        """
+        if self._session is not None and self._owns_session:
+            self._session.close()
+            self._session = None
+
+    def is_fresh(self, entry):
+        if self.ttl is not None:
+            return entry["fetched"] + self.ttl > time.time()
+        if self.cache is not None:
+            return self.cache.is_fresh(entry)
+        return entry["fetched"] + DEFAULT_TTL > time.time()
+
+    def get_page_url(self, index_url, project):
+        return "{0}/{1}/".format(index_url.rstrip("/"), canonicalize_name(project))
+
+    def find_all_candidates(self, project):
+        """Find every distribution file of a project across all sources.
+
+        :param str project: The name of the project
+        :rtype: list(:class:`~mork.index.Candidate`)
+        """
+
+        candidates = []
+        for source in self.sources:
+            candidates.extend(self.get_candidates(source, project))
+        return candidates
+
+    def find_best_candidate(self, project, prereleases=None, python_version=None,
+                            supported_tags=None):
+        """Find the newest installable release of a project.
+
+        Yanked files are skipped, as are prereleases unless they are allowed, files whose
+        ``Requires-Python`` excludes the target python and wheels built for none of the
+        target's tags; a wheel is preferred over an sdist of the same version.
+
+        :param str project: The name of the project
+        :param bool prereleases: Overrides the ``prereleases`` setting of the index
+        :param str python_version: Overrides the ``python_version`` setting of the index
+        :param list supported_tags: Overrides the ``supported_tags`` setting of the index
+        :return: The best candidate, or None if there are no candidates
+        :rtype: :class:`~mork.index.Candidate` or None
+        """
+
+        prereleases = self.prereleases if prereleases is None else prereleases
+        python_version = python_version or self.python_version
+        if supported_tags is None:
+            supported_tags = self.supported_tags
+        if supported_tags is not None:
+            supported_tags = frozenset(supported_tags)
+        candidates = [
+            candidate for candidate in self.find_all_candidates(project)
+            if not candidate.yanked and (prereleases or not candidate.is_prerelease) and
+            candidate.is_compatible(python_version, supported_tags)
+        ]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda c: (c.parsed_version, c.is_wheel))
+
+    def get_candidates(self, source, project):
+        """Get the candidates listed for a project by a single source.
+
+        Pages parsed earlier by this finder are used before the cache.  Fresh entries
+        are used as-is, stale ones are revalidated with ``If-None-Match`` and
+        ``If-Modified-Since`` headers, and in offline mode the cache is used regardless
+        of its age.
+
+        :param dict source: The source to query
+        :param str project: The name of the project
+        :rtype: list(:class:`~mork.index.Candidate`)
+        """
+
+        index_url = source["url"]
+        key = (index_url, canonicalize_name(project))
+        entry = self.pages.get(key)
+        if entry is None and self.cache is not None:
+            entry = self.cache.get(index_url, project)
+            if entry is not None:
+                self.pages[key] = entry
+        if self.offline:
+            return entry["candidates"] if entry is not None else []
+        if entry is not None and self.is_fresh(entry):
+            return entry["candidates"]
+        page_url = self.get_page_url(index_url, project)
+        status, html, etag, last_modified = self.fetch(
+            page_url, verify=source.get("verify_ssl", True), entry=entry
+        )
+        if status == 304:
+            candidates = entry["candidates"]
+            etag = etag or entry["etag"]
+            last_modified = last_modified or entry["last_modified"]
+        elif status == 404:
+            candidates = []
+        else:
+            candidates = parse_links(project, page_url, html)
+        fetched = time.time()
+        self.pages[key] = {
+            "etag": etag, "last_modified": last_modified, "fetched": fetched,
+            "candidates": candidates,
+        }
+        if self.cache is not None:
+            self.cache.set(
+                index_url, project, candidates, etag=etag, last_modified=last_modified,
+                fetched=fetched
+            )
+        return candidates
+
+    def fetch(self, page_url, verify=True, entry=None):
+        """Fetch a project page, revalidating a cached entry if one is supplied.
+
+        :return: A tuple of the status code, page contents, ``ETag`` and ``Last-Modified``
+        :rtype: tuple
+        """
+
+        if page_url.startswith("file:"):
+            return self._fetch_file(page_url, entry=entry)
+        headers = {"Accept": "text/html"}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        response = self.session.get(page_url, headers=headers, verify=verify)
+        if response.status_code in (304, 404):
+            return response.status_code, None, response.headers.get("ETag"), None
+        response.raise_for_status()
+        return (
+            response.status_code, response.text, response.headers.get("ETag"),
+            response.headers.get("Last-Modified")
+        )
+
+    def _fetch_file(self, page_url, entry=None):
+        path = vistir.misc.to_text(vistir.path.url_to_path(page_url))
+        index_html = os.path.join(path, "index.html")
+        target = index_html if os.path.isfile(index_html) else path
+        try:
+            st = os.stat(target)
+        except OSError:
+            return 404, None, None, None
+        # Local pages are revalidated by their exact modification time and size, which
+        # is finer grained than a Last-Modified header
+        etag = '"{0}-{1}"'.format(getattr(st, "st_mtime_ns", st.st_mtime), st.st_size)
+        last_modified = email.utils.formatdate(st.st_mtime, usegmt=True)
+        if entry is not None and entry.get("etag") == etag:
+            return 304, None, etag, last_modified
+        if target == index_html:
+            with io.open(index_html, "r", encoding="utf-8") as fh:
+                html = fh.read()
+        else:
+            html = "\n".join(
+                '<a href="{0}">{1}</a>'.format(urllib_parse.quote(name), name)
+                for name in sorted(os.listdir(path))
+            )
+        return 200, html, etag, last_modified
@@ -0,0 +1,77 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import io
+import os
+import tempfile
+
+from .metadata import PYVENV_CFG, read_pyvenv_cfg
+
+
+#: The ``pyvenv.cfg`` key listing the base environments of a layered environment
+LAYERS_KEY = "mork-layers"
+
+#: The ``.pth`` file which chains the library directories of the base environments
+LAYERS_PTH = "_mork_layers.pth"
+
+
+def read_layers(prefix):
+    """Get the prefixes of the base environments a layered environment is built on.
+
+    :param str prefix: The root of the environment
+    :return: The base prefixes, highest priority first, empty for a plain environment
+    :rtype: list
+    """
+
+    value = read_pyvenv_cfg(prefix).get(LAYERS_KEY, "")
+    return [path for path in value.split(os.pathsep) if path]
+
+
+def _replace(path, text):
+    fd, tmp_path = tempfile.mkstemp(prefix=".mork-layers", dir=os.path.dirname(path))
+    try:
+        with io.open(fd, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        getattr(os, "replace", os.rename)(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+def write_layers(prefix, lib_dir, bases):
+    """Chain an environment onto a set of base environments.
+
+    The base prefixes are recorded in ``pyvenv.cfg`` and a ``.pth`` file in the library
+    directory adds the library directories of each base as site directories, after the
+    environment's own, so their ``.pth`` files are processed as well and packages
+    installed in the environment shadow those of its bases.
+
+    :param str prefix: The root of the layered environment
+    :param str lib_dir: The library directory of the layered environment
+    :param list bases: Pairs of base prefix and its library directories, highest
+        priority first; an empty list turns the environment back into a plain one
+    """
+
+    cfg_path = os.path.join(prefix, PYVENV_CFG)
+    with io.open(cfg_path, "r", encoding="utf-8") as fh:
+        lines = [
+            line for line in fh.read().splitlines()
+            if line.partition("=")[0].strip().lower() != LAYERS_KEY
+        ]
+    if bases:
+        lines.append("{0} = {1}".format(
+            LAYERS_KEY, os.pathsep.join(base_prefix for base_prefix, _ in bases)
+        ))
+    _replace(cfg_path, "\n".join(lines) + "\n")
+    pth_path = os.path.join(lib_dir, LAYERS_PTH)
+    if not bases:
+        if os.path.exists(pth_path):
+            os.unlink(pth_path)
+        return
+    lib_dirs = []
+    for _, base_lib_dirs in bases:
+        lib_dirs.extend(path for path in base_lib_dirs if path not in lib_dirs)
+    _replace(pth_path, "".join(
+        "import site; site.addsitedir({0!r})\n".format(str(path)) for path in lib_dirs
+    ))
@@ -0,0 +1,297 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+
+import vistir
+
+
+PYVENV_CFG = "pyvenv.cfg"
+
+IMPLEMENTATION_PREFIXES = {"cpython": "python", "pypy": "pypy"}
+
+LIB_DIR_RE = re.compile(r"^(?P<impl>python|pypy)(?P<version>\d+\.\d+)(?P<abiflags>[a-z]*)$")
+
+PROBE_SCRIPT = """
+import json, platform, sys, sysconfig
+scheme = 'nt' if sys.platform.startswith('win') else 'posix_prefix'
+paths = sysconfig.get_paths(scheme, vars={'base': sys.prefix, 'platbase': sys.prefix})
+print(json.dumps({
+    'version': platform.python_version(),
+    'implementation': platform.python_implementation(),
+    'base_prefix': getattr(sys, 'base_prefix', getattr(sys, 'real_prefix', sys.prefix)),
+    'abiflags': getattr(sys, 'abiflags', ''),
+    'purelib': paths['purelib'],
+    'platlib': paths['platlib'],
+    'scripts': paths['scripts'],
+}))
+"""
+
+
+def read_pyvenv_cfg(prefix):
+    """Read the ``pyvenv.cfg`` file of an environment without invoking its interpreter.
+
+    :param str prefix: The root of the environment
+    :return: A mapping of lower cased keys to values, empty if no config is present
+    :rtype: dict
+    """
+
+    cfg_path = os.path.join(prefix, PYVENV_CFG)
+    config = {}
+    try:
+        with open(cfg_path, "r") as fh:
+            lines = fh.readlines()
+    except (IOError, OSError):
+        return config
+    for line in lines:
+        key, sep, value = line.partition("=")
+        if not sep:
+            continue
+        config[key.strip().lower()] = value.strip()
+    return config
+
+
+class EnvironmentMetadata(object):
+    """Interpreter and layout information about an environment.
+
+    Metadata is read statically from ``pyvenv.cfg`` and the directory layout of the
+    environment wherever possible; see :meth:`load`.
+    """
+
+    def __init__(self, prefix, version=None, implementation=None, base_prefix=None,
+                 abiflags=None, purelib=None, platlib=None, scripts=None,
+                 include_system_site_packages=False, probed=False):
+        self.prefix = os.path.abspath(prefix)
+        self.version = version
+        self.implementation = implementation
+        self.base_prefix = base_prefix
+        self.abiflags = abiflags
+        self.purelib = purelib
+        self.platlib = platlib if platlib else purelib
+        self.scripts = scripts
+        self.include_system_site_packages = include_system_site_packages
+        self.probed = probed
+
+    def __repr__(self):
+        return "<EnvironmentMetadata {0!r} version={1!r} implementation={2!r}>".format(
+            self.prefix, self.version, self.implementation
+        )
+
+    @property
+    def py_version_short(self):
+        if not self.version:
+            return None
+        return ".".join(self.version.split(".")[:2])
+
+    @property
+    def complete(self):
+        """Whether every piece of metadata was determined."""
+        return all([
+            self.version, self.implementation, self.base_prefix, self.abiflags is not None,
+            self.purelib, self.scripts
+        ])
+
+    @property
+    def lib_dirs(self):
+        if self.purelib == self.platlib:
+            return [self.purelib]
+        return [self.purelib, self.platlib]
+
+    def get_marker_environment(self):
+        """Build the environment :pep:`508` markers are evaluated against.
+
+        Interpreter values come from the metadata, while platform values are taken from
+        the running interpreter, since environments are always on the same host.
+
+        :return: A mapping of marker names to values
+        :rtype: dict
+        """
+
+        implementation = self.implementation or platform.python_implementation()
+        version = self.version or platform.python_version()
+        return {
+            "implementation_name": implementation.lower(),
+            "implementation_version": version,
+            "os_name": os.name,
+            "platform_machine": platform.machine(),
+            "platform_python_implementation": implementation,
+            "platform_release": platform.release(),
+            "platform_system": platform.system(),
+            "platform_version": platform.version(),
+            "python_full_version": version,
+            "python_version": ".".join(version.split(".")[:2]),
+            "sys_platform": sys.platform,
+        }
+
+    @classmethod
+    def from_prefix(cls, prefix):
+        """Read metadata from ``pyvenv.cfg`` and the filesystem only.
+
+        Any values which cannot be determined from the layout are left as ``None``.
+
+        :param str prefix: The root of the environment
+        :return: The statically determined metadata
+        :rtype: :class:`~mork.metadata.EnvironmentMetadata`
+        """
+
+        prefix = os.path.abspath(prefix)
+        config = read_pyvenv_cfg(prefix)
+        version = config.get("version_info", config.get("version"))
+        if version:
+            version = ".".join(version.split(".")[:3])
+        implementation = config.get("implementation")
+        base_prefix = config.get("base-prefix")
+        if not base_prefix and config.get("home"):
+            home = config["home"]
+            if os.name != "nt" and os.path.basename(home.rstrip(os.sep)) == "bin":
+                home = os.path.dirname(home.rstrip(os.sep))
+            base_prefix = home
+        scripts = os.path.join(prefix, "Scripts" if os.name == "nt" else "bin")
+        if not os.path.isdir(scripts):
+            scripts = None
+        abiflags = None
+        lib_abiflags = ""
+        purelib = platlib = None
+        if os.name == "nt":
+            site_packages = os.path.join(prefix, "Lib", "site-packages")
+            if os.path.isdir(site_packages):
+                purelib = platlib = site_packages
+                abiflags = ""
+        else:
+            lib_dir = cls._find_lib_dir(prefix, version, implementation)
+            if lib_dir:
+                match = LIB_DIR_RE.match(os.path.basename(lib_dir))
+                if not implementation:
+                    implementation = "PyPy" if match.group("impl") == "pypy" else "CPython"
+                if not version:
+                    version = match.group("version")
+                lib_abiflags = match.group("abiflags")
+                purelib = os.path.join(lib_dir, "site-packages")
+                platlib = purelib
+                lib64 = os.path.join(prefix, "lib64", os.path.basename(lib_dir), "site-packages")
+                if os.path.isdir(lib64) and (
+                    os.path.realpath(lib64) != os.path.realpath(purelib)
+                ):
+                    platlib = lib64
+                if not config:
+                    base_prefix = cls._read_orig_prefix(lib_dir) or prefix
+            abiflags = cls._find_abiflags(prefix, version, implementation)
+            if "t" in lib_abiflags and abiflags is not None and "t" not in abiflags:
+                # Free-threaded builds name their lib directory after the flag, and have
+                # no include directory in the environment to read it from
+                abiflags = "t" + abiflags
+        return cls(
+            prefix, version=version, implementation=implementation,
+            base_prefix=base_prefix, abiflags=abiflags, purelib=purelib, platlib=platlib,
+            scripts=scripts, include_system_site_packages=config.get(
+                "include-system-site-packages", "false"
+            ).lower() == "true"
+        )
+
+    @classmethod
+    def _find_lib_dir(cls, prefix, version, implementation):
+        lib_root = os.path.join(prefix, "lib")
+        if version:
+            short_version = ".".join(version.split(".")[:2])
+            impl_prefix = IMPLEMENTATION_PREFIXES.get(
+                (implementation or "cpython").lower(), "python"
+            )
+            for abiflags in ("", "t"):
+                candidate = os.path.join(
+                    lib_root, "{0}{1}{2}".format(impl_prefix, short_version, abiflags)
+                )
+                if os.path.isdir(os.path.join(candidate, "site-packages")):
+                    return candidate
+        try:
+            entries = os.listdir(lib_root)
+        except OSError:
+            return None
+        candidates = [
+            os.path.join(lib_root, entry) for entry in entries
+            if LIB_DIR_RE.match(entry) and
+            os.path.isdir(os.path.join(lib_root, entry, "site-packages"))
+        ]
+        if len(candidates) == 1:
+            return candidates[0]
+        return None
+
+    @classmethod
+    def _read_orig_prefix(cls, lib_dir):
+        # Legacy virtualenv releases record the base prefix here instead of pyvenv.cfg
+        try:
+            with open(os.path.join(lib_dir, "orig-prefix.txt"), "r") as fh:
+                return fh.read().strip()
+        except (IOError, OSError):
+            return None
+
+    @classmethod
+    def _find_abiflags(cls, prefix, version, implementation):
+        include_dir = os.path.join(prefix, "include")
+        try:
+            entries = os.listdir(include_dir)
+        except OSError:
+            entries = []
+        for entry in entries:
+            match = LIB_DIR_RE.match(entry)
+            if match and (not version or version.startswith(match.group("version"))):
+                return match.group("abiflags")
+        if not version or (implementation or "cpython").lower() != "cpython":
+            return "" if version else None
+        major, minor = [int(part) for part in version.split(".")[:2]]
+        if major == 3 and minor < 8:
+            # pymalloc was enabled by default, and reflected in the abiflags, until 3.8
+            return "m"
+        return ""
+
+    @classmethod
+    def from_python(cls, prefix, python):
+        """Probe an interpreter for the metadata of the environment it belongs to.
+
+        :param str prefix: The root of the environment
+        :param str python: The path to the interpreter of the environment
+        :return: The probed metadata
+        :rtype: :class:`~mork.metadata.EnvironmentMetadata`
+        """
+
+        out = subprocess.check_output([python, "-c", PROBE_SCRIPT])
+        info = json.loads(vistir.misc.to_text(out).strip())
+        return cls(
+            prefix, version=info["version"], implementation=info["implementation"],
+            base_prefix=info["base_prefix"], abiflags=info["abiflags"],
+            purelib=info["purelib"], platlib=info["platlib"], scripts=info["scripts"],
+            include_system_site_packages=read_pyvenv_cfg(prefix).get(
+                "include-system-site-packages", "false"
+            ).lower() == "true",
+            probed=True,
+        )
+
+    @classmethod
+    def load(cls, prefix, python=None):
+        """Load the metadata for an environment, probing the interpreter only when needed.
+
+        :param str prefix: The root of the environment
+        :param str python: The interpreter to probe if the layout cannot be determined
+            statically, defaults to the ``python`` executable in the scripts directory
+        :return: The metadata for the environment
+        :rtype: :class:`~mork.metadata.EnvironmentMetadata`
+        """
+
+        metadata = cls.from_prefix(prefix)
+        if metadata.complete:
+            return metadata
+        if python is None and metadata.scripts:
+            python = os.path.join(
+                metadata.scripts, "python.exe" if os.name == "nt" else "python"
+            )
+        if not python or not os.path.exists(python):
+            return metadata
+        try:
+            return cls.from_python(prefix, python)
+        except (OSError, subprocess.CalledProcessError, ValueError):
+            return metadata
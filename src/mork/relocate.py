@@ -0,0 +1,270 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import csv
+import io
+import os
+import re
+import stat
+import sys
+import tempfile
+
+from multiprocessing.pool import ThreadPool
+
+import vistir
+
+from .dedup import get_record_digest, hash_file
+from .utils import iter_metadata_dirs
+
+
+#: The number of threads rewriting files by default
+DEFAULT_WORKERS = 8
+
+#: Compiled files, whose embedded source paths are fixed up by the import system
+SKIP_SUFFIXES = (".pyc", ".pyo")
+
+#: A prefix is only replaced when followed by one of these, so ``/envs/a`` doesn't
+#: match ``/envs/ab``
+PREFIX_BOUNDARY = br"(?=[/\\\s'\":;,=)\]]|$)"
+
+SHEBANG_RE = re.compile(br"^#!\s*(?P<prefix>\S+?)[/\\](?:bin|Scripts)[/\\]python[\w.]*")
+
+TEMP_PREFIX = ".mork-relocate"
+
+
+def _encode(path):
+    return vistir.misc.to_bytes(path, encoding=sys.getfilesystemencoding() or "utf-8")
+
+
+def get_prefix_forms(prefix):
+    """Get the spellings of a prefix which may appear in the files of an environment."""
+    forms = [os.path.normpath(prefix), vistir.compat.Path(prefix).as_posix()]
+    return [form for index, form in enumerate(forms) if form not in forms[:index]]
+
+
+def detect_prefix(scripts_dir):
+    """Find the prefix an environment was created at from the shebangs of its scripts.
+
+    :param str scripts_dir: The scripts directory of the environment
+    :return: The prefix the scripts were written for, or None if no script names one
+    :rtype: str or None
+    """
+
+    try:
+        names = sorted(os.listdir(scripts_dir))
+    except OSError:
+        return None
+    for name in names:
+        path = os.path.join(scripts_dir, name)
+        if os.path.islink(path) or not os.path.isfile(path):
+            continue
+        with open(path, "rb") as fh:
+            match = SHEBANG_RE.match(fh.readline())
+        if match:
+            return vistir.misc.to_text(match.group("prefix"))
+    return None
+
+
+class RelocationReport(object):
+    """The outcome of rewriting the references to a prefix below a set of roots."""
+
+    def __init__(self, old_prefix, new_prefix):
+        self.old_prefix = old_prefix
+        self.new_prefix = new_prefix
+        #: The number of files which were searched for the old prefix
+        self.scanned = 0
+        #: The files which were rewritten
+        self.rewritten = []
+        #: The symlinks which were pointed at the new prefix
+        self.relinked = []
+        #: The ``RECORD`` files whose hashes were updated
+        self.records = []
+        #: Pairs of ``(path, error message)`` for files which couldn't be rewritten
+        self.errors = []
+
+    def __repr__(self):
+        return "<RelocationReport {0!r} -> {1!r} rewritten={2}>".format(
+            self.old_prefix, self.new_prefix, len(self.rewritten)
+        )
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def as_dict(self):
+        return {
+            "old_prefix": self.old_prefix,
+            "new_prefix": self.new_prefix,
+            "scanned": self.scanned,
+            "rewritten": self.rewritten,
+            "relinked": self.relinked,
+            "records": self.records,
+            "errors": [list(error) for error in self.errors],
+        }
+
+
+class Relocator(object):
+    """Rewrite the absolute references to one prefix with another.
+
+    Each file is searched for the old prefix as raw bytes and only files which contain
+    it are rewritten, each one to a temporary file which then replaces it, so readers
+    never see a partially rewritten file and hardlinks shared with other environments
+    are broken rather than modified.  Files containing NUL bytes are treated as binary
+    and left alone.
+
+    :param str old_prefix: The prefix the files refer to
+    :param str new_prefix: The prefix to refer to instead
+    :param int workers: The number of threads rewriting files
+    """
+
+    def __init__(self, old_prefix, new_prefix, workers=DEFAULT_WORKERS):
+        self.old_prefix = old_prefix
+        self.new_prefix = new_prefix
+        self.workers = workers
+        self.replacements = {}
+        for old, new in zip(get_prefix_forms(old_prefix), get_prefix_forms(new_prefix)):
+            self.replacements.setdefault(_encode(old), _encode(new))
+        self.pattern = re.compile(b"(?:" + b"|".join(
+            re.escape(old) for old in sorted(self.replacements, key=len, reverse=True)
+        ) + b")" + PREFIX_BOUNDARY)
+
+    def __repr__(self):
+        return "<Relocator {0!r} -> {1!r}>".format(self.old_prefix, self.new_prefix)
+
+    def _replace(self, match):
+        return self.replacements[match.group(0)]
+
+    def iter_files(self, roots):
+        for root in roots:
+            if not os.path.isdir(root):
+                if os.path.lexists(root):
+                    yield root
+                continue
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames[:] = [d for d in dirnames if not d.startswith(TEMP_PREFIX)]
+                for name in filenames:
+                    if not name.endswith(SKIP_SUFFIXES):
+                        yield os.path.join(dirpath, name)
+                # os.walk doesn't descend into symlinked directories, which may still
+                # point into the old prefix
+                for name in dirnames:
+                    path = os.path.join(dirpath, name)
+                    if os.path.islink(path):
+                        yield path
+
+    def rewrite(self, path):
+        """Rewrite a single file or symlink.
+
+        :return: ``rewritten``, ``relinked`` or None if it doesn't refer to the old prefix
+        :rtype: str or None
+        """
+
+        if os.path.islink(path):
+            target = _encode(os.readlink(path))
+            new_target = self.pattern.sub(self._replace, target)
+            if new_target == target:
+                return None
+            tmp_path = os.path.join(
+                os.path.dirname(path), "{0}-{1}".format(TEMP_PREFIX, os.path.basename(path))
+            )
+            os.symlink(new_target, _encode(tmp_path))
+            getattr(os, "replace", os.rename)(tmp_path, path)
+            return "relinked"
+        with open(path, "rb") as fh:
+            data = fh.read()
+        if not any(old in data for old in self.replacements) or b"\0" in data:
+            return None
+        new_data = self.pattern.sub(self._replace, data)
+        if new_data == data:
+            return None
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+        fd, tmp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=os.path.dirname(path))
+        try:
+            with io.open(fd, "wb") as fh:
+                fh.write(new_data)
+            os.chmod(tmp_path, mode)
+            getattr(os, "replace", os.rename)(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        return "rewritten"
+
+    def _rewrite(self, path):
+        try:
+            return path, self.rewrite(path), None
+        except (IOError, OSError) as e:
+            return path, None, str(e)
+
+    def relocate(self, roots, lib_dirs=()):
+        """Rewrite every file below a set of roots which refers to the old prefix.
+
+        :param list roots: Directories or files to search
+        :param list lib_dirs: Library directories whose ``RECORD`` files are updated with
+            the hashes and sizes of the rewritten files
+        :rtype: :class:`~mork.relocate.RelocationReport`
+        """
+
+        report = RelocationReport(self.old_prefix, self.new_prefix)
+        paths = list(self.iter_files(roots))
+        report.scanned = len(paths)
+        pool = ThreadPool(max(1, min(self.workers, len(paths))))
+        try:
+            for path, outcome, error in pool.imap_unordered(self._rewrite, paths, 64):
+                if error is not None:
+                    report.errors.append((path, error))
+                elif outcome == "rewritten":
+                    report.rewritten.append(path)
+                elif outcome == "relinked":
+                    report.relinked.append(path)
+        finally:
+            pool.close()
+            pool.join()
+        report.rewritten.sort()
+        report.relinked.sort()
+        if report.rewritten and lib_dirs:
+            try:
+                report.records = update_records(lib_dirs, report.rewritten)
+            except (IOError, OSError) as e:
+                report.errors.append((None, str(e)))
+        return report
+
+
+def update_records(lib_dirs, paths):
+    """Update the hashes and sizes recorded in ``RECORD`` files for files which changed.
+
+    :param list lib_dirs: The library directories of the environment
+    :param list paths: The changed files
+    :return: The ``RECORD`` files which were updated
+    :rtype: list
+    """
+
+    changed = set(os.path.normpath(path) for path in paths)
+    updated = []
+    for metadata_dir in iter_metadata_dirs(lib_dirs):
+        record_path = metadata_dir.record_path
+        if metadata_dir.kind != "dist-info" or record_path is None:
+            continue
+        with io.open(record_path, "r", encoding="utf-8", newline="") as fh:
+            rows = list(csv.reader(fh))
+        modified = False
+        for row in rows:
+            if len(row) < 3 or not row[1]:
+                continue
+            path = os.path.normpath(os.path.join(metadata_dir.location, row[0]))
+            if path in changed:
+                row[1] = get_record_digest(hash_file(path))
+                row[2] = str(os.path.getsize(path))
+                modified = True
+        if not modified:
+            continue
+        fd, tmp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=os.path.dirname(record_path))
+        try:
+            with io.open(fd, "w", encoding="utf-8", newline="") as fh:
+                csv.writer(fh, lineterminator="\n").writerows(rows)
+            getattr(os, "replace", os.rename)(tmp_path, record_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        updated.append(record_path)
+    return updated
@@ -0,0 +1,248 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import compileall
+import io
+import os
+import platform
+import re
+import shutil
+import tempfile
+import zipfile
+
+import distlib.scripts
+import pkg_resources
+import vistir
+
+from .editable import get_record_hash
+from .utils import canonicalize_name, parse_entry_points
+from .wheelcache import get_interpreter_tag
+
+
+#: The packages seeded by default, each only if a wheel of it is found.  :mod:`ensurepip`
+#: bundles pip and setuptools, so seeding wheel is best-effort and depends on the wheel
+#: directories searched
+SEED_PACKAGES = ("pip", "setuptools", "wheel")
+
+WHEEL_RE = re.compile(r"^(?P<name>[^-]+)-(?P<version>[^-]+)(-\d[^-]*)?-[^-]+-[^-]+-[^-]+\.whl$")
+
+#: Console scripts which are generated for the version of the target interpreter
+VERSIONED_SCRIPT_RE = re.compile(r"^(?P<name>pip|easy_install)-?\d+(\.\d+)?$")
+
+
+def get_bundled_wheel_dir():
+    """The directory holding the wheels bundled with :mod:`ensurepip`, if any."""
+    try:
+        import ensurepip
+    except ImportError:
+        return None
+    bundled = os.path.join(os.path.dirname(ensurepip.__file__), "_bundled")
+    return bundled if os.path.isdir(bundled) else None
+
+
+def find_seed_wheels(wheel_dirs=None, packages=SEED_PACKAGES):
+    """Find the newest wheel of each seed package in a set of directories.
+
+    :param list wheel_dirs: Directories of wheels to search, the :mod:`ensurepip` bundle
+        is always searched last
+    :param tuple packages: The names of the packages to find
+    :return: A mapping of canonical package names to wheel paths, without the packages
+        which have no wheel
+    :rtype: dict
+    """
+
+    wanted = set(canonicalize_name(name) for name in packages)
+    found = {}
+    directories = list(wheel_dirs or [])
+    bundled = get_bundled_wheel_dir()
+    if bundled:
+        directories.append(bundled)
+    for directory in directories:
+        try:
+            entries = os.listdir(directory)
+        except OSError:
+            continue
+        for entry in entries:
+            match = WHEEL_RE.match(entry)
+            if not match or not match.group(0).endswith("-none-any.whl"):
+                continue
+            key = canonicalize_name(match.group("name"))
+            if key not in wanted:
+                continue
+            version = pkg_resources.parse_version(match.group("version"))
+            if key not in found or version > found[key][0]:
+                found[key] = (version, os.path.join(directory, entry))
+    return dict((key, path) for key, (_, path) in found.items())
+
+
+def link_or_copy(source, target):
+    try:
+        os.link(source, target)
+    except (OSError, AttributeError):
+        shutil.copy2(source, target)
+
+
+class SeedStore(object):
+    """A store of unpacked seed wheels which new environments are populated from.
+
+    Each wheel is unpacked, and byte-compiled when it is for the running interpreter,
+    once per interpreter tag.  Installing it into an environment then hardlinks the
+    unpacked files, falling back to copying them across filesystems, and only writes
+    the console scripts and ``RECORD`` of the environment itself.
+
+    :param str root: The store directory, defaults to ``$MORK_SEED_STORE`` or
+        ``$XDG_CACHE_HOME/mork/seed``
+    """
+
+    def __init__(self, root=None):
+        if root is None:
+            root = self.get_default_root()
+        self.root = vistir.compat.Path(root)
+
+    def __repr__(self):
+        return "<SeedStore {0!r}>".format(self.root.as_posix())
+
+    @classmethod
+    def get_default_root(cls):
+        cache_dir = os.environ.get("MORK_SEED_STORE")
+        if not cache_dir:
+            cache_dir = os.path.join(
+                os.environ.get("XDG_CACHE_HOME", "~/.cache"), "mork", "seed"
+            )
+        return vistir.compat.Path(os.path.expandvars(cache_dir)).expanduser()
+
+    def get_unpacked_dir(self, wheel, tag):
+        name = os.path.basename(wheel)[:-len(".whl")]
+        return self.root.joinpath(tag, name)
+
+    def unpack(self, wheel, tag, compile_bytecode=False):
+        """Unpack a wheel into the store unless it is already present.
+
+        :param str wheel: The path to a pure python wheel
+        :param str tag: The interpreter tag the unpacked files are used with
+        :param bool compile_bytecode: Whether to byte-compile the unpacked files with the
+            running interpreter
+        :return: The directory holding the unpacked files
+        :rtype: str
+        """
+
+        target = self.get_unpacked_dir(wheel, tag)
+        if target.is_dir():
+            return target.as_posix()
+        vistir.path.mkdir_p(target.parent.as_posix())
+        build_dir = tempfile.mkdtemp(prefix="mork-seed", dir=target.parent.as_posix())
+        try:
+            with zipfile.ZipFile(wheel) as zf:
+                zf.extractall(build_dir)
+            if compile_bytecode:
+                compileall.compile_dir(build_dir, quiet=1)
+            try:
+                os.rename(build_dir, target.as_posix())
+            except OSError:
+                # Another process unpacked the same wheel first
+                if not target.is_dir():
+                    raise
+        finally:
+            if os.path.exists(build_dir):
+                shutil.rmtree(build_dir, ignore_errors=True)
+        return target.as_posix()
+
+    def install(self, unpacked_dir, paths, python, py_version_short):
+        """Populate an environment from an unpacked wheel.
+
+        :param str unpacked_dir: A directory returned by :meth:`unpack`
+        :param dict paths: The ``purelib`` and ``scripts`` paths of the environment
+        :param str python: The interpreter which generated scripts should use
+        :param str py_version_short: The ``X.Y`` version of the interpreter
+        :return: The paths of every file which was written
+        :rtype: list
+        """
+
+        purelib = paths["purelib"]
+        dist_info = None
+        for root, dirs, files in os.walk(unpacked_dir):
+            relative = os.path.relpath(root, unpacked_dir)
+            target_root = os.path.normpath(os.path.join(purelib, relative))
+            vistir.path.mkdir_p(target_root)
+            if relative.endswith(".dist-info") and os.sep not in relative:
+                dist_info = target_root
+            for filename in files:
+                target = os.path.join(target_root, filename)
+                if os.path.lexists(target):
+                    os.unlink(target)
+                if dist_info == target_root and filename in ("RECORD", "INSTALLER"):
+                    # These differ per environment, so must never be shared
+                    continue
+                link_or_copy(os.path.join(root, filename), target)
+        records = []
+        with io.open(os.path.join(dist_info, "INSTALLER"), "w", encoding="utf-8") as fh:
+            fh.write("mork\n")
+        records.append((os.path.join(dist_info, "INSTALLER"), get_record_hash(b"mork\n"), 5))
+        with io.open(os.path.join(unpacked_dir, os.path.basename(dist_info), "RECORD"),
+                     "r", encoding="utf-8") as fh:
+            record_lines = [
+                line.rstrip("\n") for line in fh
+                if line.strip() and line.split(",", 1)[0].rsplit("/", 1)[-1] != "INSTALLER"
+            ]
+        records.extend(self.make_scripts(dist_info, paths["scripts"], python, py_version_short))
+        record_lines.extend(
+            "{0},{1},{2}".format(
+                os.path.relpath(path, purelib).replace(os.sep, "/"), digest, size
+            ) for path, digest, size in records
+        )
+        with io.open(os.path.join(dist_info, "RECORD"), "w", encoding="utf-8") as fh:
+            fh.write("\n".join(record_lines) + "\n")
+        return [path for path, _, _ in records] + [os.path.join(dist_info, "RECORD")]
+
+    def make_scripts(self, dist_info, scripts_dir, python, py_version_short):
+        entry_points_file = os.path.join(dist_info, "entry_points.txt")
+        if not os.path.isfile(entry_points_file):
+            return []
+        with io.open(entry_points_file, "r", encoding="utf-8") as fh:
+            scripts = parse_entry_points(fh.read()).get("console_scripts", {})
+        specs = {}
+        for name, value in scripts.items():
+            match = VERSIONED_SCRIPT_RE.match(name)
+            if match:
+                # Versioned names are generated for the interpreter of the environment
+                base = match.group("name")
+                separator = "-" if base == "easy_install" else ""
+                for version in (py_version_short.split(".")[0], py_version_short):
+                    specs["{0}{1}{2}".format(base, separator, version)] = value
+            else:
+                specs[name] = value
+        maker = distlib.scripts.ScriptMaker(None, scripts_dir)
+        maker.executable = python
+        maker.variants = set([""])
+        records = []
+        for script in maker.make_multiple(
+            ["{0} = {1}".format(name, value) for name, value in sorted(specs.items())]
+        ):
+            with open(script, "rb") as fh:
+                data = fh.read()
+            records.append((script, get_record_hash(data), len(data)))
+        return records
+
+    def seed(self, paths, python, metadata, wheels):
+        """Install a set of seed wheels into an environment.
+
+        :param dict paths: The ``purelib`` and ``scripts`` paths of the environment
+        :param str python: The interpreter of the environment
+        :param metadata: The metadata of the environment
+        :type metadata: :class:`~mork.metadata.EnvironmentMetadata`
+        :param list wheels: The paths of the wheels to install
+        :return: The paths of every file written outside of the unpacked trees
+        :rtype: list
+        """
+
+        tag = get_interpreter_tag(metadata)
+        compile_bytecode = (
+            metadata.version == platform.python_version() and
+            metadata.implementation == platform.python_implementation()
+        )
+        written = []
+        for wheel in wheels:
+            unpacked = self.unpack(wheel, tag, compile_bytecode=compile_bytecode)
+            written.extend(self.install(unpacked, paths, python, metadata.py_version_short))
+        return written
@@ -0,0 +1,215 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import gzip
+import hashlib
+import io
+import json
+import time
+
+from .utils import iter_metadata_dirs, parse_entry_points
+
+
+SNAPSHOT_FORMAT = "mork-snapshot"
+
+SNAPSHOT_VERSION = 1
+
+
+class DistributionRecord(object):
+    """The summary of a single installed distribution held in a :class:`Snapshot`."""
+
+    __slots__ = ("name", "version", "files", "hash", "entry_points")
+
+    def __init__(self, name, version, files=0, hash=None, entry_points=None):
+        self.name = name
+        self.version = version
+        self.files = files
+        self.hash = hash
+        self.entry_points = entry_points or {}
+
+    def __repr__(self):
+        return "<DistributionRecord {0}=={1}>".format(self.name, self.version)
+
+    def __eq__(self, other):
+        return self.as_list() == other.as_list()
+
+    def __ne__(self, other):
+        return not self == other
+
+    @classmethod
+    def from_metadata_dir(cls, metadata_dir):
+        record_path = metadata_dir.record_path
+        files = 0
+        digest = None
+        if record_path is not None:
+            with open(record_path, "rb") as fh:
+                data = fh.read()
+            files = len([line for line in data.splitlines() if line.strip()])
+            digest = hashlib.sha256(data).hexdigest()
+        entry_points = dict(
+            (group, sorted(entries))
+            for group, entries in parse_entry_points(
+                metadata_dir.read_text("entry_points.txt")
+            ).items()
+        )
+        return cls(
+            metadata_dir.key, metadata_dir.version, files=files, hash=digest,
+            entry_points=entry_points
+        )
+
+    def as_list(self):
+        return [self.name, self.version, self.files, self.hash, self.entry_points]
+
+
+class SnapshotDiff(object):
+    """The differences between two snapshots, keyed by canonical distribution name."""
+
+    def __init__(self, added=None, removed=None, upgraded=None, modified=None):
+        #: Distributions only present in the new snapshot, mapped to their versions
+        self.added = added or {}
+        #: Distributions only present in the old snapshot, mapped to their versions
+        self.removed = removed or {}
+        #: Distributions whose version changed, mapped to ``(old, new)`` versions
+        self.upgraded = upgraded or {}
+        #: Distributions with the same version but different files or entry points
+        self.modified = modified or {}
+
+    def __repr__(self):
+        return "<SnapshotDiff added={0} removed={1} upgraded={2} modified={3}>".format(
+            len(self.added), len(self.removed), len(self.upgraded), len(self.modified)
+        )
+
+    def __bool__(self):
+        return any([self.added, self.removed, self.upgraded, self.modified])
+
+    __nonzero__ = __bool__
+
+    def as_dict(self):
+        return {
+            "added": self.added,
+            "removed": self.removed,
+            "upgraded": dict((k, list(v)) for k, v in self.upgraded.items()),
+            "modified": self.modified,
+        }
+
+
+class Snapshot(object):
+    """A compact record of the distributions installed in an environment.
+
+    Snapshots are built from a single scan of the ``.dist-info`` and ``.egg-info``
+    entries of the environment, and hold the name, version, file count, ``RECORD`` hash
+    and entry point names of each distribution.
+
+    >>> before = venv.snapshot()
+    >>> venv.install(Requirement.from_line("requests"))
+    >>> before.diff(venv).added
+    {'certifi': '2018.8.24', 'chardet': '3.0.4', 'idna': '2.7', 'requests': '2.19.1', 'urllib3': '1.23'}
+    """
+
+    def __init__(self, distributions, prefix=None, created=None):
+        self.distributions = dict((dist.name, dist) for dist in distributions)
+        self.prefix = prefix
+        self.created = created if created is not None else time.time()
+
+    def __repr__(self):
+        return "<Snapshot {0!r} distributions={1}>".format(self.prefix, len(self.distributions))
+
+    def __len__(self):
+        return len(self.distributions)
+
+    def __contains__(self, name):
+        return name in self.distributions
+
+    @classmethod
+    def from_paths(cls, lib_dirs, prefix=None):
+        """Build a snapshot by scanning a set of library directories.
+
+        :param list lib_dirs: The library directories to scan
+        :param str prefix: The prefix of the environment, for reference
+        :return: A snapshot of the distributions found
+        :rtype: :class:`~mork.snapshot.Snapshot`
+        """
+
+        distributions = []
+        seen = set()
+        for metadata_dir in iter_metadata_dirs(lib_dirs):
+            if metadata_dir.key in seen:
+                continue
+            seen.add(metadata_dir.key)
+            distributions.append(DistributionRecord.from_metadata_dir(metadata_dir))
+        return cls(distributions, prefix=prefix)
+
+    @classmethod
+    def from_virtualenv(cls, venv):
+        """Build a snapshot of a :class:`~mork.virtualenv.VirtualEnv`."""
+        return cls.from_paths(venv.lib_dirs, prefix=venv.prefix.as_posix())
+
+    def as_dict(self):
+        return {
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "prefix": self.prefix,
+            "created": self.created,
+            "distributions": [
+                self.distributions[name].as_list() for name in sorted(self.distributions)
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError("Not a mork snapshot")
+        if data.get("version") != SNAPSHOT_VERSION:
+            raise ValueError("Unsupported snapshot version: {0!r}".format(data.get("version")))
+        return cls(
+            [DistributionRecord(*entry) for entry in data["distributions"]],
+            prefix=data.get("prefix"), created=data.get("created")
+        )
+
+    def write(self, path):
+        """Write the snapshot to a gzip compressed file.
+
+        :param str path: The file to write to
+        """
+
+        data = json.dumps(self.as_dict(), separators=(",", ":"), sort_keys=True)
+        with gzip.open(path, "wb") as fh:
+            fh.write(data.encode("utf-8"))
+
+    @classmethod
+    def read(cls, path):
+        """Read a snapshot written by :meth:`write`.
+
+        :param str path: The file to read from
+        :return: The snapshot stored in the file
+        :rtype: :class:`~mork.snapshot.Snapshot`
+        """
+
+        with gzip.open(path, "rb") as fh:
+            data = json.load(io.TextIOWrapper(fh, encoding="utf-8"))
+        return cls.from_dict(data)
+
+    def diff(self, other):
+        """Compare this snapshot with a newer snapshot or a live environment.
+
+        :param other: The snapshot or environment to compare against
+        :type other: :class:`~mork.snapshot.Snapshot` or :class:`~mork.virtualenv.VirtualEnv`
+        :return: The changes from this snapshot to the other one
+        :rtype: :class:`~mork.snapshot.SnapshotDiff`
+        """
+
+        if not isinstance(other, Snapshot):
+            other = Snapshot.from_virtualenv(other)
+        old, new = self.distributions, other.distributions
+        diff = SnapshotDiff()
+        for name in set(old) | set(new):
+            if name not in new:
+                diff.removed[name] = old[name].version
+            elif name not in old:
+                diff.added[name] = new[name].version
+            elif old[name].version != new[name].version:
+                diff.upgraded[name] = (old[name].version, new[name].version)
+            elif old[name] != new[name]:
+                diff.modified[name] = new[name].version
+        return diff
@@ -0,0 +1,303 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import json
+import os
+import re
+
+from .utils import iter_metadata_dirs
+
+
+#: Separates the imports made by :mod:`site` from those of the profiled modules
+PHASE_MARKER = "mork-startup: modules"
+
+#: Runs :mod:`site` by hand under ``-S`` so each ``.pth`` file can be timed, then imports
+#: the requested modules and reports where every loaded module came from
+PROFILE_SCRIPT = """
+import json, os, sys, sysconfig, time
+import site
+timings = []
+_addpackage = site.addpackage
+def addpackage(sitedir, name, known_paths):
+    start = time.time()
+    try:
+        return _addpackage(sitedir, name, known_paths)
+    finally:
+        timings.append([os.path.join(sitedir, name), time.time() - start])
+site.addpackage = addpackage
+start = time.time()
+site.main()
+site_time = time.time() - start
+sys.stderr.write("\\n%s\\n" % {marker!r})
+sys.stderr.flush()
+module_times = []
+for name in json.loads(sys.argv[1]):
+    start = time.time()
+    __import__(name)
+    module_times.append([name, time.time() - start])
+modules = {{}}
+for name, module in list(sys.modules.items()):
+    path = getattr(module, "__file__", None)
+    search = getattr(module, "__path__", None)
+    modules[name] = [path, list(search) if search is not None and path is None else None]
+print(json.dumps({{
+    "site": site_time, "pth": timings, "modules": module_times, "loaded": modules,
+    "stdlib": [sysconfig.get_path("stdlib"), sysconfig.get_path("platstdlib")],
+}}))
+""".format(marker=PHASE_MARKER)
+
+IMPORTTIME_RE = re.compile(r"^import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \| (?P<name>.*)$")
+
+STDLIB = "<stdlib>"
+
+UNKNOWN = "<unknown>"
+
+
+def parse_importtime(text):
+    """Parse the output of ``python -X importtime``.
+
+    :param str text: The standard error output of the interpreter
+    :return: A pair of lists of :class:`ImportTiming`, for the imports made while
+        :mod:`site` ran and for those made afterwards
+    :rtype: tuple
+    """
+
+    phases = ([], [])
+    phase = 0
+    for line in text.splitlines():
+        if line.strip() == PHASE_MARKER:
+            phase = 1
+            continue
+        match = IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        name = match.group("name")
+        stripped = name.lstrip(" ")
+        phases[phase].append(ImportTiming(
+            stripped, int(match.group("self")), int(match.group("cumulative")),
+            depth=(len(name) - len(stripped)) // 2
+        ))
+    return phases
+
+
+class ImportTiming(object):
+    """The time spent importing a single module, in microseconds."""
+
+    __slots__ = ("name", "self_us", "cumulative_us", "depth", "dist")
+
+    def __init__(self, name, self_us, cumulative_us, depth=0, dist=None):
+        self.name = name
+        self.self_us = self_us
+        self.cumulative_us = cumulative_us
+        self.depth = depth
+        self.dist = dist
+
+    def __repr__(self):
+        return "<ImportTiming {0} self={1}us cumulative={2}us ({3})>".format(
+            self.name, self.self_us, self.cumulative_us, self.dist
+        )
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "self_us": self.self_us,
+            "cumulative_us": self.cumulative_us,
+            "depth": self.depth,
+            "dist": self.dist,
+        }
+
+
+class FileOwners(object):
+    """Maps installed files, and the directories holding them, to their distributions."""
+
+    def __init__(self, lib_dirs):
+        self.files = {}
+        self.dirs = {}
+        for metadata_dir in iter_metadata_dirs(lib_dirs):
+            lib_dir = os.path.normcase(os.path.realpath(os.path.dirname(metadata_dir.path)))
+            for path, _, _ in metadata_dir.get_installed_files():
+                path = os.path.normcase(os.path.realpath(path))
+                self.files.setdefault(path, metadata_dir.key)
+                directory = os.path.dirname(path)
+                while directory.startswith(lib_dir + os.sep):
+                    self.dirs.setdefault(directory, set()).add(metadata_dir.key)
+                    directory = os.path.dirname(directory)
+        self.stdlib_dirs = []
+
+    def add_stdlib_dirs(self, paths):
+        """Attribute files under the supplied directories to the standard library."""
+        self.stdlib_dirs.extend(
+            os.path.normcase(os.path.realpath(path)) + os.sep for path in paths if path
+        )
+
+    def get_owner(self, path):
+        """Get the distribution which installed a file, ``<stdlib>`` or ``<unknown>``."""
+        if not path:
+            return STDLIB
+        path = os.path.normcase(os.path.realpath(path))
+        owner = self.files.get(path)
+        if owner is None and path.endswith((".pyc", ".pyo")):
+            owner = self.files.get(path[:-1])
+        if owner is not None:
+            return owner
+        if any(path.startswith(stdlib_dir) for stdlib_dir in self.stdlib_dirs):
+            return STDLIB
+        return UNKNOWN
+
+    def get_directory_owners(self, path):
+        """Get the distributions which installed files anywhere inside a directory."""
+        return sorted(self.dirs.get(os.path.normcase(os.path.realpath(path)), ()))
+
+
+class StartupReport(object):
+    """Where the startup time of an environment's interpreter is spent.
+
+    All times are in microseconds.
+    """
+
+    def __init__(self, total_us=0, site_us=0, pth_files=None, site_imports=None,
+                 module_imports=None, namespace_packages=None):
+        #: The wall clock time of the profiled interpreter run
+        self.total_us = total_us
+        #: The time spent running :mod:`site`, including every ``.pth`` file
+        self.site_us = site_us
+        #: ``.pth`` files as dicts of ``path``, ``us`` and ``dist``, slowest first
+        self.pth_files = pth_files or []
+        #: The :class:`ImportTiming` of every module imported while :mod:`site` ran
+        self.site_imports = site_imports or []
+        #: The :class:`ImportTiming` of every module imported by the profiled modules
+        self.module_imports = module_imports or []
+        #: Namespace packages which were imported, mapped to the distributions providing them
+        self.namespace_packages = namespace_packages or {}
+
+    def __repr__(self):
+        return "<StartupReport total={0}us site={1}us pth_files={2}>".format(
+            self.total_us, self.site_us, len(self.pth_files)
+        )
+
+    @property
+    def imports(self):
+        return self.site_imports + self.module_imports
+
+    def get_distribution_costs(self):
+        """Sum the self time of every import by the distribution it belongs to.
+
+        ``.pth`` files which don't import anything are included in their distribution's
+        total as well.
+
+        :return: Pairs of distribution name and microseconds, most expensive first
+        :rtype: list
+        """
+
+        costs = {}
+        for timing in self.imports:
+            costs[timing.dist] = costs.get(timing.dist, 0) + timing.self_us
+        for pth in self.pth_files:
+            if pth["dist"] is not None:
+                # Imports triggered by the .pth file are already counted above
+                own = pth["us"] - sum(
+                    t.cumulative_us for t in self.site_imports
+                    if t.depth == 0 and t.name in pth["imports"]
+                )
+                costs[pth["dist"]] = costs.get(pth["dist"], 0) + max(own, 0)
+        return sorted(costs.items(), key=lambda item: (-item[1], item[0] or ""))
+
+    def check_budget(self, total_us=None, site_us=None, per_distribution_us=None):
+        """Compare the report with a startup budget.
+
+        :param int total_us: The budget for the whole interpreter run
+        :param int site_us: The budget for :mod:`site` and ``.pth`` processing
+        :param int per_distribution_us: The budget for any single distribution
+        :return: A description of each exceeded budget, empty if within budget
+        :rtype: list
+        """
+
+        violations = []
+        if total_us is not None and self.total_us > total_us:
+            violations.append("Startup took {0}us, over the budget of {1}us".format(
+                self.total_us, total_us
+            ))
+        if site_us is not None and self.site_us > site_us:
+            violations.append("site took {0}us, over the budget of {1}us".format(
+                self.site_us, site_us
+            ))
+        if per_distribution_us is not None:
+            for dist, cost in self.get_distribution_costs():
+                if dist not in (STDLIB, UNKNOWN) and cost > per_distribution_us:
+                    violations.append("{0} took {1}us, over the budget of {2}us".format(
+                        dist, cost, per_distribution_us
+                    ))
+        return violations
+
+    def as_dict(self):
+        return {
+            "total_us": self.total_us,
+            "site_us": self.site_us,
+            "pth_files": self.pth_files,
+            "distributions": [list(item) for item in self.get_distribution_costs()],
+            "namespace_packages": self.namespace_packages,
+            "site_imports": [timing.as_dict() for timing in self.site_imports],
+            "module_imports": [timing.as_dict() for timing in self.module_imports],
+        }
+
+    @classmethod
+    def from_output(cls, out, err, owners, total_us=0):
+        """Build a report from the output of :data:`PROFILE_SCRIPT`.
+
+        :param str out: The standard output of the profiled interpreter
+        :param str err: The standard error output, holding the ``-X importtime`` data
+        :param owners: The file ownership index of the environment
+        :type owners: :class:`~mork.startup.FileOwners`
+        :param int total_us: The measured wall clock time of the run
+        :rtype: :class:`~mork.startup.StartupReport`
+        """
+
+        data = json.loads(out.strip().splitlines()[-1])
+        owners.add_stdlib_dirs(data["stdlib"])
+        site_imports, module_imports = parse_importtime(err)
+        loaded = data["loaded"]
+        namespace_packages = {}
+        for timing in site_imports + module_imports:
+            path, search = loaded.get(timing.name, [None, None])
+            if path is None and search:
+                dists = set()
+                for directory in search:
+                    dists.update(owners.get_directory_owners(directory))
+                namespace_packages[timing.name] = sorted(dists)
+                timing.dist = dists.pop() if len(dists) == 1 else UNKNOWN
+            else:
+                timing.dist = owners.get_owner(path)
+        pth_files = []
+        for path, seconds in data["pth"]:
+            pth_files.append({
+                "path": path,
+                "us": int(seconds * 1000000),
+                "dist": owners.files.get(os.path.normcase(os.path.realpath(path))),
+                "imports": cls._get_pth_imports(path),
+            })
+        pth_files.sort(key=lambda pth: -pth["us"])
+        return cls(
+            total_us=total_us, site_us=int(data["site"] * 1000000), pth_files=pth_files,
+            site_imports=site_imports, module_imports=module_imports,
+            namespace_packages=namespace_packages,
+        )
+
+    @staticmethod
+    def _get_pth_imports(path):
+        imports = []
+        try:
+            with open(path, "r") as fh:
+                lines = fh.readlines()
+        except (IOError, OSError):
+            return imports
+        for line in lines:
+            if line.startswith(("import ", "import\t")):
+                for statement in line.split(";"):
+                    statement = statement.strip()
+                    if statement.startswith("import "):
+                        imports.extend(
+                            name.strip().split(" ")[0]
+                            for name in statement[len("import "):].split(",")
+                        )
+        return imports
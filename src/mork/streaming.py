@@ -0,0 +1,131 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import codecs
+import os
+import subprocess
+
+import six
+
+
+#: The most bytes read for a single line; longer lines are yielded in parts
+MAX_LINE_LENGTH = 65536
+
+
+class StreamedCommand(object):
+    """A running subprocess whose output is consumed as it is produced.
+
+    Iterating over the command yields decoded lines (or chunks, if a ``chunk_size`` is
+    supplied) as they arrive from the subprocess, so only a single line or chunk is
+    held in memory at any point.  Lines longer than ``max_line_length`` bytes are
+    yielded in parts, the last of which ends with the newline.  Once iteration is
+    exhausted the process is reaped and :attr:`returncode` is populated.
+
+    >>> cmd = venv.run(["pip", "list"], stream=True)
+    >>> for line in cmd:
+            print(line, end="")
+    >>> cmd.returncode
+    0
+    """
+
+    def __init__(self, popen, chunk_size=None, encoding="utf-8",
+                 max_line_length=MAX_LINE_LENGTH):
+        self.popen = popen
+        self.chunk_size = chunk_size
+        self.max_line_length = max_line_length
+        self.encoding = encoding
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+
+    def __repr__(self):
+        return "<StreamedCommand pid={0!r} returncode={1!r}>".format(
+            self.pid, self.returncode
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        stream = self.popen.stdout
+        if stream is None:
+            self.wait()
+            return
+        if self.chunk_size:
+            fd = stream.fileno()
+            reader = iter(lambda: os.read(fd, self.chunk_size), b"")
+        else:
+            reader = iter(lambda: stream.readline(self.max_line_length), b"")
+        for data in reader:
+            text = self._decoder.decode(data)
+            if text:
+                yield text
+        remainder = self._decoder.decode(b"", final=True)
+        if remainder:
+            yield remainder
+        stream.close()
+        self.wait()
+
+    @property
+    def pid(self):
+        return self.popen.pid
+
+    @property
+    def returncode(self):
+        """The exit status of the subprocess, or ``None`` if it is still running."""
+        return self.popen.returncode
+
+    def wait(self):
+        """Wait for the subprocess to exit, discarding any unread output.
+
+        :return: The return code of the subprocess
+        :rtype: int
+        """
+
+        stream = self.popen.stdout
+        if stream is not None and not stream.closed:
+            for _ in iter(lambda: stream.read(65536), b""):
+                pass
+            stream.close()
+        return self.popen.wait()
+
+    def close(self):
+        """Terminate the subprocess if it is still running and release its pipes."""
+        if self.popen.poll() is None:
+            self.popen.kill()
+        if self.popen.stdout is not None:
+            self.popen.stdout.close()
+        self.popen.wait()
+
+
+def stream_command(cmd, cwd=os.curdir, env=None, output=None, chunk_size=None,
+                   combine_stderr=True, encoding="utf-8", max_line_length=MAX_LINE_LENGTH):
+    """Start a command and return a :class:`StreamedCommand` for consuming its output.
+
+    :param list cmd: The command to execute
+    :param str cwd: The working directory in which to execute the command
+    :param dict env: The environment to execute the command with, defaults to the current one
+    :param output: A file descriptor or file object to send output to directly, bypassing
+        python entirely.  When supplied, iterating the command yields nothing.
+    :param int chunk_size: Yield raw chunks of at most this many bytes instead of lines
+    :param bool combine_stderr: Whether to merge stderr into the streamed output, otherwise
+        stderr is inherited from the calling process
+    :param str encoding: The encoding used to decode the streamed output
+    :param int max_line_length: The most bytes to read for a single line, longer lines are
+        yielded in parts
+    :return: A running command
+    :rtype: :class:`~mork.streaming.StreamedCommand`
+    """
+
+    if output is not None and not isinstance(output, six.integer_types):
+        output = output.fileno()
+    stdout = output if output is not None else subprocess.PIPE
+    stderr = subprocess.STDOUT if combine_stderr else None
+    popen = subprocess.Popen(
+        cmd, cwd=cwd, env=env, stdout=stdout, stderr=stderr
+    )
+    return StreamedCommand(
+        popen, chunk_size=chunk_size, encoding=encoding, max_line_length=max_line_length
+    )
@@ -0,0 +1,275 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import hashlib
+import io
+import json
+import os
+import tempfile
+
+import vistir
+
+from .tags import WheelFilename
+from .utils import canonicalize_name
+
+
+TAG_INDEX_FORMAT = 1
+
+
+class WheelRecord(object):
+    """A wheel filename parsed once, with its tags interned as a tag set id."""
+
+    __slots__ = ("path", "filename", "name", "key", "version", "build", "tagset")
+
+    def __init__(self, path, filename, name, version, build, tagset):
+        self.path = path
+        self.filename = filename
+        self.name = name
+        self.key = canonicalize_name(name)
+        self.version = version
+        self.build = build
+        #: The id of the wheel's set of tags in its :class:`TagIndex`
+        self.tagset = tagset
+
+    def __repr__(self):
+        return "<WheelRecord {0}=={1} ({2!r})>".format(self.name, self.version, self.path)
+
+
+class TagRanking(object):
+    """The preference of an environment for each tag set of a :class:`TagIndex`.
+
+    Tags are compared as integer ids, and the rank of each distinct tag set is computed
+    once with a set intersection, so ranking a wheel is a list lookup.
+
+    :param index: The index whose tag sets are ranked
+    :type index: :class:`~mork.tagindex.TagIndex`
+    :param list supported_tags: The tags of the environment, most preferred first
+    """
+
+    def __init__(self, index, supported_tags):
+        self.index = index
+        self.supported_tags = list(supported_tags)
+        self._rank_by_tag = dict(
+            (tag, rank) for rank, tag in reversed(list(enumerate(self.supported_tags)))
+        )
+        #: The rank of each tag id, or None if it isn't supported
+        self._tag_ranks = []
+        self._supported_ids = set()
+        #: The best rank of each tag set id, or None if no tag is supported
+        self._tagset_ranks = []
+
+    def __repr__(self):
+        return "<TagRanking tags={0}>".format(len(self.supported_tags))
+
+    def _update(self):
+        tags = self.index.tags
+        for tag_id in range(len(self._tag_ranks), len(tags)):
+            rank = self._rank_by_tag.get(tags[tag_id])
+            self._tag_ranks.append(rank)
+            if rank is not None:
+                self._supported_ids.add(tag_id)
+        tagsets = self.index.tagsets
+        for tagset in tagsets[len(self._tagset_ranks):]:
+            common = tagset & self._supported_ids
+            self._tagset_ranks.append(
+                min(self._tag_ranks[tag_id] for tag_id in common) if common else None
+            )
+
+    def get(self, tagset):
+        """Get the rank of the best supported tag of a tag set, lower is better.
+
+        :param int tagset: A tag set id of the index
+        :return: The rank, or None if the environment supports none of the tags
+        :rtype: int or None
+        """
+
+        if tagset >= len(self._tagset_ranks):
+            self._update()
+        return self._tagset_ranks[tagset]
+
+
+class TagIndex(object):
+    """A persistent index of the wheels in local directories.
+
+    Every wheel filename is parsed once into a :class:`WheelRecord`; the distinct tags
+    and sets of tags are interned as integers, so the many wheels built for the same
+    platforms share them.  The records of each directory are stored as JSON and reused
+    until the directory is modified, when only the filenames which weren't seen before
+    are parsed.
+
+    :param str root: The directory to store the indexes in, defaults to
+        ``$MORK_TAG_INDEX`` or ``$XDG_CACHE_HOME/mork/tags``
+    :param bool persist: Whether to store indexes at all, rather than only in memory
+    """
+
+    def __init__(self, root=None, persist=True):
+        if persist and root is None:
+            root = self.get_default_root()
+        self.root = vistir.compat.Path(root) if persist else None
+        #: Tag strings by id
+        self.tags = []
+        self._tag_ids = {}
+        #: Frozen sets of tag ids by tag set id
+        self.tagsets = []
+        self._tagset_ids = {}
+        #: The modification time and records of each loaded directory
+        self.directories = {}
+        self._rankings = {}
+
+    def __repr__(self):
+        return "<TagIndex {0!r} directories={1} tagsets={2}>".format(
+            self.root.as_posix() if self.root is not None else None,
+            len(self.directories), len(self.tagsets)
+        )
+
+    @classmethod
+    def get_default_root(cls):
+        cache_dir = os.environ.get("MORK_TAG_INDEX")
+        if not cache_dir:
+            cache_dir = os.path.join(
+                os.environ.get("XDG_CACHE_HOME", "~/.cache"), "mork", "tags"
+            )
+        return vistir.compat.Path(os.path.expandvars(cache_dir)).expanduser()
+
+    def get_path(self, directory):
+        directory_hash = hashlib.sha256(vistir.misc.to_bytes(directory)).hexdigest()
+        return self.root.joinpath("{0}.json".format(directory_hash[:16]))
+
+    def intern(self, tags):
+        """Get the id of a set of tag strings, adding it to the index if it is new.
+
+        :rtype: int
+        """
+
+        tag_ids = []
+        for tag in tags:
+            tag_id = self._tag_ids.get(tag)
+            if tag_id is None:
+                tag_id = self._tag_ids[tag] = len(self.tags)
+                self.tags.append(tag)
+            tag_ids.append(tag_id)
+        tagset = frozenset(tag_ids)
+        tagset_id = self._tagset_ids.get(tagset)
+        if tagset_id is None:
+            tagset_id = self._tagset_ids[tagset] = len(self.tagsets)
+            self.tagsets.append(tagset)
+        return tagset_id
+
+    def get_tags(self, tagset):
+        """Get the tag strings of a tag set id.
+
+        :rtype: frozenset
+        """
+
+        return frozenset(self.tags[tag_id] for tag_id in self.tagsets[tagset])
+
+    def rank(self, supported_tags):
+        """Get the ranking of the index's tag sets for an environment.
+
+        :param list supported_tags: The tags of the environment, most preferred first
+        :rtype: :class:`~mork.tagindex.TagRanking`
+        """
+
+        key = tuple(supported_tags)
+        ranking = self._rankings.get(key)
+        if ranking is None:
+            ranking = self._rankings[key] = TagRanking(self, key)
+        return ranking
+
+    def load(self, directory):
+        """Get the records of the wheels in a directory.
+
+        :param str directory: The directory holding the wheels
+        :return: The records, ordered by filename
+        :rtype: list(:class:`~mork.tagindex.WheelRecord`)
+        """
+
+        try:
+            st = os.stat(directory)
+        except OSError:
+            return []
+        mtime = getattr(st, "st_mtime_ns", None)
+        if mtime is None:
+            mtime = repr(st.st_mtime)
+        loaded = self.directories.get(directory)
+        if loaded is not None and loaded[0] == mtime:
+            return loaded[1]
+        stored = self._read(directory)
+        if stored is not None and stored["mtime"] == mtime:
+            records = [self._from_entry(directory, entry, stored) for entry in stored["wheels"]]
+        else:
+            previous = {}
+            if stored is not None:
+                previous = dict((entry[0], entry) for entry in stored["wheels"])
+            records = []
+            for entry in sorted(os.listdir(directory)):
+                if entry in previous:
+                    records.append(self._from_entry(directory, previous[entry], stored))
+                    continue
+                filename = WheelFilename.parse(entry)
+                if filename is not None:
+                    records.append(WheelRecord(
+                        os.path.join(directory, entry), entry, filename.name,
+                        filename.version, filename.build, self.intern(filename.tags)
+                    ))
+            if self.root is not None:
+                self._write(directory, mtime, records)
+        self.directories[directory] = (mtime, records)
+        return records
+
+    def _from_entry(self, directory, entry, stored):
+        filename, name, version, build, tagset = entry
+        tags = [stored["tags"][tag_id] for tag_id in stored["tagsets"][tagset]]
+        return WheelRecord(
+            os.path.join(directory, filename), filename, name, version, build,
+            self.intern(tags)
+        )
+
+    def _read(self, directory):
+        if self.root is None:
+            return None
+        try:
+            with io.open(self.get_path(directory).as_posix(), "r", encoding="utf-8") as fh:
+                stored = json.load(fh)
+        except (IOError, OSError, ValueError):
+            return None
+        if stored.get("format") != TAG_INDEX_FORMAT or stored.get("directory") != directory:
+            return None
+        return stored
+
+    def _write(self, directory, mtime, records):
+        # Only the tags of this directory are stored, renumbered from zero
+        tag_ids, tagset_ids, tags, tagsets, wheels = {}, {}, [], [], []
+        for record in records:
+            if record.tagset not in tagset_ids:
+                tagset_ids[record.tagset] = len(tagsets)
+                local = []
+                for tag_id in sorted(self.tagsets[record.tagset]):
+                    if tag_id not in tag_ids:
+                        tag_ids[tag_id] = len(tags)
+                        tags.append(self.tags[tag_id])
+                    local.append(tag_ids[tag_id])
+                tagsets.append(local)
+            wheels.append([
+                record.filename, record.name, record.version, record.build,
+                tagset_ids[record.tagset]
+            ])
+        data = json.dumps({
+            "format": TAG_INDEX_FORMAT,
+            "directory": directory,
+            "mtime": mtime,
+            "tags": tags,
+            "tagsets": tagsets,
+            "wheels": wheels,
+        }, separators=(",", ":"))
+        path = self.get_path(directory)
+        vistir.path.mkdir_p(path.parent.as_posix())
+        fd, tmp_path = tempfile.mkstemp(prefix=".mork-tags", dir=path.parent.as_posix())
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(vistir.misc.to_bytes(data))
+            getattr(os, "replace", os.rename)(tmp_path, path.as_posix())
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
@@ -0,0 +1,168 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import os
+import platform
+import re
+import sysconfig
+
+from .wheelcache import IMPLEMENTATION_ABBREVIATIONS
+
+
+WHEEL_FILENAME_RE = re.compile(
+    r"^(?P<name>[^-]+)-(?P<version>[^-]+)(-(?P<build>\d[^-]*))?"
+    r"-(?P<python>[^-]+)-(?P<abi>[^-]+)-(?P<platform>[^-]+)\.whl$"
+)
+
+#: The oldest glibc each architecture has manylinux wheels for
+MANYLINUX_MINIMUM_GLIBC = {"x86_64": (2, 5), "i686": (2, 5)}
+
+MANYLINUX_DEFAULT_MINIMUM_GLIBC = (2, 17)
+
+#: Legacy manylinux tags and the glibc versions they are aliases of
+MANYLINUX_ALIASES = {(2, 5): "manylinux1", (2, 12): "manylinux2010", (2, 17): "manylinux2014"}
+
+#: Architectures which macOS wheels built for ``x86_64`` machines may also be tagged with
+MACOS_INTEL_ARCHES = ("intel", "fat64", "fat32", "universal")
+
+
+class WheelFilename(object):
+    """The fields encoded in a wheel's filename, see :pep:`427`."""
+
+    __slots__ = ("name", "version", "build", "tags")
+
+    def __init__(self, name, version, build, tags):
+        self.name = name
+        self.version = version
+        self.build = build
+        #: Every ``python-abi-platform`` tag the wheel supports, expanded from the
+        #: compressed tag sets of the filename
+        self.tags = tags
+
+    def __repr__(self):
+        return "<WheelFilename {0}=={1} tags={2}>".format(
+            self.name, self.version, len(self.tags)
+        )
+
+    @classmethod
+    def parse(cls, filename):
+        """Parse a wheel filename.
+
+        :param str filename: The basename of a wheel
+        :return: The parsed filename, or None if it isn't a valid wheel filename
+        :rtype: :class:`~mork.tags.WheelFilename` or None
+        """
+
+        match = WHEEL_FILENAME_RE.match(filename)
+        if not match:
+            return None
+        tags = frozenset(
+            "{0}-{1}-{2}".format(python, abi, plat)
+            for python in match.group("python").split(".")
+            for abi in match.group("abi").split(".")
+            for plat in match.group("platform").split(".")
+        )
+        return cls(match.group("name"), match.group("version"), match.group("build"), tags)
+
+
+def get_glibc_version():
+    """The ``(major, minor)`` version of the C library of this host, if it is glibc."""
+    try:
+        version = os.confstr("CS_GNU_LIBC_VERSION")
+    except (AttributeError, OSError, ValueError):
+        return None
+    if not version or not version.startswith("glibc "):
+        return None
+    parts = version.split(" ", 1)[1].split(".")
+    try:
+        return int(parts[0]), int(parts[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def get_platforms(platform_tag=None):
+    """Get the platform tags this host supports, most specific first.
+
+    :param str platform_tag: The base platform tag, defaults to that of this host
+    :rtype: list
+    """
+
+    platform_tag = platform_tag or sysconfig.get_platform().replace("-", "_").replace(".", "_")
+    platforms = []
+    if platform_tag.startswith("linux_"):
+        arch = platform_tag[len("linux_"):]
+        glibc = get_glibc_version()
+        if glibc is not None:
+            minimum = MANYLINUX_MINIMUM_GLIBC.get(arch, MANYLINUX_DEFAULT_MINIMUM_GLIBC)
+            for minor in range(glibc[1], minimum[1] - 1, -1):
+                platforms.append("manylinux_{0}_{1}_{2}".format(glibc[0], minor, arch))
+                alias = MANYLINUX_ALIASES.get((glibc[0], minor))
+                if alias:
+                    platforms.append("{0}_{1}".format(alias, arch))
+    elif platform_tag.startswith("macosx_"):
+        _, major, minor, arch = platform_tag.split("_", 3)
+        if major == "10" and minor == "16":
+            # Interpreters built against old SDKs report Big Sur and later as 10.16
+            release = platform.mac_ver()[0].split(".")
+            if release[0].isdigit():
+                major, minor = release[0], "0"
+        arches = [arch, "universal2"]
+        if arch == "x86_64":
+            arches.extend(MACOS_INTEL_ARCHES)
+        versions = [(major_version, 0) for major_version in range(int(major), 10, -1)]
+        versions.extend((10, minor_version) for minor_version in range(
+            int(minor) if int(major) == 10 else 16, 3, -1
+        ))
+        for version in versions:
+            for name in arches:
+                platforms.append("macosx_{0}_{1}_{2}".format(version[0], version[1], name))
+        return platforms + ["any"]
+    platforms.append(platform_tag)
+    return platforms + ["any"]
+
+
+def get_supported_tags(metadata, platforms=None):
+    """Get every wheel tag an environment supports, most preferred first.
+
+    The order follows the one used by pip: interpreter specific tags for each platform,
+    the stable ABI of older versions, generic python tags for each platform and finally
+    platform independent tags.
+
+    :param metadata: The metadata of the environment
+    :type metadata: :class:`~mork.metadata.EnvironmentMetadata`
+    :param list platforms: The platform tags to support, see :func:`get_platforms`
+    :return: ``python-abi-platform`` tags
+    :rtype: list
+    """
+
+    implementation = (metadata.implementation or platform.python_implementation()).lower()
+    version = (metadata.py_version_short or "").split(".")
+    major, minor = int(version[0]), int(version[1])
+    abbreviation = IMPLEMENTATION_ABBREVIATIONS.get(implementation, implementation)
+    interpreter = "{0}{1}{2}".format(abbreviation, major, minor)
+    platforms = platforms if platforms is not None else get_platforms()
+    specific = [plat for plat in platforms if plat != "any"]
+    tags = []
+    abis = []
+    if implementation == "cpython":
+        abis.append("cp{0}{1}{2}".format(major, minor, metadata.abiflags or ""))
+        if major == 3:
+            abis.append("abi3")
+    abis.append("none")
+    for abi in abis:
+        for plat in specific:
+            tags.append("{0}-{1}-{2}".format(interpreter, abi, plat))
+    if implementation == "cpython" and major == 3:
+        for older in range(minor - 1, 1, -1):
+            for plat in specific:
+                tags.append("cp3{0}-abi3-{1}".format(older, plat))
+    python_versions = ["py{0}{1}".format(major, minor), "py{0}".format(major)]
+    python_versions.extend("py{0}{1}".format(major, older) for older in range(minor - 1, -1, -1))
+    for python in python_versions:
+        for plat in specific:
+            tags.append("{0}-none-{1}".format(python, plat))
+    tags.append("{0}-none-any".format(interpreter))
+    for python in python_versions:
+        tags.append("{0}-none-any".format(python))
+    return tags
@@ -0,0 +1,256 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import atexit
+import errno
+import os
+import shutil
+import tempfile
+import threading
+
+from .utils import canonicalize_name, iter_metadata_dirs
+
+
+TRASH_PREFIX = ".mork-trash-"
+
+COMPILED_SUFFIXES = (".pyc", ".pyo")
+
+_pending_deletes = []
+_pending_lock = threading.Lock()
+
+
+def _wait_for_pending_deletes():
+    with _pending_lock:
+        threads = list(_pending_deletes)
+    for thread in threads:
+        thread.join()
+
+
+atexit.register(_wait_for_pending_deletes)
+
+
+def purge_trash(directories):
+    """Delete trash left behind in a set of directories by interrupted uninstalls.
+
+    :param list directories: The library and script directories to clean
+    :return: The trash directories which were removed
+    :rtype: list
+    """
+
+    removed = []
+    for directory in directories:
+        try:
+            entries = os.listdir(directory)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.startswith(TRASH_PREFIX):
+                path = os.path.join(directory, entry)
+                shutil.rmtree(path, ignore_errors=True)
+                removed.append(path)
+    return removed
+
+
+def _is_within(path, directory):
+    return path.startswith(directory.rstrip(os.sep) + os.sep)
+
+
+class Uninstaller(object):
+    """Removes an installed distribution using only its own metadata.
+
+    The files listed in ``RECORD`` (or ``installed-files.txt`` for legacy installs) are
+    grouped by the top-level entry of the library directory they live in.  Top-level
+    directories which only contain files of the distribution are moved to a trash
+    directory with a single rename each, and any other files are moved individually.
+    Until :meth:`commit` is called every move can be undone with :meth:`rollback`, and
+    the trash is then deleted in a background thread.
+
+    >>> uninstaller = Uninstaller.from_name("numpy", venv.lib_dirs)
+    >>> uninstaller.remove()
+    >>> uninstaller.commit()
+
+    :param metadata_dir: The metadata entry of the distribution to remove
+    :type metadata_dir: :class:`~mork.utils.MetadataDir`
+    :param list lib_dirs: The library directories of the environment
+    """
+
+    def __init__(self, metadata_dir, lib_dirs):
+        self.metadata_dir = metadata_dir
+        self.lib_dirs = [os.path.normpath(lib_dir) for lib_dir in lib_dirs if lib_dir]
+        #: The recorded paths of the distribution which existed when it was removed
+        self.paths = set()
+        #: Pairs of ``(original path, path in the trash)`` for every completed move
+        self.moved = []
+        self.trash_dirs = {}
+        self.committed = False
+
+    def __repr__(self):
+        return "<Uninstaller {0!r} moved={1}>".format(self.metadata_dir, len(self.moved))
+
+    def __bool__(self):
+        return bool(self.paths)
+
+    __nonzero__ = __bool__
+
+    @classmethod
+    def from_name(cls, name, lib_dirs):
+        """Find an installed distribution by name.
+
+        :param str name: The name of the distribution
+        :param list lib_dirs: The library directories of the environment
+        :return: An uninstaller for the distribution, or None if it isn't installed
+        :rtype: :class:`~mork.uninstall.Uninstaller` or None
+        """
+
+        key = canonicalize_name(name)
+        for metadata_dir in iter_metadata_dirs(lib_dirs):
+            if metadata_dir.key == key:
+                return cls(metadata_dir, lib_dirs)
+        return None
+
+    def get_owned_files(self):
+        files = set(path for path, _, _ in self.metadata_dir.get_installed_files())
+        for root, _, filenames in os.walk(self.metadata_dir.path):
+            files.update(os.path.join(root, filename) for filename in filenames)
+        return set(os.path.normpath(path) for path in files)
+
+    def get_lib_dir(self, path):
+        for lib_dir in self.lib_dirs:
+            if _is_within(path, lib_dir):
+                return lib_dir
+        return None
+
+    def _owns_tree(self, directory, owned):
+        for root, _, filenames in os.walk(directory):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                if path not in owned and not filename.endswith(COMPILED_SUFFIXES):
+                    return False
+        return True
+
+    def get_removal_plan(self):
+        """Work out the paths to move into the trash.
+
+        :return: Top-level directories owned entirely by the distribution, followed by
+            individual files elsewhere
+        :rtype: list
+        """
+
+        owned = self.get_owned_files()
+        groups = {}
+        loose = []
+        for path in sorted(owned):
+            lib_dir = self.get_lib_dir(path)
+            if lib_dir is None:
+                loose.append(path)
+                continue
+            top = os.path.join(lib_dir, os.path.relpath(path, lib_dir).split(os.sep, 1)[0])
+            groups.setdefault(top, []).append(path)
+        plan = []
+        for top in sorted(groups):
+            if top == groups[top][0] or os.path.basename(top) == "__pycache__" or (
+                os.path.islink(top) or not os.path.isdir(top)
+            ):
+                loose.extend(groups[top])
+            elif self._owns_tree(top, owned):
+                plan.append(top)
+            else:
+                # Shared directories, such as namespace packages, are left in place
+                loose.extend(groups[top])
+        plan.extend(path for path in loose if os.path.lexists(path))
+        self.paths = set(path for path in owned if os.path.lexists(path))
+        return plan
+
+    def get_trash_dir(self, path):
+        location = self.get_lib_dir(path) or os.path.dirname(path)
+        if location not in self.trash_dirs:
+            self.trash_dirs[location] = tempfile.mkdtemp(prefix=TRASH_PREFIX, dir=location)
+        return self.trash_dirs[location]
+
+    def _move(self, source, target):
+        try:
+            os.rename(source, target)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            shutil.move(source, target)
+
+    def remove(self):
+        """Move every file of the distribution into the trash.
+
+        If any move fails, the moves made so far are rolled back before re-raising.
+
+        :return: The paths which were moved
+        :rtype: list
+        """
+
+        plan = self.get_removal_plan()
+        try:
+            for path in plan:
+                trash_dir = self.get_trash_dir(path)
+                target = os.path.join(trash_dir, str(len(self.moved)))
+                self._move(path, target)
+                self.moved.append((path, target))
+        except Exception:
+            self.rollback()
+            raise
+        return [path for path, _ in self.moved]
+
+    def rollback(self):
+        """Restore every moved path to its original location."""
+        if self.committed:
+            raise RuntimeError("Cannot roll back a committed uninstall")
+        while self.moved:
+            path, target = self.moved.pop()
+            self._move(target, path)
+        self._delete_trash(background=False)
+
+    def commit(self, background=True):
+        """Remove empty directories left behind and delete the trash.
+
+        :param bool background: Whether to delete the trash in a background thread
+        :return: The thread deleting the trash, if one was started
+        :rtype: :class:`threading.Thread` or None
+        """
+
+        self.committed = True
+        for directory in sorted(
+            set(os.path.dirname(path) for path, _ in self.moved), key=len, reverse=True
+        ):
+            self._prune(directory)
+        return self._delete_trash(background=background)
+
+    def _prune(self, directory):
+        lib_dir = self.get_lib_dir(directory)
+        while lib_dir is not None and _is_within(directory, lib_dir):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                return
+            directory = os.path.dirname(directory)
+
+    def _delete_trash(self, background=True):
+        trash_dirs = list(self.trash_dirs.values())
+        self.trash_dirs = {}
+        if not trash_dirs:
+            return None
+
+        def delete():
+            try:
+                for trash_dir in trash_dirs:
+                    shutil.rmtree(trash_dir, ignore_errors=True)
+            finally:
+                with _pending_lock:
+                    if thread in _pending_deletes:
+                        _pending_deletes.remove(thread)
+
+        thread = threading.Thread(target=delete, name="mork-uninstall-cleanup")
+        thread.daemon = True
+        if not background:
+            delete()
+            return None
+        with _pending_lock:
+            _pending_deletes.append(thread)
+        thread.start()
+        return thread
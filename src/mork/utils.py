@@ -0,0 +1,166 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import csv
+import io
+import os
+import re
+
+import pkg_resources
+
+
+METADATA_DIR_RE = re.compile(
+    r"^(?P<name>.+?)-(?P<version>[^-]+?)(?:-py\d[^-]*)?(?:-[^-]+)?\.(?P<kind>dist-info|egg-info)$"
+)
+
+
+def canonicalize_name(name):
+    """Normalize a project name for comparison as described by :pep:`503`."""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def is_python_compatible(requires_python, python_version):
+    """Whether a ``Requires-Python`` specifier admits a python version.
+
+    A specifier which can't be parsed admits no version at all.
+
+    :param str requires_python: The specifier, e.g. ``>=3.6``, or None
+    :param str python_version: The full python version, e.g. ``3.7.1``
+    :rtype: bool
+    """
+
+    if not requires_python:
+        return True
+    try:
+        requirement = pkg_resources.Requirement.parse("python{0}".format(requires_python))
+    except ValueError:
+        return False
+    if requirement.key != "python":
+        return False
+    return requirement.specifier.contains(python_version, prereleases=True)
+
+
+class MetadataDir(object):
+    """An installed ``.dist-info`` or ``.egg-info`` entry found on a library path.
+
+    Only the name and version encoded in the entry's filename are read up front, so
+    building these is a single directory listing per library path.
+    """
+
+    def __init__(self, name, version, path, kind):
+        self.name = name
+        self.version = version
+        self.path = path
+        self.kind = kind
+
+    def __repr__(self):
+        return "<MetadataDir {0}=={1} ({2!r})>".format(self.name, self.version, self.path)
+
+    @property
+    def key(self):
+        return canonicalize_name(self.name)
+
+    @property
+    def location(self):
+        return os.path.dirname(self.path)
+
+    @property
+    def record_path(self):
+        """The path to the file listing the installed files of the distribution, if any"""
+        if self.kind == "dist-info":
+            candidate = os.path.join(self.path, "RECORD")
+        else:
+            candidate = os.path.join(self.path, "installed-files.txt")
+        if os.path.isfile(candidate):
+            return candidate
+        return None
+
+    def read_text(self, name):
+        """Read a metadata file from the entry, or None if it doesn't exist"""
+        if not os.path.isdir(self.path):
+            return None
+        try:
+            with io.open(os.path.join(self.path, name), "r", encoding="utf-8") as fh:
+                return fh.read()
+        except (IOError, OSError):
+            return None
+
+    def get_installed_files(self):
+        """Get the files installed by the distribution.
+
+        :return: A list of ``(absolute path, hash, size)`` tuples, with ``None`` for any
+            missing values
+        :rtype: list
+        """
+
+        record_path = self.record_path
+        if record_path is None:
+            return []
+        files = []
+        with io.open(record_path, "r", encoding="utf-8") as fh:
+            if self.kind == "dist-info":
+                for row in csv.reader(fh):
+                    if not row:
+                        continue
+                    path = row[0]
+                    digest = row[1] if len(row) > 1 and row[1] else None
+                    size = int(row[2]) if len(row) > 2 and row[2] else None
+                    files.append((os.path.normpath(os.path.join(self.location, path)), digest, size))
+            else:
+                for line in fh:
+                    path = line.strip()
+                    if path:
+                        files.append((os.path.normpath(os.path.join(self.path, path)), None, None))
+        return files
+
+
+def parse_entry_points(text):
+    """Parse the contents of an ``entry_points.txt`` file.
+
+    :param str text: The contents of the file
+    :return: A mapping of group names to mappings of entry point names to their values
+    :rtype: dict
+    """
+
+    groups = {}
+    group = None
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if not line or line.startswith(("#", ";")):
+            continue
+        if line.startswith("[") and line.endswith("]"):
+            group = groups.setdefault(line[1:-1].strip(), {})
+            continue
+        name, sep, value = line.partition("=")
+        if group is None or not sep:
+            continue
+        group[name.strip()] = value.strip()
+    return groups
+
+
+def iter_metadata_dirs(lib_dirs):
+    """Find the installed distributions on a set of library paths.
+
+    :param list lib_dirs: The library directories to scan
+    :return: The metadata entries found, in the order of the library paths
+    :rtype: iterator(:class:`~mork.utils.MetadataDir`)
+    """
+
+    seen = set()
+    for lib_dir in lib_dirs:
+        if not lib_dir or lib_dir in seen:
+            continue
+        seen.add(lib_dir)
+        try:
+            entries = sorted(os.listdir(lib_dir))
+        except OSError:
+            continue
+        for entry in entries:
+            match = METADATA_DIR_RE.match(entry)
+            if not match:
+                continue
+            yield MetadataDir(
+                match.group("name"), match.group("version"), os.path.join(lib_dir, entry),
+                match.group("kind")
+            )
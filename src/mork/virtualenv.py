@@ -6,9 +6,14 @@ import hashlib
 import importlib
 import json
 import os
+import platform
 import re
+import shutil
 import site
+import subprocess
 import sys
+import sysconfig
+import time
 
 from distutils.sysconfig import get_python_lib
 from sysconfig import get_paths
@@ -22,9 +27,60 @@ import distlib.scripts
 import distlib.wheel
 import vistir
 
+from .build import run_build
+from .bundle import Bundle, benchmark_bundle
+from .cache import DependencyTracker, invalidates, tracked_property
+from .check import InstalledRequirements, check_paths
+from .editable import EditableProject, install_editable
+from .entrypoints import EntryPointIndex
+from .fingerprint import get_fingerprint
+from .index import DEFAULT_SOURCES, IndexCache, SimpleIndex, make_session
+from .layers import read_layers, write_layers
+from .metadata import EnvironmentMetadata
+from .relocate import DEFAULT_WORKERS, Relocator, detect_prefix
+from .seed import SEED_PACKAGES, SeedStore, find_seed_wheels
+from .snapshot import Snapshot
+from .startup import PROFILE_SCRIPT, FileOwners, StartupReport
+from .streaming import stream_command
+from .tags import get_supported_tags
+from .uninstall import Uninstaller
+from .utils import canonicalize_name, iter_metadata_dirs
+from .wheelcache import WheelCache, get_interpreter_tag, hash_source_tree
+from .wheelhouse import Wheelhouse
+
+
+INSTALLED_STATE_PROPERTIES = ("entry_point_index",)
+
 
 class VirtualEnv(object):
-    def __init__(self, prefix=None, base_working_set=None, is_venv=True):
+    """A python environment which packages can be queried, installed and uninstalled in.
+
+    :param str prefix: The root of the environment, defaults to :data:`sys.prefix`
+    :param base_working_set: The working set of the calling environment
+    :type base_working_set: :class:`pkg_resources.WorkingSet`
+    :param bool is_venv: Whether the prefix is a virtual environment, defaults to True
+    :param str cache_backend: How cached properties are invalidated, see
+        :meth:`get_cache_tracker`, defaults to ``poll``
+    :param bool thread_safe: Whether to carry the environment explicitly to every
+        subprocess instead of activating it in the current process, defaults to False.
+        In this mode :data:`os.environ`, :data:`sys.path`, :data:`sys.prefix`,
+        :data:`sys.modules` and the working directory are never modified, so separate
+        instances can be used concurrently from multiple threads.  Packages are then
+        installed and uninstalled with the virtualenv's own pip.
+    :param list sources: Pipfile style source dictionaries which are queried for
+        outdated packages, defaults to PyPI
+    """
+
+    def __init__(self, prefix=None, base_working_set=None, is_venv=True, cache_backend="poll",
+                 thread_safe=False, sources=None):
+        self._modules = {}
+        self.sources = sources if sources else DEFAULT_SOURCES
+        self._finders = {}
+        self._session = None
+        #: A :class:`~mork.build.BuildRecord` for every package built with build options
+        self.build_records = []
+        self.cache_backend = cache_backend
+        self.thread_safe = thread_safe
         pkgresources = self.safe_import("pkg_resources")
         sys_module = self.safe_import("sys")
         own_dist = pkgresources.get_distribution(pkgresources.Requirement("mork"))
@@ -42,6 +98,92 @@ class VirtualEnv(object):
         self.prefix = vistir.compat.Path(prefix)
         super(VirtualEnv, self).__init__()
 
+    @classmethod
+    def create(cls, prefix, python=None, seed_packages=None, wheel_dirs=None, seed_store=None,
+               symlinks=True, system_site_packages=False, bases=None, **kwargs):
+        """Create a new virtual environment and return it ready for use
+
+        The environment is built with the standard library :mod:`venv` module, in process
+        when ``python`` is the running interpreter.  Seed packages are installed from
+        wheels in ``wheel_dirs`` or bundled with :mod:`ensurepip`, via a
+        :class:`~mork.seed.SeedStore` which hardlinks previously unpacked files rather
+        than running pip.  The metadata of the new environment is filled in up front rather
+        than probed from the new interpreter.
+
+        When ``bases`` are given the environment is layered on top of them, see
+        :meth:`set_layers`, and nothing is seeded unless ``seed_packages`` asks for it.
+
+        :param str prefix: The directory to create the environment in
+        :param str python: The base interpreter to use, defaults to :data:`sys.executable`
+        :param tuple seed_packages: The packages to install, defaults to whichever of pip,
+            setuptools and wheel have wheels available, so wheel is only seeded when one
+            of ``wheel_dirs`` provides it; pass an empty tuple to skip seeding
+        :param list wheel_dirs: Additional directories to find seed wheels in
+        :param seed_store: The store to unpack seed wheels into
+        :type seed_store: :class:`~mork.seed.SeedStore`
+        :param bool symlinks: Whether to symlink the interpreter rather than copying it
+        :param bool system_site_packages: Whether the environment can see the base
+            interpreter's site-packages
+        :param list bases: Environments or prefixes to layer the new environment on
+        :param kwargs: Additional arguments for the :class:`VirtualEnv`
+        :return: The new environment
+        :rtype: :class:`~mork.virtualenv.VirtualEnv`
+        :raises ValueError: If an explicitly requested seed package has no wheel available,
+            or a base environment is incompatible
+        :raises RuntimeError: If the environment could not be created
+        """
+
+        prefix = os.path.abspath(prefix)
+        in_process = python is None or os.path.realpath(python) == os.path.realpath(
+            sys.executable
+        )
+        if seed_packages is None and bases:
+            seed_packages = ()
+        requested = SEED_PACKAGES if seed_packages is None else seed_packages
+        wheels = find_seed_wheels(wheel_dirs, requested) if requested else {}
+        missing = [
+            name for name in (seed_packages or ()) if canonicalize_name(name) not in wheels
+        ]
+        if missing:
+            raise ValueError("No wheels available for seed packages: {0}".format(
+                ", ".join(missing)
+            ))
+        if in_process:
+            import venv
+            venv.EnvBuilder(
+                system_site_packages=system_site_packages, symlinks=symlinks, with_pip=False
+            ).create(prefix)
+            scheme = "nt" if os.name == "nt" else "posix_prefix"
+            paths = sysconfig.get_paths(scheme, vars={"base": prefix, "platbase": prefix})
+            metadata = EnvironmentMetadata(
+                prefix, version=platform.python_version(),
+                implementation=platform.python_implementation(),
+                base_prefix=getattr(sys, "base_prefix", sys.prefix),
+                abiflags=getattr(sys, "abiflags", ""), purelib=paths["purelib"],
+                platlib=paths["platlib"], scripts=paths["scripts"],
+                include_system_site_packages=system_site_packages,
+            )
+        else:
+            cmd = [python, "-m", "venv", "--without-pip"]
+            cmd.append("--symlinks" if symlinks else "--copies")
+            if system_site_packages:
+                cmd.append("--system-site-packages")
+            c = run_command(cmd + [prefix])
+            if c.returncode != 0:
+                raise RuntimeError("Failed creating virtualenv: {0}".format(c.err.strip()))
+            metadata = EnvironmentMetadata.load(prefix)
+        venv = cls(prefix, **kwargs)
+        venv.metadata = metadata
+        if wheels:
+            seed_store = seed_store if seed_store is not None else SeedStore()
+            seed_store.seed(
+                {"purelib": metadata.purelib, "scripts": metadata.scripts}, venv.python,
+                metadata, [wheels[key] for key in sorted(wheels)]
+            )
+        if bases:
+            venv.set_layers(bases)
+        return venv
+
     @classmethod
     def from_project_path(cls, path):
         """Utility for finding a virtualenv location based on a project path"""
@@ -102,6 +244,53 @@ class VirtualEnv(object):
                 )
         return vistir.compat.Path(os.path.expandvars(workon_home)).expanduser()
 
+    def get_cache_dependencies(self, name):
+        """Get the files a cached property of the virtualenv is computed from
+
+        :param str name: The name of the cached property
+        :return: A list of paths which invalidate the property when changed
+        :rtype: list
+        """
+
+        prefix = self.prefix.as_posix()
+        if name == "initial_working_set":
+            return [self.system_python] + site.getsitepackages()
+        if os.name == "nt":
+            python = os.path.join(prefix, "Scripts", "python.exe")
+            lib_root = os.path.join(prefix, "Lib")
+        else:
+            python = os.path.join(prefix, "bin", "python")
+            lib_root = os.path.join(prefix, "lib")
+        dependencies = [python, os.path.join(prefix, "pyvenv.cfg"), lib_root]
+        if name == "sys_path":
+            dependencies.extend(self.metadata.lib_dirs if self.metadata.purelib else [])
+        elif name in INSTALLED_STATE_PROPERTIES:
+            dependencies.extend(self.lib_dirs)
+            dependencies.append(self.scripts_dir)
+        return dependencies
+
+    def get_cache_tracker(self, name):
+        """Build a tracker for invalidating a cached property when its dependencies change
+
+        Dependencies are polled by default; pass ``cache_backend="inotify"`` when creating
+        the virtualenv to use inotify where available, or ``cache_backend=None`` to cache
+        properties permanently.
+
+        :param str name: The name of the cached property
+        :return: A tracker for the property, or None if invalidation is disabled
+        :rtype: :class:`~mork.cache.DependencyTracker` or None
+        """
+
+        if not self.cache_backend:
+            return None
+        return DependencyTracker(self.get_cache_dependencies(name), backend=self.cache_backend)
+
+    def clear_caches(self):
+        """Discard every cached property of the virtualenv so it is recomputed on access"""
+        self.__dict__.pop("_tracked_properties", None)
+        for name in ("script_basedir", "system_paths"):
+            self.__dict__.pop(name, None)
+
     @classmethod
     def filter_sources(cls, requirement, sources):
         if not sources or not requirement.index:
@@ -115,6 +304,11 @@ class VirtualEnv(object):
     def safe_import(self, name):
         """Helper utility for reimporting previously imported modules while inside the venv"""
         module = None
+        if self.thread_safe:
+            # Reloading modules mutates them for every thread, so only import them
+            if name not in self._modules:
+                self._modules[name] = importlib.import_module(name)
+            return self._modules[name]
         if name not in self._modules:
             self._modules[name] = importlib.import_module(name)
         module = self._modules[name]
@@ -169,6 +363,8 @@ class VirtualEnv(object):
             return deps
         for req in reqs:
             dist = working_set.find(req)
+            if dist is None:
+                continue
             deps |= cls.resolve_dist(dist, working_set)
         return deps
 
@@ -179,17 +375,70 @@ class VirtualEnv(object):
         if extras:
             self.extra_dists.extend(extras)
 
+    @tracked_property
+    def metadata(self):
+        """Interpreter and layout details read from ``pyvenv.cfg`` and the filesystem.
+
+        The environment's interpreter is only probed if the layout can't be determined.
+
+        :return: The metadata for the environment
+        :rtype: :class:`~mork.metadata.EnvironmentMetadata`
+        """
+
+        return EnvironmentMetadata.load(self.prefix.as_posix())
+
+    def relocate(self, prefix, old_prefix=None, workers=DEFAULT_WORKERS):
+        """Move the virtualenv to a new prefix without rebuilding it
+
+        The environment is moved to ``prefix``, then the scripts, ``pyvenv.cfg``,
+        ``.pth`` files, ``RECORD`` files and everything else below the prefix which refers
+        to the old location are rewritten in parallel, each file atomically, and the
+        hashes of rewritten files are updated in ``RECORD``.  Every cached path of the
+        virtualenv is discarded so it reflects the new location.
+
+        To fix up an environment which was already moved, e.g. restored from a cache to
+        another workspace, pass its own prefix; the previous prefix is then read from the
+        shebangs of its scripts unless ``old_prefix`` is given.
+
+        :param str prefix: The new root of the environment
+        :param str old_prefix: The prefix the environment's files refer to, defaults to
+            its current prefix
+        :param int workers: The number of threads rewriting files
+        :return: The files which were rewritten
+        :rtype: :class:`~mork.relocate.RelocationReport`
+        :raises ValueError: If the target already exists or the previous prefix of a
+            moved environment can't be determined
+        """
+
+        current = self.prefix.as_posix()
+        target = vistir.compat.Path(os.path.abspath(prefix)).as_posix()
+        if target != current:
+            if os.path.lexists(target):
+                raise ValueError("Cannot relocate {0} to {1}, it already exists".format(
+                    current, target
+                ))
+            shutil.move(current, target)
+            if old_prefix is None:
+                old_prefix = current
+        self.prefix = vistir.compat.Path(target)
+        self.clear_caches()
+        if old_prefix is None:
+            old_prefix = detect_prefix(self.scripts_dir)
+            if old_prefix is None:
+                raise ValueError("Cannot determine the previous prefix of {0}".format(target))
+        relocator = Relocator(old_prefix, target, workers=workers)
+        report = relocator.relocate([target], lib_dirs=self.lib_dirs)
+        self.clear_caches()
+        return report
+
     @property
     def pyversion(self):
-        include_dir = self.prefix / "include"
-        python_path = next(iter(list(include_dir.iterdir())), None)
-        if python_path and python_path.name.startswith("python"):
-            python_version = python_path.name.replace("python", "")
-            py_version_short, abiflags = python_version[:3], python_version[3:]
-            return {"py_version_short": py_version_short, "abiflags": abiflags}
+        py_version_short = self.metadata.py_version_short
+        if py_version_short and self.metadata.abiflags is not None:
+            return {"py_version_short": py_version_short, "abiflags": self.metadata.abiflags}
         return {}
 
-    @cached_property
+    @tracked_property
     def base_paths(self):
         """
         Returns the context appropriate paths for the environment.
@@ -198,7 +447,8 @@ class VirtualEnv(object):
         :rtype: dict
 
         .. note:: The implementation of this is borrowed from a combination of pip and
-           virtualenv and is likely to change at some point in the future.
+           virtualenv and is likely to change at some point in the future.  Library and
+           script directories are taken from :attr:`metadata` when they can be determined.
 
         >>> from pipenv.core import project
         >>> from pipenv.environment import Environment
@@ -225,11 +475,17 @@ class VirtualEnv(object):
             'base': prefix,
             'platbase': prefix,
         })
+        metadata = self.metadata
+        if metadata.scripts:
+            paths["scripts"] = metadata.scripts
         paths["PATH"] = paths["scripts"] + os.pathsep + os.defpath
         if "prefix" not in paths:
             paths["prefix"] = prefix
-        purelib = get_python_lib(plat_specific=0, prefix=prefix)
-        platlib = get_python_lib(plat_specific=1, prefix=prefix)
+        if metadata.purelib:
+            purelib, platlib = metadata.purelib, metadata.platlib
+        else:
+            purelib = get_python_lib(plat_specific=0, prefix=prefix)
+            platlib = get_python_lib(plat_specific=1, prefix=prefix)
         if purelib == platlib:
             lib_dirs = purelib
         else:
@@ -255,7 +511,7 @@ class VirtualEnv(object):
             return vistir.compat.Path(sys.executable).as_posix()
         return py
 
-    @cached_property
+    @tracked_property
     def sys_path(self):
         """The system path inside the environment
 
@@ -279,7 +535,7 @@ class VirtualEnv(object):
         paths = get_paths()
         return paths
 
-    @cached_property
+    @tracked_property
     def sys_prefix(self):
         """The prefix run inside the context of the environment
 
@@ -292,17 +548,20 @@ class VirtualEnv(object):
         sys_prefix = vistir.compat.Path(vistir.misc.to_text(c.out).strip()).as_posix()
         return sys_prefix
 
-    @cached_property
+    @tracked_property
     def paths(self):
         paths = {}
-        with vistir.contextmanagers.temp_environ(), vistir.contextmanagers.temp_path():
-            os.environ["PYTHONIOENCODING"] = vistir.compat.fs_str("utf-8")
-            os.environ["PYTHONDONTWRITEBYTECODE"] = vistir.compat.fs_str("1")
+        if self.thread_safe:
             paths = self.base_paths
-            os.environ["PATH"] = paths["PATH"]
-            os.environ["PYTHONPATH"] = paths["PYTHONPATH"]
-            if "headers" not in paths:
-                paths["headers"] = paths["include"]
+        else:
+            with vistir.contextmanagers.temp_environ(), vistir.contextmanagers.temp_path():
+                os.environ["PYTHONIOENCODING"] = vistir.compat.fs_str("utf-8")
+                os.environ["PYTHONDONTWRITEBYTECODE"] = vistir.compat.fs_str("1")
+                paths = self.base_paths
+                os.environ["PATH"] = paths["PATH"]
+                os.environ["PYTHONPATH"] = paths["PYTHONPATH"]
+        if "headers" not in paths:
+            paths["headers"] = paths["include"]
         return paths
 
     @property
@@ -312,6 +571,78 @@ class VirtualEnv(object):
             return "purelib", purelib
         return "platlib", self.paths["platlib"]
 
+    @property
+    def lib_dirs(self):
+        """The library directories of the environment, without duplicates"""
+        lib_dirs = [self.base_paths["purelib"]]
+        if self.base_paths["platlib"] not in lib_dirs:
+            lib_dirs.append(self.base_paths["platlib"])
+        return lib_dirs
+
+    @tracked_property
+    def layers(self):
+        """The read-only base environments this environment is layered on
+
+        :return: The base environments, highest priority first
+        :rtype: list(:class:`~mork.virtualenv.VirtualEnv`)
+        """
+
+        return [
+            type(self)(prefix, cache_backend=self.cache_backend)
+            for prefix in read_layers(self.prefix.as_posix())
+        ]
+
+    @property
+    def layered_lib_dirs(self):
+        """The library directories of the environment followed by those of its layers
+
+        Layers of layers are included, in the order the interpreter puts them on
+        :data:`sys.path`, without duplicates.
+        """
+
+        lib_dirs = list(self.lib_dirs)
+        for layer in self.layers:
+            lib_dirs.extend(path for path in layer.layered_lib_dirs if path not in lib_dirs)
+        return lib_dirs
+
+    def set_layers(self, bases):
+        """Layer the environment on top of read-only base environments
+
+        The bases are recorded in ``pyvenv.cfg`` and chained onto the interpreter's path
+        by a ``.pth`` file in the environment's own library directory, so the packages of
+        every base are importable without being copied.  Packages installed in the
+        environment shadow those of its bases, and installing and uninstalling only
+        touches the environment itself.
+
+        :param list bases: Environments or prefixes, highest priority first; pass an
+            empty list to remove every layer
+        :raises ValueError: If a base doesn't exist, is the environment itself, or runs a
+            different python
+        """
+
+        prefix = self.prefix.as_posix()
+        layers = []
+        for base in bases:
+            if not isinstance(base, VirtualEnv):
+                base = type(self)(base, cache_backend=self.cache_backend)
+            base_prefix = base.prefix.as_posix()
+            if not os.path.isdir(base_prefix):
+                raise ValueError("Base environment does not exist: {0}".format(base_prefix))
+            base_lib_dirs = base.layered_lib_dirs
+            if base_prefix == prefix or any(path in base_lib_dirs for path in self.lib_dirs):
+                raise ValueError("Cannot layer {0} on {1}".format(prefix, base_prefix))
+            ours, theirs = self.metadata, base.metadata
+            if (ours.implementation, ours.py_version_short) != (
+                theirs.implementation, theirs.py_version_short
+            ):
+                raise ValueError("Base environment {0} runs {1} {2}, not {3} {4}".format(
+                    base_prefix, theirs.implementation, theirs.py_version_short,
+                    ours.implementation, ours.py_version_short
+                ))
+            layers.append((base_prefix, base_lib_dirs))
+        write_layers(prefix, self.base_paths["purelib"], layers)
+        self.clear_caches()
+
     def find_egg(self, egg_dist):
         site_packages = get_python_lib()
         search_filename = "{0}.egg-link".format(egg_dist.project_name)
@@ -329,94 +660,120 @@ class VirtualEnv(object):
         location = self.find_egg(dist)
         if not location:
             return dist.location
+        return location
 
     def dist_is_in_project(self, dist):
-        from .project import _normalized
-        prefix = _normalized(self.base_paths["prefix"])
+        prefix = self.normalize_path(self.base_paths["prefix"])
         location = self.locate_dist(dist)
         if not location:
             return False
-        return _normalized(location).startswith(prefix)
+        return self.normalize_path(location).startswith(prefix)
 
     def get_installed_packages(self):
         workingset = self.get_working_set()
         packages = [pkg for pkg in workingset if self.dist_is_in_project(pkg)]
         return packages
 
-    def get_finder(self):
-        from .vendor.pip_shims import Command, cmdoptions, index_group, PackageFinder
-        from .environments import PIPENV_CACHE_DIR
-        index_urls = [source.get("url") for source in self.sources]
+    @property
+    def session(self):
+        """The HTTP session shared by every finder of the virtualenv
+
+        Connections to each index are kept alive in its pool until :meth:`close`.
+        """
 
-        class PipCommand(Command):
-            name = "PipCommand"
+        if self._session is None:
+            self._session = make_session()
+        return self._session
 
-        pip_command = PipCommand()
-        index_opts = cmdoptions.make_option_group(
-            index_group, pip_command.parser
+    def close(self):
+        """Close the pooled connections and discard the pages parsed by every finder."""
+        self._finders = {}
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    @contextlib.contextmanager
+    def get_finder(self, sources=None, cache=None, offline=False, pre=False):
+        """Get a finder for querying the package indexes of the virtualenv
+
+        Finders are kept for the lifetime of the virtualenv, one for each combination of
+        arguments, so repeated queries reuse parsed index pages and warm connections
+        until :meth:`close` is called.  Only candidates the virtualenv's interpreter can
+        install are considered by their :meth:`~mork.index.SimpleIndex.find_best_candidate`.
+
+        :param list sources: Pipfile style source dictionaries, defaults to the sources
+            the virtualenv was created with
+        :param cache: A persistent cache of index pages, or None to fetch every page
+        :type cache: :class:`~mork.index.IndexCache`
+        :param bool offline: Whether to answer every query from the cache
+        :param bool pre: Whether to consider prereleases
+        :return: A finder for the sources
+        :rtype: :class:`~mork.index.SimpleIndex`
+        """
+
+        if offline and cache is None:
+            cache = IndexCache()
+        sources = sources if sources else self.sources
+        key = (
+            json.dumps(sources, sort_keys=True),
+            (cache.root.as_posix(), cache.ttl) if cache is not None else None,
+            offline, pre
         )
-        cmd_opts = pip_command.cmd_opts
-        pip_command.parser.insert_option_group(0, index_opts)
-        pip_command.parser.insert_option_group(0, cmd_opts)
-        pip_args = self._modules["pipenv"].utils.prepare_pip_source_args(self.sources, [])
-        pip_options, _ = pip_command.parser.parse_args(pip_args)
-        pip_options.cache_dir = PIPENV_CACHE_DIR
-        pip_options.pre = self.pipfile.get("pre", False)
-        with pip_command._build_session(pip_options) as session:
-            finder = PackageFinder(
-                find_links=pip_options.find_links,
-                index_urls=index_urls, allow_all_prereleases=pip_options.pre,
-                trusted_hosts=pip_options.trusted_hosts,
-                process_dependency_links=pip_options.process_dependency_links,
-                session=session
+        finder = self._finders.get(key)
+        if finder is None:
+            finder = SimpleIndex(
+                sources=sources, cache=cache, offline=offline, prereleases=pre,
+                session=self.session,
+                python_version=self.metadata.get_marker_environment()["python_full_version"],
+                supported_tags=self.supported_tags
             )
-            yield finder
+            self._finders[key] = finder
+        yield finder
 
-    def get_package_info(self):
-        dependency_links = []
-        packages = self.get_installed_packages()
-        # This code is borrowed from pip's current implementation
-        for dist in packages:
-            if dist.has_metadata('dependency_links.txt'):
-                dependency_links.extend(dist.get_metadata_lines('dependency_links.txt'))
+    def get_package_info(self, sources=None, cache=None, offline=False, pre=False):
+        """Find the latest release of every package installed in the virtualenv
+
+        Each installed distribution which has a release on the index is yielded with
+        ``latest_version`` and ``latest_filetype`` attributes added.
 
-        with self.get_finder() as finder:
-            finder.add_dependency_links(dependency_links)
+        :param list sources: Pipfile style source dictionaries, see :meth:`get_finder`
+        :param cache: A persistent cache of index pages
+        :type cache: :class:`~mork.index.IndexCache`
+        :param bool offline: Whether to answer every query from the cache
+        :param bool pre: Whether to consider prereleases
+        :rtype: iterator(:class:`pkg_resources.Distribution`)
+        """
 
+        packages = self.get_installed_packages()
+        with self.get_finder(sources=sources, cache=cache, offline=offline, pre=pre) as finder:
             for dist in packages:
-                typ = 'unknown'
-                all_candidates = finder.find_all_candidates(dist.key)
-                if not finder.pip_options.pre:
-                    # Remove prereleases
-                    all_candidates = [
-                        candidate for candidate in all_candidates
-                        if not candidate.version.is_prerelease
-                    ]
-
-                if not all_candidates:
+                best_candidate = finder.find_best_candidate(dist.key)
+                if best_candidate is None:
                     continue
-                best_candidate = max(all_candidates, key=finder._candidate_sort_key)
-                remote_version = best_candidate.version
-                if best_candidate.location.is_wheel:
-                    typ = 'wheel'
-                else:
-                    typ = 'sdist'
                 # This is dirty but makes the rest of the code much cleaner
-                dist.latest_version = remote_version
-                dist.latest_filetype = typ
+                dist.latest_version = best_candidate.parsed_version
+                dist.latest_filetype = "wheel" if best_candidate.is_wheel else "sdist"
                 yield dist
 
-    def get_outdated_packages(self):
+    def get_outdated_packages(self, sources=None, cache=None, offline=False, pre=False):
+        """Find the installed packages which have newer releases on the index
+
+        Accepts the same arguments as :meth:`get_package_info`; pass a cache with
+        ``offline=True`` to answer from previously fetched index pages only.
+        """
+
         return [
-            pkg for pkg in self.get_package_info()
-            if pkg.latest_version._version > pkg.parsed_version._version
+            pkg for pkg in self.get_package_info(
+                sources=sources, cache=cache, offline=offline, pre=pre
+            )
+            if pkg.latest_version > pkg.parsed_version
         ]
 
     @property
     def scripts_dir(self):
         return self.base_paths["scripts"]
 
-    @cached_property
+    @tracked_property
     def initial_working_set(self):
         system_path = self.get_sys_path(self.system_python)
         working_set = self._modules["pkg_resources"].WorkingSet(system_path)
@@ -429,9 +786,21 @@ class VirtualEnv(object):
         :rtype: iterator
         """
 
-        return self._modules["pkg_resources"].find_distributions(
-            self.paths["PYTHONPATH"], only=True
-        )
+        if not self.layers:
+            return self._modules["pkg_resources"].find_distributions(
+                self.paths["PYTHONPATH"], only=True
+            )
+        return self._iter_layered_distributions()
+
+    def _iter_layered_distributions(self):
+        # Distributions in a higher layer shadow those of the same name below it
+        seen = set()
+        for lib_dir in self.layered_lib_dirs:
+            for dist in self._modules["pkg_resources"].find_distributions(lib_dir, only=True):
+                key = canonicalize_name(dist.project_name)
+                if key not in seen:
+                    seen.add(key)
+                    yield dist
 
     def get_working_set(self):
         """Retrieve the working set of installed packages for the virtualenv.
@@ -440,70 +809,399 @@ class VirtualEnv(object):
         :rtype: :class:`pkg_resources.WorkingSet`
         """
 
-        working_set = self._modules["pkg_resources"].WorkingSet(self.sys_path)
+        sys_path = list(self.sys_path)
+        sys_path.extend(path for path in self.layered_lib_dirs if path not in sys_path)
+        working_set = self._modules["pkg_resources"].WorkingSet(sys_path)
         return working_set
 
-    @cached_property
+    @tracked_property
+    def entry_point_index(self):
+        """An index of the entry points and scripts installed in the virtualenv
+
+        :return: The entry point index, which is rebuilt after packages are installed or
+            uninstalled
+        :rtype: :class:`~mork.entrypoints.EntryPointIndex`
+        """
+
+        return EntryPointIndex.from_paths(self.lib_dirs, scripts_dir=self.scripts_dir)
+
+    def check(self):
+        """Check that the requirements of every installed distribution are met
+
+        Unlike resolving each distribution in turn, this reports every missing and
+        conflicting requirement at once.
+
+        :return: The missing and conflicting requirements of the environment
+        :rtype: :class:`~mork.check.CheckResult`
+        """
+
+        return check_paths(self.layered_lib_dirs, self.metadata.get_marker_environment())
+
+    def fingerprint(self):
+        """A digest of the interpreter and installed distributions of the virtualenv
+
+        The digest is stable for as long as nothing is installed, upgraded or
+        uninstalled, the interpreter isn't replaced and ``pyvenv.cfg`` isn't changed, so it
+        can be stored to skip work when an environment hasn't changed.  Only directory
+        listings are read; the distributions of every layer are included.
+
+        :return: A hex encoded sha256 digest
+        :rtype: str
+        """
+
+        return get_fingerprint(self.prefix.as_posix(), self.layered_lib_dirs, python=self.python)
+
+    def profile_startup(self, modules=()):
+        """Profile the startup of the virtualenv's interpreter
+
+        The interpreter is run with ``-X importtime`` and :mod:`site` is executed by hand
+        so that every ``.pth`` file can be timed.  The optional modules are imported
+        afterwards, and every import is attributed to the distribution which installed
+        it using the ``RECORD`` files of the environment.
+
+        :param list modules: Modules to import once the interpreter has started
+        :return: A report of where startup time is spent
+        :rtype: :class:`~mork.startup.StartupReport`
+        :raises RuntimeError: If the interpreter fails, e.g. because a module can't be imported
+        """
+
+        owners = FileOwners(self.layered_lib_dirs)
+        cmd = [
+            self.python, "-X", "importtime", "-S", "-c", PROFILE_SCRIPT,
+            json.dumps(list(modules))
+        ]
+        start = time.time()
+        c = run_command(cmd, env=self.get_environ())
+        total_us = int((time.time() - start) * 1000000)
+        if c.returncode != 0:
+            raise RuntimeError("Failed profiling startup: {0}".format(c.err.strip()))
+        return StartupReport.from_output(c.out, c.err, owners, total_us=total_us)
+
+    def export_bundle(self, target, optimize=0):
+        """Export the virtualenv's ``purelib`` as a precompiled zip bundle
+
+        Modules, packages and metadata are compiled for the virtualenv's interpreter and
+        written to a single archive which :mod:`zipimport` can load; extension modules,
+        packages carrying data files and ``.pth`` files are copied alongside it.
+
+        :param str target: The bundle directory to create
+        :param int optimize: The optimization level to compile bytecode with
+        :return: The new bundle
+        :rtype: :class:`~mork.bundle.Bundle`
+        """
+
+        return Bundle.export(
+            self.paths["purelib"], target, python=self.python, optimize=optimize,
+            env=self.get_environ()
+        )
+
+    def benchmark_bundle(self, bundle, modules, repeat=5):
+        """Compare the import time of a set of modules with and without a bundle
+
+        :param bundle: A bundle exported by :meth:`export_bundle`
+        :type bundle: :class:`~mork.bundle.Bundle`
+        :param list modules: The modules to import
+        :param int repeat: The number of fresh interpreters to time for each layout
+        :rtype: :class:`~mork.bundle.BundleBenchmark`
+        """
+
+        return benchmark_bundle(
+            bundle, self.paths["purelib"], modules, python=self.python, repeat=repeat,
+            env=self.get_environ()
+        )
+
+    def snapshot(self):
+        """Take a snapshot of the distributions installed in the virtualenv
+
+        :return: A snapshot which can be written to disk or compared with other snapshots
+        :rtype: :class:`~mork.snapshot.Snapshot`
+        """
+
+        return Snapshot.from_virtualenv(self)
+
+    @tracked_property
     def python_version(self):
+        if self.metadata.py_version_short:
+            return self.metadata.py_version_short
+        if self.thread_safe:
+            c = self.run_py(["import sysconfig; print(sysconfig.get_python_version())"])
+            return c.out.strip()
         with self.activated():
             sysconfig = self.safe_import("sysconfig")
             py_version = sysconfig.get_python_version()
             return py_version
 
-    def get_setup_install_args(self, pkgname, setup_py, develop=False):
+    def get_setup_install_args(self, pkgname, setup_py, develop=False, build_options=None):
         """Get setup.py install args for installing the supplied package in the virtualenv
 
         :param str pkgname: The name of the package to install
         :param str setup_py: The path to the setup file of the package
         :param bool develop: Whether the package is in development mode
+        :param build_options: Options for compiling native extensions, defaults to None
+        :type build_options: :class:`~mork.build.BuildOptions`
         :return: The installation arguments to pass to the interpreter when installing
         :rtype: list
         """
 
-        headers = self.base_paths["headers"]
-        headers = headers / "python{0}".format(self.python_version) / pkgname
-        install_arg = "install" if not develop else "develop"
-        return [
-            self.python, "-u", "-c", SETUPTOOLS_SHIM % setup_py, install_arg,
+        headers = self.prefix.joinpath(
+            "include", "site", "python{0}".format(self.python_version), pkgname
+        )
+        shim = SETUPTOOLS_SHIM % setup_py
+        commands = ["install" if not develop else "develop"]
+        if build_options is not None:
+            shim = build_options.get_shim(shim)
+            if not develop:
+                commands = build_options.get_command_args() + commands
+        return [self.python, "-u", "-c", shim] + commands + [
             "--single-version-externally-managed",
-            "--install-headers={0}".format(self.base_paths["headers"]),
+            "--install-headers={0}".format(headers.as_posix()),
             "--install-purelib={0}".format(self.base_paths["purelib"]),
             "--install-platlib={0}".format(self.base_paths["platlib"]),
             "--install-scripts={0}".format(self.base_paths["scripts"]),
             "--install-data={0}".format(self.base_paths["data"]),
         ]
 
-    def setuptools_install(self, chdir_to, pkg_name, setup_py_path=None, editable=False):
+    def _run_build(self, pkg_name, command, cmd, cwd, build_options):
+        record = run_build(pkg_name, command, cmd, cwd, self.get_environ(), build_options)
+        self.build_records.append(record)
+        return record.returncode
+
+    def setuptools_install(self, chdir_to, pkg_name, setup_py_path=None, editable=False,
+                           build_options=None):
         """Install an sdist or an editable package into the virtualenv
 
+        With ``build_options`` the build runs with the environment passed explicitly, and
+        its effective configuration and compile timings are appended to
+        :attr:`build_records`.
+
         :param str chdir_to: The location to change to
         :param str setup_py_path: The path to the setup.py, if applicable defaults to None
         :param  bool editable: Whether the package is editable, defaults to False
+        :param build_options: Options for compiling native extensions, defaults to None
+        :type build_options: :class:`~mork.build.BuildOptions`
         """
 
         install_options = ["--prefix={0}".format(self.prefix.as_posix()),]
-        with vistir.contextmanagers.cd(chdir_to):
-            c = self.run(
-                self.get_setup_install_args(pkg_name, setup_py_path, develop=editable) +
-                install_options, cwd=chdir_to
+        record_path = None
+        if not editable:
+            record_path = os.path.join(
+                vistir.path.create_tracked_tempdir(prefix="mork-record"), "install-record.txt"
             )
+            install_options.append("--record={0}".format(record_path))
+        cmd = self.get_setup_install_args(
+            pkg_name, setup_py_path, develop=editable, build_options=build_options
+        ) + install_options
+        if build_options is not None:
+            returncode = self._run_build(
+                pkg_name, "develop" if editable else "install", cmd, chdir_to, build_options
+            )
+        else:
+            with self.cd(chdir_to):
+                returncode = self.run(cmd, cwd=chdir_to).returncode
+        if returncode == 0 and record_path is not None:
+            write_installed_files(record_path)
+        return returncode
+
+    def setuptools_build_wheel(self, chdir_to, setup_py_path, wheel_dir, build_options=None):
+        """Build a wheel from an sdist using the virtualenv python
+
+        :param str chdir_to: The location to change to
+        :param str setup_py_path: The path to the setup.py
+        :param str wheel_dir: The directory to write the wheel to
+        :param build_options: Options for compiling native extensions, defaults to None
+        :type build_options: :class:`~mork.build.BuildOptions`
+        :return: A return code, 0 if successful
+        :rtype: int
+        """
+
+        shim = SETUPTOOLS_SHIM % setup_py_path
+        commands = ["bdist_wheel", "--dist-dir={0}".format(wheel_dir)]
+        if build_options is not None:
+            cmd = [self.python, "-u", "-c", build_options.get_shim(shim)]
+            cmd += build_options.get_command_args() + commands
+            name = os.path.basename(os.path.abspath(chdir_to))
+            return self._run_build(name, "bdist_wheel", cmd, chdir_to, build_options)
+        with self.cd(chdir_to):
+            c = self.run([self.python, "-u", "-c", shim] + commands, cwd=chdir_to)
             return c.returncode
 
-    def install(self, req, editable=False, sources=[]):
+    def get_cached_wheel(self, wheel_cache, chdir_to, setup_py_path, source_hash=None,
+                         build_options=None):
+        """Get a wheel for an sdist from a wheel cache, building and storing it if needed
+
+        :param wheel_cache: The cache to consult
+        :type wheel_cache: :class:`~mork.wheelcache.WheelCache`
+        :param str chdir_to: The location of the unpacked sdist
+        :param str setup_py_path: The path to the setup.py
+        :param str source_hash: The hash of the sdist, defaults to a hash of the unpacked sources
+        :param build_options: Options for compiling native extensions, defaults to None
+        :type build_options: :class:`~mork.build.BuildOptions`
+        :return: The path to the wheel, or None if a wheel couldn't be built
+        :rtype: str or None
+        """
+
+        if not source_hash:
+            source_hash = hash_source_tree(chdir_to)
+        tag = get_interpreter_tag(self.metadata)
+        return wheel_cache.get_or_build(
+            source_hash, tag,
+            lambda wheel_dir: self.setuptools_build_wheel(
+                chdir_to, setup_py_path, wheel_dir, build_options=build_options
+            )
+        )
+
+    @invalidates(*INSTALLED_STATE_PROPERTIES)
+    def install_wheel(self, wheel):
+        """Install a wheel into the virtualenv
+
+        :param wheel: The wheel to install
+        :type wheel: str or :class:`distlib.wheel.Wheel`
+        """
+
+        if not isinstance(wheel, distlib.wheel.Wheel):
+            wheel = distlib.wheel.Wheel(wheel)
+        maker = distlib.scripts.ScriptMaker(None, None)
+        wheel.install(self.paths, maker)
+
+    @property
+    def supported_tags(self):
+        """The wheel tags the virtualenv's interpreter supports, most preferred first."""
+        return get_supported_tags(self.metadata)
+
+    def get_compatible_wheels(self, project, wheel_dirs, tag_index=None):
+        """Find the wheels of a project in local directories the virtualenv can install
+
+        :param str project: The name of the project
+        :param list wheel_dirs: The directories holding the wheels
+        :param tag_index: A persistent index of the wheel filenames, so directories are
+            only parsed again once they change, defaults to one kept in memory
+        :type tag_index: :class:`~mork.tagindex.TagIndex`
+        :return: The compatible wheels, best first
+        :rtype: list(:class:`~mork.wheelhouse.WheelInfo`)
+        """
+
+        return Wheelhouse(wheel_dirs, tag_index=tag_index).get_compatible(
+            project, self.supported_tags
+        )
+
+    def resolve_wheelhouse(self, requirements, wheel_dirs, upgrade=False, pre=False,
+                           tag_index=None):
+        """Resolve requirements to wheels in local directories, without any network access
+
+        Only wheel filenames and the ``METADATA`` of the wheels considered are read, and
+        installed distributions which satisfy the requirements are kept.
+
+        :param list requirements: Requirement lines to resolve
+        :param list wheel_dirs: The directories holding the wheels
+        :param bool upgrade: Whether to replace satisfying installed distributions with
+            the best wheel available, defaults to False
+        :param bool pre: Whether to consider prereleases, defaults to False
+        :param tag_index: A persistent index of the wheel filenames, defaults to one kept
+            in memory
+        :type tag_index: :class:`~mork.tagindex.TagIndex`
+        :return: The distributions to install, upgrade or keep
+        :rtype: :class:`~mork.wheelhouse.InstallPlan`
+        """
+
+        installed = {}
+        for metadata_dir in iter_metadata_dirs(self.layered_lib_dirs):
+            if metadata_dir.key not in installed:
+                installed[metadata_dir.key] = InstalledRequirements.from_metadata_dir(metadata_dir)
+        return Wheelhouse(wheel_dirs, tag_index=tag_index).resolve(
+            requirements, self.metadata.get_marker_environment(), self.supported_tags,
+            installed=installed, upgrade=upgrade, prereleases=pre
+        )
+
+    @invalidates(*INSTALLED_STATE_PROPERTIES)
+    def install_plan(self, plan):
+        """Install the wheels of a plan made by :meth:`resolve_wheelhouse`
+
+        Distributions being upgraded are moved aside first and restored if their
+        replacement fails to install.
+
+        :param plan: The plan to install
+        :type plan: :class:`~mork.wheelhouse.InstallPlan`
+        :raises ValueError: If the plan has unresolved problems
+        """
+
+        if not plan.ok:
+            raise ValueError("Cannot install an unresolved plan: {0}".format(
+                "; ".join(plan.problems)
+            ))
+        for item in plan.items:
+            if item.action == "keep":
+                continue
+            uninstaller = None
+            if item.action == "upgrade":
+                uninstaller = Uninstaller.from_name(item.name, self.lib_dirs)
+                if uninstaller is not None:
+                    uninstaller.remove()
+            try:
+                self.install_wheel(item.wheel)
+            except Exception:
+                if uninstaller is not None:
+                    uninstaller.rollback()
+                raise
+            if uninstaller is not None:
+                uninstaller.commit()
+
+    @invalidates(*INSTALLED_STATE_PROPERTIES)
+    def install_editable(self, project_dir):
+        """Install a local project into the virtualenv in editable mode
+
+        The project's metadata is read statically from ``pyproject.toml`` or ``setup.cfg``
+        and the ``.pth`` file, ``.dist-info`` directory and console scripts are written
+        directly, without launching an interpreter.  Projects whose metadata can't be
+        read statically are installed with ``setup.py develop``.
+
+        :param str project_dir: The root directory of the project
+        :return: A return code, 0 if successful
+        :rtype: int
+        """
+
+        project = EditableProject.from_path(project_dir)
+        if project is None:
+            setup_py = os.path.join(project_dir, "setup.py")
+            return self.setuptools_install(
+                project_dir, os.path.basename(project_dir), setup_py, editable=True
+            )
+        install_editable(project, self.paths, self.python)
+        return 0
+
+    @invalidates(*INSTALLED_STATE_PROPERTIES)
+    def install(self, req, editable=False, sources=[], wheel_cache=None, fast_editable=False,
+                build_options=None):
         """Install a package into the virtualenv
 
         :param req: A requirement to install
         :type req: :class:`requirementslib.models.requirement.Requirement`
         :param bool editable: Whether the requirement is editable, defaults to False
         :param list sources: A list of pip sources to consult, defaults to []
+        :param wheel_cache: A cache to build sdists into wheels with, so that they are only
+            installed with ``setup.py install`` if a wheel can't be built, defaults to None.
+            Pass ``True`` to use the default :class:`~mork.wheelcache.WheelCache`.
+        :type wheel_cache: :class:`~mork.wheelcache.WheelCache` or bool
+        :param bool fast_editable: Whether to install local editable requirements with
+            :meth:`install_editable` instead of ``setup.py develop``, defaults to False
+        :param build_options: Options for compiling the native extensions of packages
+            built from source, such as parallel jobs and a compiler launcher; builds are
+            recorded in :attr:`build_records`, defaults to None
+        :type build_options: :class:`~mork.build.BuildOptions`
         :return: A return code, 0 if successful
         :rtype: int
         """
 
+        project_dir = getattr(req.req, "path", None)
+        if fast_editable and (editable or req.editable) and project_dir:
+            return self.install_editable(os.path.abspath(project_dir))
+        if self.thread_safe:
+            return self.pip_install(req, sources=sources)
         try:
             packagebuilder = self.safe_import("packagebuilder")
         except ImportError:
             packagebuilder = None
+        if wheel_cache is True:
+            wheel_cache = WheelCache()
         with self.activated(include_extras=False):
             if not packagebuilder:
                 return 2
@@ -517,18 +1215,71 @@ class VirtualEnv(object):
             )
             built = packagebuilder.build.build(ireq, sources, cache_dir)
             if isinstance(built, distlib.wheel.Wheel):
-                maker = distlib.scripts.ScriptMaker(None, None)
-                built.install(self.paths, maker)
+                self.install_wheel(built)
             else:
                 path = vistir.compat.Path(built.path)
                 cd_path = path.parent
                 setup_py = cd_path.joinpath("setup.py")
+                if wheel_cache and not req.editable:
+                    link = getattr(ireq, "link", None)
+                    source_hash = None
+                    if getattr(link, "hash_name", None) == "sha256":
+                        source_hash = link.hash
+                    wheel = self.get_cached_wheel(
+                        wheel_cache, cd_path.as_posix(), setup_py.as_posix(),
+                        source_hash=source_hash, build_options=build_options
+                    )
+                    if wheel is not None:
+                        self.install_wheel(wheel)
+                        return 0
                 return self.setuptools_install(
                     cd_path.as_posix(), req.name, setup_py.as_posix(),
-                    editable=req.editable
+                    editable=req.editable, build_options=build_options
                 )
             return 0
 
+    def pip_install(self, req, sources=[]):
+        """Install a package by running pip in a subprocess inside the virtualenv
+
+        This is used instead of building the package in-process when the virtualenv is
+        :attr:`thread_safe`, and requires pip to be installed in the virtualenv.
+
+        :param req: A requirement to install
+        :type req: :class:`requirementslib.models.requirement.Requirement`
+        :param list sources: A list of pip sources to consult, defaults to []
+        :return: A return code, 0 if successful
+        :rtype: int
+        """
+
+        cmd = [self.python, "-m", "pip", "install", "--no-deps", "--disable-pip-version-check"]
+        for i, source in enumerate(self.filter_sources(req, sources) or []):
+            cmd.append("--index-url" if i == 0 else "--extra-index-url")
+            cmd.append(source["url"])
+            if not source.get("verify_ssl", True):
+                cmd.extend(["--trusted-host", six.moves.urllib.parse.urlparse(source["url"]).hostname])
+        line = req.as_line(include_hashes=False)
+        if line.startswith("-e "):
+            line = line[len("-e "):]
+        if req.editable:
+            cmd.append("-e")
+        cmd.append(line.strip())
+        c = self.run(cmd)
+        return c.returncode
+
+    @contextlib.contextmanager
+    def cd(self, path):
+        """Change to a directory for the duration of the context unless :attr:`thread_safe`
+
+        In thread safe mode, commands are always given an explicit working directory
+        instead and the process-wide working directory is left alone.
+        """
+
+        if self.thread_safe:
+            yield
+        else:
+            with vistir.contextmanagers.cd(path):
+                yield
+
     @contextlib.contextmanager
     def activated(self, include_extras=True, extra_dists=[]):
         """A context manager which activates the virtualenv.
@@ -571,7 +1322,6 @@ class VirtualEnv(object):
                 for extra_dist in extra_dists:
                     if extra_dist not in self.get_working_set():
                         extra_dist.activate(self.sys_path)
-                sys.modules["recursive_monkey_patch"] = self.recursive_monkey_patch
             try:
                 yield
             finally:
@@ -584,41 +1334,153 @@ class VirtualEnv(object):
                 sys.prefix = original_prefix
                 six.moves.reload_module(pkg_resources)
 
-    def run(self, cmd, cwd=os.curdir):
+    def run(self, cmd, cwd=os.curdir, stream=False, output=None, chunk_size=None):
         """Run a command with :class:`~subprocess.Popen` in the context of the virtualenv
 
         :param cmd: A command to run in the virtual environment
         :type cmd: str or list
         :param str cwd: The working directory in which to execute the command, defaults to :data:`os.curdir`
-        :return: A finished command object
-        :rtype: :class:`~subprocess.Popen`
+        :param bool stream: Whether to return a running command whose output can be iterated
+            over as it is produced instead of buffering it, defaults to False
+        :param output: A file descriptor or file object to write the output of a streamed
+            command to directly, defaults to None
+        :param int chunk_size: Stream raw chunks of this size instead of lines, defaults to None
+        :return: A finished command object, or a running one if streaming
+        :rtype: :class:`~subprocess.Popen` or :class:`~mork.streaming.StreamedCommand`
         """
 
         c = None
+        if self.thread_safe:
+            script = vistir.cmdparse.Script.parse(cmd)
+            return self.run_with_environ(
+                script._parts, cwd=cwd, stream=stream, output=output, chunk_size=chunk_size
+            )
         with self.activated():
             script = vistir.cmdparse.Script.parse(cmd)
+            if stream or output is not None:
+                return stream_command(
+                    script._parts, cwd=cwd, output=output, chunk_size=chunk_size
+                )
             c = vistir.misc.run(script._parts, return_object=True, nospin=True, cwd=cwd)
         return c
 
-    def run_py(self, cmd, cwd=os.curdir):
+    def run_py(self, cmd, cwd=os.curdir, stream=False, output=None, chunk_size=None,
+               isolated=False):
         """Run a python command in the virtualenv context.
 
         :param cmd: A command to run in the virtual environment - runs with `python -c`
         :type cmd: str or list
         :param str cwd: The working directory in which to execute the command, defaults to :data:`os.curdir`
-        :return: A finished command object
-        :rtype: :class:`~subprocess.Popen`
+        :param bool stream: Whether to return a running command whose output can be iterated
+            over as it is produced instead of buffering it, defaults to False
+        :param output: A file descriptor or file object to write the output of a streamed
+            command to directly, defaults to None
+        :param int chunk_size: Stream raw chunks of this size instead of lines, defaults to None
+        :param bool isolated: Whether to launch the interpreter in isolated mode with the
+            precomputed :attr:`sys_path` of the environment instead of running :mod:`site`,
+            defaults to False.  See :meth:`get_isolated_launch_args`.
+        :return: A finished command object, or a running one if streaming
+        :rtype: :class:`~subprocess.Popen` or :class:`~mork.streaming.StreamedCommand`
         """
 
         c = None
+        if isolated:
+            return self.run_with_environ(
+                self.get_isolated_launch_args(cmd), cwd=cwd, stream=stream, output=output,
+                chunk_size=chunk_size
+            )
         if isinstance(cmd, six.string_types):
             script = vistir.cmdparse.Script.parse("{0} -c {1}".format(self.python, cmd))
         else:
             script = vistir.cmdparse.Script.parse([self.python, "-c"] + list(cmd))
+        if self.thread_safe:
+            return self.run_with_environ(
+                script._parts, cwd=cwd, stream=stream, output=output, chunk_size=chunk_size
+            )
         with self.activated():
+            if stream or output is not None:
+                return stream_command(
+                    script._parts, cwd=cwd, output=output, chunk_size=chunk_size
+                )
             c = vistir.misc.run(script._parts, return_object=True, nospin=True, cwd=cwd)
         return c
 
+    def run_with_environ(self, cmd, cwd=os.curdir, stream=False, output=None, chunk_size=None):
+        """Run a command with the environment of the virtualenv passed explicitly
+
+        Unlike :meth:`run`, this never activates the virtualenv, so no process-wide state
+        is modified and it is safe to call from multiple threads at once.
+
+        :param list cmd: The command to run
+        :param str cwd: The working directory in which to execute the command, defaults to :data:`os.curdir`
+        :param bool stream: Whether to return a running command, defaults to False
+        :param output: A file descriptor or file object to write the output of a streamed
+            command to directly, defaults to None
+        :param int chunk_size: Stream raw chunks of this size instead of lines, defaults to None
+        :return: A finished command object, or a running one if streaming
+        :rtype: :class:`~subprocess.Popen` or :class:`~mork.streaming.StreamedCommand`
+        """
+
+        env = self.get_environ()
+        if stream or output is not None:
+            return stream_command(cmd, cwd=cwd, env=env, output=output, chunk_size=chunk_size)
+        return run_command(cmd, cwd=cwd, env=env)
+
+    def get_isolated_launch_args(self, cmd):
+        """Get the arguments for a low overhead launch of the virtualenv python.
+
+        The interpreter is started with ``-I -S`` (``-E -s -S`` on python 2), so neither
+        :mod:`site` nor any ``.pth`` files are processed.  Instead, the :attr:`sys_path` of
+        the environment, which is computed once, is injected directly before the command
+        along with the environment's prefix.
+
+        :param cmd: The python code to run, optionally followed by its arguments
+        :type cmd: str or list
+        :return: The arguments to execute
+        :rtype: list
+        """
+
+        if isinstance(cmd, six.string_types):
+            code, args = cmd, []
+        else:
+            code, args = cmd[0], list(cmd[1:])
+        version = self.metadata.version or self.python_version
+        if version and version.startswith("2"):
+            flags = ["-E", "-s", "-S"]
+        else:
+            flags = ["-I", "-S"]
+        sys_path = [path for path in self.sys_path if path]
+        bootstrap = "import sys; sys.path[:] = {0}\n".format(json.dumps(sys_path))
+        if self.is_venv:
+            # Normally set by site.venv(), which doesn't run without site
+            bootstrap += "sys.prefix = sys.exec_prefix = {0}\n".format(
+                json.dumps(self.prefix.as_posix())
+            )
+        return [self.python] + flags + ["-c", bootstrap + code] + args
+
+    def get_environ(self):
+        """Build the environment variables for running a command in the virtualenv.
+
+        Unlike :meth:`activated`, this leaves :data:`os.environ` untouched.
+
+        :return: A copy of :data:`os.environ` updated for the virtualenv
+        :rtype: dict
+        """
+
+        env = os.environ.copy()
+        env["PATH"] = os.pathsep.join([
+            vistir.compat.fs_str(self.scripts_dir),
+            vistir.compat.fs_str(self.prefix.as_posix()),
+            os.environ.get("PATH", os.defpath)
+        ])
+        env["PYTHONIOENCODING"] = vistir.compat.fs_str("utf-8")
+        env["PYTHONDONTWRITEBYTECODE"] = vistir.compat.fs_str("1")
+        env["PYTHONPATH"] = vistir.compat.fs_str(self.base_paths["PYTHONPATH"])
+        env.pop("PYTHONHOME", None)
+        if self.is_venv:
+            env["VIRTUAL_ENV"] = vistir.compat.fs_str(self.prefix.as_posix())
+        return env
+
     def is_installed(self, pkgname):
         """Given a package name, returns whether it is installed in the virtual environment
 
@@ -629,29 +1491,18 @@ class VirtualEnv(object):
 
         return any(d for d in self.get_distributions() if d.project_name == pkgname)
 
-    def get_monkeypatched_pathset(self):
-        """Returns a monkeypatched `UninstallPathset` for using to uninstall packages from the virtualenv
-
-        :return: A patched `UninstallPathset` which enables uninstallation of venv packages
-        :rtype: :class:`pip._internal.req.req_uninstall.UninstallPathset`
-        """
-
-        from pip_shims.shims import InstallRequirement
-        # Determine the path to the uninstall module name based on the install module name
-        uninstall_path = InstallRequirement.__module__.replace(
-            "req_install", "req_uninstall"
-        )
-        req_uninstall = self.safe_import(uninstall_path)
-        self.recursive_monkey_patch.monkey_patch(
-            PatchedUninstaller, req_uninstall.UninstallPathSet
-        )
-        return req_uninstall.UninstallPathSet
-
     @contextlib.contextmanager
     def uninstall(self, pkgname, *args, **kwargs):
         """A context manager which allows uninstallation of packages from the virtualenv
 
+        The files of the package are moved aside when the context is entered, restored
+        if the block raises, and deleted in the background once it completes.  Only the
+        package's own ``RECORD`` is used, so this works the same in :attr:`thread_safe`
+        mode.
+
         :param str pkgname: The name of a package to uninstall
+        :return: The uninstaller, or None if the package isn't installed
+        :rtype: :class:`~mork.uninstall.Uninstaller` or None
 
         >>> venv = VirtualEnv("/path/to/venv/root")
         >>> with venv.uninstall("pytz", auto_confirm=True, verbose=False) as uninstaller:
@@ -660,27 +1511,74 @@ class VirtualEnv(object):
                 print("uninstalled packages: %s" % cleaned)
         """
 
-        auto_confirm = kwargs.pop("auto_confirm", True)
-        verbose = kwargs.pop("verbose", False)
-        with self.activated():
-            pathset_base = self.get_monkeypatched_pathset()
-            dist = next(
-                iter(filter(lambda d: d.project_name == pkgname, self.get_working_set())),
-                None
-            )
-            pathset = pathset_base.from_dist(dist)
-            if pathset is not None:
-                pathset.remove(auto_confirm=auto_confirm, verbose=verbose)
-            try:
-                yield pathset
-            except Exception as e:
-                if pathset is not None:
-                    pathset.rollback()
-            else:
-                if pathset is not None:
-                    pathset.commit()
-            if pathset is None:
-                return
+        # Accepted for compatibility with the pip based implementation
+        kwargs.pop("auto_confirm", True)
+        kwargs.pop("verbose", False)
+        uninstaller = Uninstaller.from_name(pkgname, self.lib_dirs)
+        if uninstaller is not None:
+            uninstaller.remove()
+        try:
+            yield uninstaller
+        except Exception:
+            if uninstaller is not None:
+                uninstaller.rollback()
+            raise
+        else:
+            if uninstaller is not None:
+                uninstaller.commit()
+        finally:
+            self.invalidate_installed_state()
+
+    def invalidate_installed_state(self):
+        """Discard cached state derived from the packages installed in the virtualenv"""
+        cache = tracked_property.get_cache(self)
+        for name in INSTALLED_STATE_PROPERTIES:
+            cache.pop(name, None)
+
+
+def write_installed_files(record_path):
+    """Write the ``installed-files.txt`` of an ``.egg-info`` from a ``--record`` file
+
+    This is what pip does after ``setup.py install``, so the package can be uninstalled.
+
+    :param str record_path: The file passed to ``setup.py install --record``
+    """
+
+    with open(record_path, "r") as fh:
+        installed = [line.strip() for line in fh if line.strip()]
+    egg_info = next((
+        path for path in installed
+        if path.endswith(".egg-info") or os.path.dirname(path).endswith(".egg-info")
+    ), None)
+    if egg_info is None:
+        return
+    if not egg_info.endswith(".egg-info"):
+        egg_info = os.path.dirname(egg_info)
+    if not os.path.isdir(egg_info):
+        return
+    lines = sorted(set(
+        os.path.relpath(path, egg_info) for path in installed if path != egg_info
+    ))
+    with open(os.path.join(egg_info, "installed-files.txt"), "w") as fh:
+        fh.write("\n".join(lines + ["installed-files.txt"]) + "\n")
+
+
+def run_command(cmd, cwd=os.curdir, env=None):
+    """Run a command to completion with an explicit environment.
+
+    :param list cmd: The command to execute
+    :param str cwd: The working directory in which to execute the command
+    :param dict env: The environment to execute the command with
+    :return: A finished command object with its decoded output on ``out`` and ``err``
+    :rtype: :class:`~subprocess.Popen`
+    """
+
+    c = subprocess.Popen(
+        cmd, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True
+    )
+    c.out, c.err = c.communicate()
+    return c
 
 
 SETUPTOOLS_SHIM = (
@@ -690,8 +1588,3 @@ SETUPTOOLS_SHIM = (
     "f.close();"
     "exec(compile(code, __file__, 'exec'))"
 )
-
-
-class PatchedUninstaller(object):
-    def _permitted(self, path):
-        return True
@@ -0,0 +1,157 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import hashlib
+import os
+import shutil
+import sysconfig
+import tempfile
+
+import vistir
+
+
+IMPLEMENTATION_ABBREVIATIONS = {"cpython": "cp", "pypy": "pp", "ironpython": "ip", "jython": "jy"}
+
+IGNORED_SOURCE_DIRS = {".git", ".hg", ".svn", ".tox", ".nox", "__pycache__", "build", "dist"}
+
+
+def hash_source_tree(path):
+    """Compute a stable hash of an unpacked source tree or sdist archive.
+
+    Version control metadata, build artifacts and generated ``.egg-info`` directories
+    are ignored, so rebuilding the metadata of a source tree doesn't change its hash.
+
+    :param str path: The path to a source directory or an archive
+    :return: A hex encoded sha256 digest
+    :rtype: str
+    """
+
+    digest = hashlib.sha256()
+    if os.path.isfile(path):
+        with open(path, "rb") as fh:
+            for chunk in iter(lambda: fh.read(65536), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(
+            d for d in dirs if d not in IGNORED_SOURCE_DIRS and not d.endswith(".egg-info")
+        )
+        for filename in sorted(files):
+            if filename.endswith((".pyc", ".pyo")):
+                continue
+            full_path = os.path.join(root, filename)
+            relpath = os.path.relpath(full_path, path).replace(os.sep, "/")
+            digest.update(vistir.misc.to_bytes(relpath) + b"\0")
+            with open(full_path, "rb") as fh:
+                for chunk in iter(lambda: fh.read(65536), b""):
+                    digest.update(chunk)
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def get_interpreter_tag(metadata):
+    """Build a tag identifying the interpreter an environment's wheels are built for.
+
+    :param metadata: The metadata of the target environment
+    :type metadata: :class:`~mork.metadata.EnvironmentMetadata`
+    :return: A tag such as ``cp37m-linux_x86_64``
+    :rtype: str
+    """
+
+    implementation = (metadata.implementation or "cpython").lower()
+    abbreviation = IMPLEMENTATION_ABBREVIATIONS.get(implementation, implementation)
+    version = "".join((metadata.py_version_short or "").split("."))
+    platform = sysconfig.get_platform().replace("-", "_").replace(".", "_")
+    return "{0}{1}{2}-{3}".format(abbreviation, version, metadata.abiflags or "", platform)
+
+
+class WheelCache(object):
+    """A persistent store of wheels built from sdists.
+
+    Wheels are keyed by the hash of the sdist they were built from and the interpreter
+    tag of the environment they were built for, so they can be shared between
+    environments and runs.
+
+    >>> cache = WheelCache()
+    >>> venv.install(Requirement.from_line("legacy-package"), wheel_cache=cache)
+    """
+
+    def __init__(self, root=None):
+        if root is None:
+            root = self.get_default_root()
+        self.root = vistir.compat.Path(root)
+
+    def __repr__(self):
+        return "<WheelCache {0!r}>".format(self.root.as_posix())
+
+    @classmethod
+    def get_default_root(cls):
+        cache_dir = os.environ.get("MORK_WHEEL_CACHE")
+        if not cache_dir:
+            cache_dir = os.path.join(
+                os.environ.get("XDG_CACHE_HOME", "~/.cache"), "mork", "wheels"
+            )
+        return vistir.compat.Path(os.path.expandvars(cache_dir)).expanduser()
+
+    def get_wheel_dir(self, source_hash, tag):
+        return self.root.joinpath(tag, source_hash[:2], source_hash)
+
+    def get(self, source_hash, tag):
+        """Find a previously built wheel.
+
+        :param str source_hash: The hash of the sdist the wheel was built from
+        :param str tag: The interpreter tag the wheel was built for
+        :return: The path to the cached wheel, if one exists
+        :rtype: str or None
+        """
+
+        wheel_dir = self.get_wheel_dir(source_hash, tag)
+        if not wheel_dir.is_dir():
+            return None
+        wheels = sorted(p for p in wheel_dir.iterdir() if p.name.endswith(".whl"))
+        if not wheels:
+            return None
+        return wheels[0].as_posix()
+
+    def build(self, source_hash, tag, builder):
+        """Build a wheel with the supplied builder and store it in the cache.
+
+        :param str source_hash: The hash of the sdist the wheel is built from
+        :param str tag: The interpreter tag the wheel is built for
+        :param builder: A callable accepting a directory to write the wheel to and
+            returning a return code
+        :return: The path to the cached wheel, or None if no wheel could be built
+        :rtype: str or None
+        """
+
+        wheel_dir = self.get_wheel_dir(source_hash, tag)
+        vistir.path.mkdir_p(wheel_dir.parent.as_posix())
+        build_dir = tempfile.mkdtemp(prefix="mork-wheel", dir=wheel_dir.parent.as_posix())
+        try:
+            returncode = builder(build_dir)
+            built = [name for name in os.listdir(build_dir) if name.endswith(".whl")]
+            if returncode != 0 or len(built) != 1:
+                return None
+            try:
+                os.rename(build_dir, wheel_dir.as_posix())
+            except OSError:
+                # Another process stored the same wheel first
+                if self.get(source_hash, tag) is None:
+                    raise
+        finally:
+            if os.path.exists(build_dir):
+                shutil.rmtree(build_dir, ignore_errors=True)
+        return self.get(source_hash, tag)
+
+    def get_or_build(self, source_hash, tag, builder):
+        """Return the cached wheel for a source, building it first if needed.
+
+        :return: The path to the cached wheel, or None if no wheel could be built
+        :rtype: str or None
+        """
+
+        wheel = self.get(source_hash, tag)
+        if wheel is None:
+            wheel = self.build(source_hash, tag, builder)
+        return wheel
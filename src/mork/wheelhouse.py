@@ -0,0 +1,357 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import collections
+import os
+import re
+import zipfile
+
+import pkg_resources
+import vistir
+
+from .check import applies, read_headers
+from .tagindex import TagIndex, TagRanking
+from .utils import canonicalize_name, is_python_compatible
+
+
+#: The number of times resolution restarts after a pinned version is contradicted
+MAX_ROUNDS = 100
+
+BUILD_NUMBER_RE = re.compile(r"\d*")
+
+
+def read_wheel_metadata(path):
+    """Read the ``METADATA`` headers of a wheel without extracting it.
+
+    Opening the archive only reads its central directory, from the end of the file,
+    after which the single ``METADATA`` member is read at its recorded offset.
+
+    :param str path: The path of the wheel
+    :return: A mapping of lower cased header names to lists of values
+    :rtype: dict
+    :raises ValueError: If the wheel isn't a zip archive or has no ``METADATA``
+    """
+
+    try:
+        zf = zipfile.ZipFile(path)
+    except zipfile.BadZipfile as e:
+        raise ValueError("{0} is not a valid wheel: {1}".format(path, e))
+    with zf:
+        candidates = [
+            name for name in zf.namelist()
+            if name.count("/") == 1 and name.endswith(".dist-info/METADATA")
+        ]
+        if not candidates:
+            raise ValueError("{0} has no .dist-info/METADATA".format(path))
+        if len(candidates) > 1:
+            # Prefer the metadata directory named after the wheel itself
+            prefix = "-".join(os.path.basename(path).split("-")[:2]).lower()
+            candidates.sort(key=lambda name: not name.lower().startswith(prefix))
+        return read_headers(vistir.misc.to_text(zf.read(candidates[0])))
+
+
+class WheelInfo(object):
+    """A wheel in a wheelhouse, indexed by its filename.
+
+    The metadata is only read from the archive when it is first needed.
+
+    :param record: The parsed filename of the wheel
+    :type record: :class:`~mork.tagindex.WheelRecord`
+    :param tag_index: The index the record belongs to
+    :type tag_index: :class:`~mork.tagindex.TagIndex`
+    """
+
+    def __init__(self, record, tag_index):
+        self.path = record.path
+        self.name = record.name
+        self.key = record.key
+        self.version = record.version
+        self.build = record.build
+        self.tagset = record.tagset
+        self.tag_index = tag_index
+        self._headers = None
+
+    def __repr__(self):
+        return "<WheelInfo {0}=={1} ({2!r})>".format(self.name, self.version, self.path)
+
+    @property
+    def tags(self):
+        return self.tag_index.get_tags(self.tagset)
+
+    @property
+    def parsed_version(self):
+        return pkg_resources.parse_version(self.version)
+
+    @property
+    def headers(self):
+        if self._headers is None:
+            self._headers = read_wheel_metadata(self.path)
+        return self._headers
+
+    @property
+    def requires_python(self):
+        return self.headers.get("requires-python", [None])[0]
+
+    @property
+    def requirements(self):
+        requirements = []
+        for line in self.headers.get("requires-dist", []):
+            try:
+                requirements.append(pkg_resources.Requirement.parse(line))
+            except ValueError:
+                continue
+        return requirements
+
+
+class PlanItem(object):
+    """A distribution selected by :meth:`Wheelhouse.resolve`.
+
+    ``action`` is ``install`` for distributions which aren't installed, ``upgrade`` for
+    installed distributions which are replaced by another version and ``keep`` for
+    installed distributions which already satisfy every requirement.
+    """
+
+    __slots__ = ("name", "version", "action", "wheel", "installed_version", "required_by")
+
+    def __init__(self, name, version, action, wheel=None, installed_version=None,
+                 required_by=None):
+        self.name = name
+        self.version = version
+        self.action = action
+        self.wheel = wheel
+        self.installed_version = installed_version
+        self.required_by = required_by or []
+
+    def __repr__(self):
+        return "<PlanItem {0} {1}=={2}>".format(self.action, self.name, self.version)
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "version": self.version,
+            "action": self.action,
+            "wheel": self.wheel,
+            "installed_version": self.installed_version,
+            "required_by": self.required_by,
+        }
+
+
+class InstallPlan(object):
+    """The result of resolving a set of requirements against a wheelhouse."""
+
+    def __init__(self, items=None, problems=None):
+        #: The selected distributions, in the order they were resolved
+        self.items = items or []
+        #: Descriptions of requirements which couldn't be satisfied
+        self.problems = problems or []
+
+    def __repr__(self):
+        return "<InstallPlan items={0} problems={1}>".format(len(self.items), len(self.problems))
+
+    @property
+    def ok(self):
+        return not self.problems
+
+    @property
+    def wheels(self):
+        """The wheels to install, in resolution order."""
+        return [item.wheel for item in self.items if item.action != "keep"]
+
+    def as_dict(self):
+        return {
+            "ok": self.ok,
+            "items": [item.as_dict() for item in self.items],
+            "problems": self.problems,
+        }
+
+
+class Wheelhouse(object):
+    """An index of the wheels in a set of local directories.
+
+    Indexing only lists the directories and parses filenames, or reuses the filenames
+    parsed by a persistent :class:`~mork.tagindex.TagIndex`; ``METADATA`` is read from
+    a wheel only when it is considered during resolution.
+
+    :param list directories: The directories holding wheels
+    :param tag_index: The index of wheel filenames and tags, defaults to one kept in
+        memory
+    :type tag_index: :class:`~mork.tagindex.TagIndex`
+    """
+
+    def __init__(self, directories, tag_index=None):
+        self.directories = [vistir.compat.Path(d).as_posix() for d in directories]
+        self.tag_index = tag_index if tag_index is not None else TagIndex(persist=False)
+        #: Wheels by canonical project name
+        self.index = {}
+        for directory in self.directories:
+            for record in self.tag_index.load(directory):
+                self.index.setdefault(record.key, []).append(WheelInfo(record, self.tag_index))
+
+    def __repr__(self):
+        return "<Wheelhouse {0!r} projects={1}>".format(self.directories, len(self.index))
+
+    def __len__(self):
+        return sum(len(wheels) for wheels in self.index.values())
+
+    def get_compatible(self, project, supported_tags):
+        """Get the wheels of a project an environment can install, best first.
+
+        :param str project: The name of the project
+        :param supported_tags: The tags of the environment, most preferred first, or
+            their ranking by the tag index
+        :type supported_tags: list or :class:`~mork.tagindex.TagRanking`
+        :return: Wheels ordered by version, then by the preference of their best tag,
+            then by build number
+        :rtype: list(:class:`~mork.wheelhouse.WheelInfo`)
+        """
+
+        ranking = supported_tags if isinstance(supported_tags, TagRanking) else (
+            self.tag_index.rank(supported_tags)
+        )
+        compatible = []
+        for wheel in self.index.get(canonicalize_name(project), []):
+            rank = ranking.get(wheel.tagset)
+            if rank is None:
+                continue
+            build = int(BUILD_NUMBER_RE.match(wheel.build or "").group() or 0)
+            compatible.append(((wheel.parsed_version, -rank, build), wheel))
+        compatible.sort(key=lambda item: item[0], reverse=True)
+        return [wheel for _, wheel in compatible]
+
+    def find_best(self, project, requirements, supported_tags, python_version,
+                  prereleases=False, problems=None):
+        """Find the best wheel of a project which satisfies a set of requirements.
+
+        Wheels whose metadata can't be read are skipped, as are wheels whose
+        ``Requires-Python`` can't be parsed.
+
+        :param list problems: A list to add a description of each unreadable wheel to
+        :rtype: :class:`~mork.wheelhouse.WheelInfo` or None
+        """
+
+        for wheel in self.get_compatible(project, supported_tags):
+            if not all(
+                r.specifier.contains(wheel.version, prereleases=prereleases or None)
+                for r in requirements
+            ):
+                continue
+            try:
+                requires_python = wheel.requires_python
+            except (IOError, OSError, ValueError) as e:
+                if problems is not None:
+                    problems.append("Skipped unreadable wheel {0}: {1}".format(wheel.path, e))
+                continue
+            if not is_python_compatible(requires_python, python_version):
+                continue
+            return wheel
+        return None
+
+    def resolve(self, requirements, environment, supported_tags, installed=None,
+                upgrade=False, prereleases=False):
+        """Resolve a set of requirements to wheels of the wheelhouse.
+
+        Requirements are resolved breadth first, picking the best compatible wheel
+        satisfying every requirement seen so far for each project.  When a requirement
+        found later contradicts an earlier pick, resolution starts again with that
+        requirement known up front, so the earlier pick can satisfy it.
+
+        :param list requirements: Requirement lines or :class:`pkg_resources.Requirement`
+        :param dict environment: The marker environment of the target environment
+        :param list supported_tags: The wheel tags of the target, most preferred first
+        :param dict installed: :class:`~mork.check.InstalledRequirements` of the target
+            by canonical name, which are kept when they satisfy the requirements
+        :param bool upgrade: Whether to replace installed distributions with the best
+            wheel even when they satisfy the requirements
+        :param bool prereleases: Whether to consider prereleases
+        :rtype: :class:`~mork.wheelhouse.InstallPlan`
+        """
+
+        roots = [
+            req if isinstance(req, pkg_resources.Requirement)
+            else pkg_resources.Requirement.parse(req)
+            for req in requirements
+        ]
+        installed = installed or {}
+        ranks = self.tag_index.rank(supported_tags)
+        python_version = environment["python_full_version"]
+        constraints = collections.OrderedDict()
+        for _ in range(MAX_ROUNDS):
+            pins, extras, required_by, problems = collections.OrderedDict(), {}, {}, []
+            queue = collections.deque((None, req) for req in roots)
+            restart = False
+            while queue and not restart:
+                parent, req = queue.popleft()
+                key = canonicalize_name(req.project_name)
+                constraints.setdefault(key, collections.OrderedDict()).setdefault(
+                    (parent, str(req)), req
+                )
+                # Requirements of a parent pinned to another version no longer apply
+                active = [
+                    r for (p, _), r in constraints[key].items()
+                    if p is None or pins.get(p[0], (None, p[1]))[1] == p[1]
+                ]
+                if parent is not None:
+                    required_by.setdefault(key, set()).add(parent[0])
+                pinned = pins.get(key)
+                if pinned is not None:
+                    if not all(r.specifier.contains(pinned[1], prereleases=True) for r in active):
+                        restart = True
+                        continue
+                    new_extras = set(canonicalize_name(e) for e in req.extras) - extras[key]
+                else:
+                    pinned = self._pick(
+                        key, active, installed, upgrade, ranks, python_version, prereleases,
+                        problems
+                    )
+                    if pinned is None:
+                        problems.append("No wheel satisfies {0}{1}".format(
+                            ", ".join(str(r) for r in active),
+                            " (required by {0})".format(parent[0]) if parent else ""
+                        ))
+                        continue
+                    pins[key] = pinned
+                    extras[key] = set()
+                    new_extras = set([""]) | set(canonicalize_name(e) for e in req.extras)
+                extras[key].update(new_extras)
+                source = pinned[2]
+                for extra in sorted(new_extras):
+                    for dependency in source.requirements:
+                        if applies(dependency, environment, extra):
+                            queue.append(((key, pinned[1]), dependency))
+            if not restart:
+                break
+        else:
+            problems = ["Resolution did not settle after {0} rounds".format(MAX_ROUNDS)]
+            pins = {}
+        items = []
+        for key, (name, version, source) in pins.items():
+            current = installed.get(key)
+            if isinstance(source, WheelInfo):
+                action = "install" if current is None else "upgrade"
+                wheel = source.path
+            else:
+                action, wheel = "keep", None
+            items.append(PlanItem(
+                name, version, action, wheel=wheel,
+                installed_version=current.version if current is not None else None,
+                required_by=sorted(required_by.get(key, ())),
+            ))
+        return InstallPlan(items, problems)
+
+    def _pick(self, key, requirements, installed, upgrade, ranks, python_version, prereleases,
+              problems):
+        current = installed.get(key)
+        if current is not None and not upgrade and all(
+            r.specifier.contains(current.version, prereleases=True) for r in requirements
+        ):
+            return current.name, current.version, current
+        wheel = self.find_best(
+            key, requirements, ranks, python_version, prereleases=prereleases, problems=problems
+        )
+        if wheel is None:
+            return None
+        if current is not None and current.version == wheel.version:
+            return current.name, current.version, current
+        # Filenames escape the project name, so prefer the one in the metadata
+        return wheel.headers.get("name", [wheel.name])[0], wheel.version, wheel
@@ -2,22 +2,29 @@
 
 import pytest
 import mork
+import mork.seed
+import mork.virtualenv
 import os
-import sys
+import py
 import vistir
+import zipfile
+
+from mork.editable import get_record_hash
+
+
+@pytest.fixture(scope="session")
+def seed_store(tmpdir_factory):
+    return mork.seed.SeedStore(tmpdir_factory.mktemp("seed-store").strpath)
 
 
 @pytest.fixture(scope="function")
-def virtualenv(tmpdir_factory):
+def virtualenv(tmpdir_factory, seed_store):
     venv_dir = tmpdir_factory.mktemp("passa-testenv")
     print("Creating virtualenv {0!r}".format(venv_dir.strpath))
     venv_path = vistir.compat.Path(venv_dir.strpath).as_posix()
-    c = vistir.misc.run([sys.executable, "-m", "virtualenv", venv_path],
-                            return_object=True, block=True, nospin=True)
-    if c.returncode == 0:
-        print("Virtualenv created...")
-        return venv_dir
-    raise RuntimeError("Failed creating virtualenv for testing...{0!r}".format(c.err.strip()))
+    mork.virtualenv.VirtualEnv.create(venv_path, seed_store=seed_store)
+    print("Virtualenv created...")
+    return venv_dir
 
 
 @pytest.fixture
@@ -28,3 +35,99 @@ def tmpvenv(virtualenv, tmpdir):
         yield mork.virtualenv.VirtualEnv(venv_path)
     if "PACKAGEBUILDER_CACHE_DIR" in os.environ:
         del os.environ["PACKAGEBUILDER_CACHE_DIR"]
+
+
+@pytest.fixture
+def make_venv(tmpdir):
+    """Create empty virtualenvs, without any seed packages, under ``tmpdir``."""
+
+    def make_venv(name="venv", **kwargs):
+        return mork.virtualenv.VirtualEnv.create(
+            tmpdir.join(name).strpath, seed_packages=(), **kwargs
+        )
+
+    return make_venv
+
+
+@pytest.fixture
+def empty_venv(make_venv):
+    return make_venv()
+
+
+def _to_bytes(content):
+    return content if isinstance(content, bytes) else content.encode("utf-8")
+
+
+@pytest.fixture
+def add_dist():
+    """Fake an installed distribution in a library directory.
+
+    ``files`` maps paths relative to the library directory to their contents, or lists
+    paths to create empty; each is written and listed in ``RECORD`` with its hash, along
+    with the metadata files.  ``records`` are extra ``RECORD`` lines for files which
+    aren't created.
+    """
+
+    def add_dist(lib_dir, name, version, files=(), records=(), requires=(), entry_points=None):
+        lib_dir = py.path.local(str(lib_dir))
+        dist_info = lib_dir.join("{0}-{1}.dist-info".format(name, version)).ensure(dir=True)
+        headers = ["Metadata-Version: 2.1", "Name: {0}".format(name), "Version: {0}".format(version)]
+        headers.extend("Requires-Dist: {0}".format(line) for line in requires)
+        dist_info.join("METADATA").write("\n".join(headers) + "\n")
+        metadata_files = ["METADATA", "RECORD"]
+        if entry_points:
+            dist_info.join("entry_points.txt").write(entry_points)
+            metadata_files.insert(1, "entry_points.txt")
+        if not isinstance(files, dict):
+            files = dict((path, b"") for path in files)
+        lines = []
+        for path, content in sorted(files.items()):
+            content = _to_bytes(content)
+            lib_dir.join(path).ensure().write_binary(content)
+            lines.append("{0},{1},{2}".format(path, get_record_hash(content), len(content)))
+        lines.extend(records)
+        lines.extend("{0}/{1},,".format(dist_info.basename, path) for path in metadata_files)
+        dist_info.join("RECORD").write("\n".join(lines) + "\n")
+        return dist_info
+
+    return add_dist
+
+
+@pytest.fixture
+def make_wheel():
+    """Build pure python wheels with hashed ``RECORD`` files.
+
+    ``files`` maps archive names to contents and defaults to a single module named after
+    the project.
+    """
+
+    def make_wheel(directory, name, version, files=None, requires=(), requires_python=None,
+                   entry_points=None, tag="py3-none-any"):
+        dist_info = "{0}-{1}.dist-info".format(name, version)
+        path = directory.join("{0}-{1}-{2}.whl".format(name, version, tag))
+        headers = ["Metadata-Version: 2.1", "Name: {0}".format(name.replace("_", "-")),
+                   "Version: {0}".format(version)]
+        if requires_python:
+            headers.append("Requires-Python: {0}".format(requires_python))
+        headers.extend("Requires-Dist: {0}".format(req) for req in requires)
+        if files is None:
+            files = {"{0}.py".format(name.lower()): "VERSION = {0!r}\n".format(version)}
+        files = dict(files)
+        files[dist_info + "/METADATA"] = "\n".join(headers) + "\n\nA description\n"
+        files[dist_info + "/WHEEL"] = "Wheel-Version: 1.0\nRoot-Is-Purelib: true\n"
+        if entry_points:
+            files[dist_info + "/entry_points.txt"] = entry_points
+        files = dict((arcname, _to_bytes(data)) for arcname, data in files.items())
+        records = [
+            "{0},{1},{2}".format(arcname, get_record_hash(data), len(data))
+            for arcname, data in sorted(files.items())
+        ]
+        files[dist_info + "/RECORD"] = _to_bytes(
+            "\n".join(records + [dist_info + "/RECORD,,"]) + "\n"
+        )
+        with zipfile.ZipFile(path.strpath, "w") as zf:
+            for arcname, data in sorted(files.items()):
+                zf.writestr(arcname, data)
+        return path
+
+    return make_wheel
@@ -0,0 +1,112 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, print_function
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import mork
+from mork.batch import Batch
+from mork.cli import main
+
+
+@pytest.fixture
+def venvs(make_venv):
+    return [make_venv(name).prefix.as_posix() for name in ("first", "second")]
+
+
+def run_main(capsys, argv):
+    status = main(argv)
+    out, err = capsys.readouterr()
+    return status, [json.loads(line) for line in out.splitlines()], err
+
+
+def test_batch_toml(venvs, tmpdir, capsys, add_dist):
+    add_dist(mork.VirtualEnv(venvs[0]).lib_dirs[0], "batchdist", "1.0", files=["batchdist.py"])
+    jobfile = tmpdir.join("jobs.toml")
+    jobfile.write("\n".join([
+        "venvs = [{0}]".format(", ".join(json.dumps(venv) for venv in venvs)),
+        "[[jobs]]", 'operation = "verify"',
+        "[[jobs]]", 'id = "hello"', 'operation = "run"', "venv = {0}".format(json.dumps(venvs[1])),
+        'command = ["python", "-c", "print(42)"]',
+        "[[jobs]]", 'operation = "uninstall"', "venv = {0}".format(json.dumps(venvs[0])),
+        'package = "batchdist"',
+        "[[jobs]]", 'operation = "check"',
+    ]) + "\n")
+    status, results, _ = run_main(capsys, ["batch", jobfile.strpath])
+    assert status == 0
+    assert [(r["job"], r["operation"], r["ok"]) for r in results] == [
+        ("0", "verify", True), ("0", "verify", True), ("hello", "run", True),
+        ("2", "uninstall", True), ("3", "check", True), ("3", "check", True),
+    ]
+    assert results[2]["result"]["out"].strip() == "42"
+    assert [os.path.basename(p) for p in results[3]["result"]["paths"]] == [
+        "METADATA", "RECORD", "batchdist.py"
+    ]
+    assert not os.path.exists(os.path.join(mork.VirtualEnv(venvs[0]).lib_dirs[0], "batchdist.py"))
+
+
+def test_batch_fail_fast(venvs, tmpdir, capsys):
+    jobs = [
+        {"operation": "run", "venv": venvs[0], "command": ["python", "-c", "raise SystemExit(3)"]},
+        {"operation": "verify", "venvs": venvs},
+    ]
+    jobfile = tmpdir.join("jobs.json")
+    jobfile.write(json.dumps(jobs))
+    status, results, _ = run_main(capsys, ["batch", jobfile.strpath])
+    assert status == 1
+    assert [r["ok"] for r in results] == [False, True, True]
+    status, results, _ = run_main(capsys, ["batch", "--fail-fast", jobfile.strpath])
+    assert status == 1
+    assert [r["result"]["returncode"] for r in results] == [3]
+
+
+def test_batch_uninstall_missing_package(venvs, tmpdir, capsys):
+    jobfile = tmpdir.join("jobs.json")
+    jobfile.write(json.dumps({"venvs": venvs, "jobs": [
+        {"operation": "uninstall", "package": "missing"}, {"operation": "verify"},
+    ]}))
+    status, results, _ = run_main(capsys, ["batch", "--fail-fast", jobfile.strpath])
+    assert status == 0
+    assert [r["ok"] for r in results] == [True, True, True, True]
+    assert results[0]["result"] == {"package": "missing", "paths": [], "skipped": True}
+
+
+def test_batch_shares_environments(venvs):
+    batch = Batch.from_data({"venvs": venvs[:1], "jobs": [
+        {"operation": "verify"}, {"operation": "installed"},
+    ]})
+    loaded = []
+    for job, result in batch:
+        assert result.ok
+        loaded.append(id(batch.venvs[venvs[0]]))
+    assert len(set(loaded)) == 1
+    assert batch.venvs == {}
+
+
+def test_invalid_job_file(tmpdir, capsys):
+    jobfile = tmpdir.join("jobs.json")
+    jobfile.write(json.dumps({"venvs": ["/nonexistent"], "jobs": [{"operation": "explode"}]}))
+    status, results, err = run_main(capsys, ["batch", jobfile.strpath])
+    assert (status, results) == (2, [])
+    assert "Unknown operation: 'explode'" in err
+    jobfile.write(json.dumps([{"operation": "verify"}]))
+    status, _, err = run_main(capsys, ["batch", jobfile.strpath])
+    assert status == 2 and "No environments" in err
+    jobfile.write(json.dumps({"venvs": ["/nonexistent"], "jobs": ["verify"]}))
+    status, _, err = run_main(capsys, ["batch", jobfile.strpath])
+    assert status == 2 and "Job '0' must be a table" in err
+    jobfile.write(json.dumps("verify"))
+    status, _, err = run_main(capsys, ["batch", jobfile.strpath])
+    assert status == 2 and "table or a list of jobs" in err
+
+
+def test_module_entry_point():
+    out = subprocess.check_output(
+        [sys.executable, "-m", "mork", "--version"], universal_newlines=True
+    )
+    assert out.strip() == mork.__version__
@@ -0,0 +1,136 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, print_function
+
+import os
+import stat
+import subprocess
+import sys
+
+import pytest
+
+import mork
+from mork.build import BuildOptions
+
+
+SETUP_PY = """
+from setuptools import Extension, setup
+
+setup(
+    name="sampleext",
+    version="1.0",
+    ext_modules=[
+        Extension("sampleext", sources=["sampleext.c"] + ["part{0}.c".format(i) for i in range(4)]),
+        Extension("sampleext_other", sources=["other.c"]),
+    ],
+)
+"""
+
+MODULE_C = """
+#include <Python.h>
+%(declarations)s
+static PyObject *total(PyObject *self, PyObject *args) {
+    return PyLong_FromLong(%(calls)s);
+}
+static PyMethodDef methods[] = {{"total", total, METH_NOARGS, NULL}, {NULL, NULL, 0, NULL}};
+static struct PyModuleDef module = {PyModuleDef_HEAD_INIT, "%(name)s", NULL, -1, methods};
+PyMODINIT_FUNC PyInit_%(name)s(void) { return PyModule_Create(&module); }
+"""
+
+LAUNCHER = """#!/bin/sh
+echo "$@" >> "$(dirname "$0")/launched.log"
+exec "$@"
+"""
+
+
+def make_sample_extension(tmpdir):
+    project = tmpdir.mkdir("sampleext")
+    project.join("setup.py").write(SETUP_PY)
+    for index in range(4):
+        project.join("part{0}.c".format(index)).write(
+            "long part{0}(void) {{ return {0}; }}\n".format(index)
+        )
+    project.join("sampleext.c").write(MODULE_C % {
+        "name": "sampleext",
+        "declarations": "".join("long part{0}(void);\n".format(i) for i in range(4)),
+        "calls": " + ".join("part{0}()".format(i) for i in range(4)),
+    })
+    project.join("other.c").write(MODULE_C % {
+        "name": "sampleext_other", "declarations": "", "calls": "42",
+    })
+    return project
+
+
+@pytest.fixture
+def launcher(tmpdir):
+    path = tmpdir.mkdir("launcher").join("fake-ccache")
+    path.write(LAUNCHER)
+    os.chmod(path.strpath, os.stat(path.strpath).st_mode | stat.S_IEXEC)
+    return path
+
+
+def test_build_options():
+    options = BuildOptions(jobs=4, compiler_launcher="ccache", env={"CCACHE_DIR": "/cache"})
+    assert options.get_command_args() == ["build_ext", "--parallel=4"]
+    env = options.get_environ({"PATH": "/bin"}, "/tmp/report.json")
+    assert env["MORK_BUILD_JOBS"] == "4"
+    assert env["MORK_COMPILER_LAUNCHER"] == "ccache"
+    assert env["CCACHE_DIR"] == "/cache"
+    assert env["MORK_BUILD_REPORT"] == "/tmp/report.json"
+    assert BuildOptions().get_command_args() == []
+    assert BuildOptions(jobs=0).jobs >= 1
+    with pytest.raises(ValueError):
+        BuildOptions(jobs=-1)
+
+
+def test_parallel_setuptools_install(tmpvenv, tmpdir, launcher):
+    project = make_sample_extension(tmpdir)
+    options = BuildOptions(jobs=3, compiler_launcher=launcher.strpath)
+    returncode = tmpvenv.setuptools_install(
+        project.strpath, "sampleext", project.join("setup.py").strpath, build_options=options
+    )
+    record, = tmpvenv.build_records
+    assert returncode == 0, record.err
+    assert record.ok and record.command == "install"
+    assert record.config["jobs"] == 3
+    assert record.config["CC"].startswith(launcher.strpath + " ")
+    assert record.compile_duration > 0
+    assert sorted(name for name, _ in record.extensions) == ["sampleext", "sampleext_other"]
+    launched = launcher.dirpath().join("launched.log").read().splitlines()
+    assert len([line for line in launched if " -c " in line]) == 6
+    output = subprocess.check_output([
+        tmpvenv.python, "-c", "import sampleext, sampleext_other; "
+        "print(sampleext.total(), sampleext_other.total())"
+    ], cwd=tmpdir.strpath)
+    assert output.decode("utf-8").split() == ["6", "42"]
+    with tmpvenv.uninstall("sampleext") as uninstaller:
+        assert uninstaller
+    assert not tmpvenv.is_installed("sampleext")
+
+
+def test_setup_install_args(tmpvenv):
+    args = tmpvenv.get_setup_install_args("sampleext", "setup.py")
+    assert args[4] == "install"
+    assert "--install-headers={0}/include/site/python{1}/sampleext".format(
+        tmpvenv.prefix.as_posix(), tmpvenv.python_version
+    ) in args
+    args = tmpvenv.get_setup_install_args(
+        "sampleext", "setup.py", build_options=BuildOptions(jobs=2)
+    )
+    assert args[4:7] == ["build_ext", "--parallel=2", "install"]
+
+
+def test_build_wheel_records_failures(tmpdir):
+    project = make_sample_extension(tmpdir)
+    project.join("other.c").write("this is not C\n")
+    wheel_dir = tmpdir.mkdir("wheels")
+    venv = mork.VirtualEnv(sys.prefix)
+    returncode = venv.setuptools_build_wheel(
+        project.strpath, project.join("setup.py").strpath, wheel_dir.strpath,
+        build_options=BuildOptions(jobs=2)
+    )
+    record, = venv.build_records
+    assert returncode != 0 and not record.ok
+    assert record.command == "bdist_wheel"
+    assert "other.c" in record.err
+    assert not wheel_dir.listdir()
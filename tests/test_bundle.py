@@ -0,0 +1,112 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, print_function
+
+import os
+import subprocess
+import sys
+import zipfile
+
+import pytest
+
+from mork.bundle import Bundle, BundlePlan, benchmark_bundle
+
+
+@pytest.fixture
+def lib_dir(tmpdir):
+    lib_dir = tmpdir.mkdir("site-packages")
+    lib_dir.join("plain.py").write("VALUE = 'plain'\n")
+    lib_dir.join("pure", "__init__.py").ensure().write("from .sub import VALUE\n")
+    lib_dir.join("pure", "sub.py").write("VALUE = 'pure'\n")
+    lib_dir.join("pure", "__pycache__", "sub.cpython-99.pyc").ensure()
+    lib_dir.join("withdata", "__init__.py").ensure().write("VALUE = 'withdata'\n")
+    lib_dir.join("withdata", "data.json").write("{}\n")
+    lib_dir.join("_speedups.so").write_binary(b"\x7fELF")
+    lib_dir.join("plain-1.0.dist-info", "METADATA").ensure().write("Name: plain\n")
+    lib_dir.join("extra.pth").write("import sys; sys.from_pth = True\n")
+    return lib_dir
+
+
+def test_bundle_plan(lib_dir):
+    plan = BundlePlan.from_lib_dir(lib_dir.strpath)
+    assert plan.zipped == ["plain-1.0.dist-info", "plain.py", "pure"]
+    assert plan.on_disk == ["_speedups.so", "extra.pth", "withdata"]
+
+
+def test_export_bundle(lib_dir, tmpdir):
+    bundle = Bundle.export(lib_dir.strpath, tmpdir.join("bundle").strpath)
+    assert bundle.index == {
+        "_speedups": "disk", "plain": "zip", "pure": "zip", "withdata": "disk"
+    }
+    with zipfile.ZipFile(bundle.archive) as zf:
+        names = sorted(zf.namelist())
+    assert names == [
+        "plain-1.0.dist-info/METADATA", "plain.py", "plain.pyc",
+        "pure/__init__.py", "pure/__init__.pyc", "pure/sub.py", "pure/sub.pyc",
+    ]
+    assert sorted(tmpdir.join("bundle", "site-packages").listdir()) == [
+        tmpdir.join("bundle", "site-packages", name)
+        for name in ("_speedups.so", "extra.pth", "withdata")
+    ]
+    with pytest.raises(OSError):
+        Bundle.export(lib_dir.strpath, tmpdir.join("bundle").strpath)
+
+    script = (
+        "import sys; from mork.bundle import Bundle; Bundle(sys.argv[1]).activate(); "
+        "import plain, pure, withdata; "
+        "print(plain.VALUE, pure.VALUE, withdata.VALUE, sys.from_pth, "
+        "pure.__file__.startswith(sys.argv[1]))"
+    )
+    out = subprocess.check_output(
+        [sys.executable, "-c", script, bundle.path.as_posix()],
+        stderr=subprocess.PIPE, universal_newlines=True
+    )
+    assert out.split() == ["plain", "pure", "withdata", "True", "True"]
+
+
+IMPORT_PURE = "import sys; sys.path.insert(0, sys.argv[1]); import pure"
+
+
+def test_bytecode_is_used(lib_dir, tmpdir):
+    bundle = Bundle.export(lib_dir.strpath, tmpdir.join("bundle").strpath)
+    c = subprocess.Popen(
+        [sys.executable, "-S", "-v", "-c", IMPORT_PURE, bundle.archive],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True
+    )
+    _, err = c.communicate()
+    assert c.returncode == 0
+    assert "stale" not in err
+    assert "bad magic" not in err
+
+
+def test_benchmark_bundle(lib_dir, tmpdir):
+    bundle = Bundle.export(lib_dir.strpath, tmpdir.join("bundle").strpath)
+    benchmark = benchmark_bundle(bundle, lib_dir.strpath, ["plain", "pure"], repeat=2)
+    assert len(benchmark.unpacked_us) == len(benchmark.bundled_us) == 2
+    assert benchmark.bundled > 0 and benchmark.speedup > 0
+    assert benchmark.as_dict()["modules"] == ["plain", "pure"]
+
+
+def test_benchmark_ignores_pythonpath(lib_dir, tmpdir, monkeypatch):
+    bundle = Bundle.export(lib_dir.strpath, tmpdir.join("bundle").strpath)
+    tmpdir.join("bundle", "site-packages", "withdata").remove()
+    monkeypatch.setenv("PYTHONPATH", lib_dir.strpath)
+    with pytest.raises(RuntimeError):
+        benchmark_bundle(bundle, lib_dir.strpath, ["withdata"], repeat=1)
+
+
+def test_virtualenv_benchmark_uses_bundle(tmpvenv, tmpdir):
+    purelib = tmpvenv.paths["purelib"]
+    with open(os.path.join(purelib, "bundled_module.py"), "w") as fh:
+        fh.write("VALUE = 1\n")
+    bundle = tmpvenv.export_bundle(tmpdir.join("bundle").strpath)
+    assert tmpvenv.benchmark_bundle(bundle, ["bundled_module"], repeat=1).bundled > 0
+    # Remove the module from the archive, leaving it in site-packages
+    with zipfile.ZipFile(bundle.archive) as zf:
+        members = [(info, zf.read(info)) for info in zf.infolist()]
+    with zipfile.ZipFile(bundle.archive, "w") as zf:
+        for info, data in members:
+            if not info.filename.startswith("bundled_module."):
+                zf.writestr(info, data)
+    with pytest.raises(RuntimeError):
+        tmpvenv.benchmark_bundle(bundle, ["bundled_module"], repeat=1)
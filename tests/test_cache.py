@@ -0,0 +1,86 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, print_function
+
+import sys
+
+import pytest
+
+import mork
+
+from mork.cache import DependencyTracker, tracked_property
+
+
+class Tracked(object):
+    def __init__(self, path, backend="poll"):
+        self.path = path
+        self.backend = backend
+        self.computed = 0
+
+    def get_cache_tracker(self, name):
+        return DependencyTracker([self.path], backend=self.backend)
+
+    @tracked_property
+    def contents(self):
+        self.computed += 1
+        with open(self.path) as fh:
+            return fh.read()
+
+
+@pytest.mark.parametrize("backend", ["poll", "inotify"])
+def test_tracked_property_invalidation(tmpdir, backend):
+    target = tmpdir.join("dependency.txt")
+    target.write("one")
+    obj = Tracked(target.strpath, backend=backend)
+    assert obj.contents == "one"
+    assert obj.contents == "one"
+    assert obj.computed == 1
+    target.write("second")
+    assert obj.contents == "second"
+    assert obj.computed == 2
+    del obj.contents
+    assert obj.contents == "second"
+    assert obj.computed == 3
+
+
+@pytest.mark.parametrize("backend", ["poll", "inotify"])
+def test_trackers_share_dependency(tmpdir, backend):
+    target = tmpdir.join("dependency.txt")
+    target.write("one")
+    first = DependencyTracker([target.strpath], backend=backend)
+    second = DependencyTracker([target.strpath], backend=backend)
+    assert not first.changed()
+    assert not second.changed()
+    target.write("second")
+    assert first.changed()
+    assert first.changed()
+    assert second.changed()
+    third = DependencyTracker([target.strpath], backend=backend)
+    assert not third.changed()
+
+
+def test_tracked_property_missing_dependency(tmpdir):
+    target = tmpdir.join("dependency.txt")
+    target.write("one")
+    obj = Tracked(target.strpath)
+    obj.contents
+    target.remove()
+    obj.path = tmpdir.join("dependency.txt").strpath
+    target.write("two")
+    assert obj.contents == "two"
+
+
+@pytest.mark.skipif(sys.version_info < (3, 3), reason="requires the venv module")
+def test_virtualenv_metadata_invalidation(tmpdir, empty_venv):
+    venv_path = tmpdir.join("venv")
+    venv = mork.VirtualEnv(venv_path.strpath)
+    original = venv.metadata
+    assert venv.metadata is original
+    cfg = venv_path.join("pyvenv.cfg")
+    cfg.write(cfg.read() + "\nimplementation = PyPy\n")
+    assert venv.metadata is not original
+    assert venv.metadata.implementation == "PyPy"
+    uncached = mork.VirtualEnv(venv_path.strpath, cache_backend=None)
+    metadata = uncached.metadata
+    cfg.write(cfg.read() + "\n")
+    assert uncached.metadata is metadata
@@ -0,0 +1,63 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, print_function
+
+import pytest
+
+from mork.check import check_paths, parse_requires_txt, read_headers
+from mork.metadata import EnvironmentMetadata
+
+
+@pytest.fixture
+def environment():
+    return EnvironmentMetadata("/venv", version="3.7.0", implementation="CPython").get_marker_environment()
+
+
+def test_read_headers():
+    headers = read_headers("Name: requests\nRequires-Dist: idna\nRequires-Dist: chardet\n\nBody: x\n")
+    assert headers == {"name": ["requests"], "requires-dist": ["idna", "chardet"]}
+
+
+def test_parse_requires_txt():
+    lines = parse_requires_txt("six\n\n[:python_version < '3']\nenum34\n\n[socks]\nPySocks\n")
+    assert lines == [
+        "six", "enum34; (python_version < '3')", 'PySocks; extra == "socks"'
+    ]
+
+
+def test_check_paths(tmpdir, environment, add_dist):
+    lib_dir = tmpdir.mkdir("site-packages")
+    add_dist(lib_dir, "requests", "2.19.1", requires=[
+        "idna<2.8,>=2.5", "chardet<3.1.0,>=3.0.2", "urllib3<1.24,>=1.21.1",
+        'PySocks>=1.5.6; extra == "socks"', 'win-inet-pton; sys_platform == "nt-never"',
+    ])
+    add_dist(lib_dir, "idna", "2.8")
+    add_dist(lib_dir, "urllib3", "1.23")
+    app = add_dist(lib_dir, "app", "1.0", requires=["requests[socks]"])
+    # Only the headers of METADATA declare requirements
+    app.join("METADATA").write("\nRequires-Dist: ignored\n", mode="a")
+    lib_dir.join("legacy-1.0-py3.7.egg-info").ensure(dir=True).join("requires.txt").write(
+        "six\n\n[:python_version < '3']\nenum34\n"
+    )
+    result = check_paths([lib_dir.strpath], environment)
+    assert not result.ok
+    assert result.checked == 5
+    missing = sorted((p.dist, p.requirement.project_name, p.extra) for p in result.missing)
+    assert missing == [
+        ("legacy", "six", None), ("requests", "PySocks", "socks"), ("requests", "chardet", None),
+    ]
+    assert [(p.dist, p.installed_version) for p in result.conflicts] == [("requests", "2.8")]
+    assert str(result.conflicts[0]) == (
+        "requests 2.19.1 has requirement idna<2.8,>=2.5, but you have idna 2.8."
+    )
+    assert result.as_dict()["checked"] == 5
+
+
+def test_virtualenv_check(empty_venv, add_dist):
+    venv = empty_venv
+    assert venv.check().ok
+    add_dist(venv.lib_dirs[0], "app", "1.0", requires=["missing-dependency"])
+    result = venv.check()
+    assert [str(problem) for problem in result.missing] == [
+        "app 1.0 requires missing-dependency, which is not installed."
+    ]
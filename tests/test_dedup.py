@@ -0,0 +1,77 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, print_function
+
+import os
+
+import pytest
+
+from mork.dedup import DedupStore, deduplicate
+from mork.fleet import Fleet
+
+
+FILES = {"six.py": b"# six\n" * 100, "pkg/__init__.py": b"# package\n" * 50}
+
+
+@pytest.fixture
+def lib_dirs(tmpdir, add_dist):
+    lib_dirs = []
+    for name in ("first", "second", "third"):
+        lib_dir = tmpdir.mkdir(name)
+        add_dist(lib_dir, "six", "1.11.0", FILES)
+        lib_dirs.append(lib_dir)
+    # A file which was modified after installation is never shared
+    lib_dirs[2].join("six.py").write_binary(b"# patched\n" * 60)
+    return lib_dirs
+
+
+def inode(path):
+    return os.stat(path.strpath).st_ino
+
+
+def test_deduplicate(lib_dirs, tmpdir):
+    store = DedupStore(tmpdir.join("store").strpath, mode="hardlink")
+    paths = [lib_dir.strpath for lib_dir in lib_dirs]
+    dry_run = deduplicate(paths, store=store, dry_run=True)
+    assert (dry_run.linked, dry_run.reclaimed) == (3, 600 + 2 * 500)
+    assert not tmpdir.join("store").exists()
+
+    report = deduplicate(paths, store=store)
+    assert report.scanned == 6
+    assert (report.linked, report.reclaimed, report.errors) == (3, 600 + 2 * 500, [])
+    first, second, third = lib_dirs
+    assert inode(first.join("six.py")) == inode(second.join("six.py"))
+    assert inode(first.join("pkg", "__init__.py")) == inode(third.join("pkg", "__init__.py"))
+    assert inode(third.join("six.py")) != inode(first.join("six.py"))
+
+    again = deduplicate(paths, store=store)
+    assert (again.linked, again.reclaimed, again.already_linked) == (0, 0, 5)
+
+    # Installers replace files, which leaves the other environments untouched
+    target = second.join("six.py").strpath
+    os.unlink(target)
+    with open(target, "wb") as fh:
+        fh.write(b"# upgraded\n")
+    assert first.join("six.py").read_binary() == FILES["six.py"]
+    second.join("pkg").remove()
+    assert third.join("pkg", "__init__.py").read_binary() == FILES["pkg/__init__.py"]
+
+
+def test_store_prune(lib_dirs, tmpdir):
+    store = DedupStore(tmpdir.join("store").strpath, mode="hardlink")
+    deduplicate([lib_dir.strpath for lib_dir in lib_dirs], store=store)
+    assert store.prune() == 0
+    for lib_dir in lib_dirs:
+        lib_dir.remove()
+    assert store.prune() == 600 + 500
+
+
+def test_fleet_dedup(tmpdir, make_venv, add_dist):
+    prefixes = []
+    for name in ("first", "second"):
+        venv = make_venv(name)
+        add_dist(venv.lib_dirs[0], "six", "1.11.0", FILES)
+        prefixes.append(venv.prefix.as_posix())
+    report = Fleet(prefixes).dedup(store=DedupStore(tmpdir.join("store").strpath))
+    assert report.linked == 2
+    assert report.as_dict()["reclaimed"] == 600 + 500
@@ -0,0 +1,113 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, print_function
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import mork
+import mork.editable
+
+from mork.editable import EditableProject
+
+
+SETUP_CFG = """
+[metadata]
+name = demo-pkg
+version = attr: demo_pkg.__version__
+description = A demo package
+
+[options]
+package_dir =
+    = src
+packages = find:
+install_requires =
+    six>=1.0
+
+[options.extras_require]
+tests = pytest; python_version >= "3"
+
+[options.entry_points]
+console_scripts =
+    demo-cli = demo_pkg.cli:main
+"""
+
+PYPROJECT = """
+[project]
+name = "other-pkg"
+version = "2.0"
+dependencies = ["six"]
+
+[project.scripts]
+other = "other_pkg:main"
+"""
+
+
+@pytest.fixture
+def setup_cfg_project(tmpdir):
+    project = tmpdir.mkdir("demo")
+    project.join("setup.cfg").write(SETUP_CFG)
+    project.join("setup.py").write("from setuptools import setup; setup()\n")
+    package = project.join("src", "demo_pkg").ensure(dir=True)
+    package.join("__init__.py").write("__version__ = '1.2.3'\n")
+    package.join("cli.py").write("def main():\n    print('demo says hi')\n")
+    return project
+
+
+def test_read_setup_cfg(setup_cfg_project):
+    project = EditableProject.from_path(setup_cfg_project.strpath)
+    assert project.name == "demo-pkg"
+    assert project.version == "1.2.3"
+    assert project.source_root == setup_cfg_project.join("src").strpath
+    assert project.requires == ["six>=1.0"]
+    assert project.entry_points == {"console_scripts": {"demo-cli": "demo_pkg.cli:main"}}
+    metadata = project.get_metadata()
+    assert 'Requires-Dist: pytest; (python_version >= "3") and extra == "tests"' in metadata
+    assert "Provides-Extra: tests" in metadata
+
+
+def test_read_pyproject(tmpdir):
+    if mork.editable.tomllib is None:
+        pytest.skip("requires a toml parser")
+    project_dir = tmpdir.mkdir("other")
+    project_dir.join("pyproject.toml").write(PYPROJECT)
+    project = EditableProject.from_path(project_dir.strpath)
+    assert (project.name, project.version) == ("other-pkg", "2.0")
+    assert project.entry_points == {"console_scripts": {"other": "other_pkg:main"}}
+
+
+def test_dynamic_metadata_is_not_read(tmpdir):
+    project_dir = tmpdir.mkdir("dynamic")
+    project_dir.join("setup.py").write("from setuptools import setup; setup(name='x')\n")
+    assert EditableProject.from_path(project_dir.strpath) is None
+
+
+@pytest.mark.parametrize("setup_py", [
+    "from setuptools import setup\nsetup(install_requires=['requests'])\n",
+    "import setuptools\nsetuptools.setup(ext_modules=[])\n",
+    "from setuptools import setup\nsetup(**{'package_dir': {'': 'lib'}})\n",
+    "from setuptools import setup\n",
+])
+def test_setup_py_arguments_are_not_ignored(setup_cfg_project, setup_py):
+    setup_cfg_project.join("setup.py").write(setup_py)
+    assert EditableProject.from_path(setup_cfg_project.strpath) is None
+
+
+@pytest.mark.skipif(sys.version_info < (3, 3), reason="requires the venv module")
+def test_install_editable(empty_venv, setup_cfg_project):
+    venv = empty_venv
+    assert venv.install_editable(setup_cfg_project.strpath) == 0
+    purelib = venv.base_paths["purelib"]
+    dist_info = os.path.join(purelib, "demo_pkg-1.2.3.dist-info")
+    assert sorted(os.listdir(dist_info)) == [
+        "INSTALLER", "METADATA", "RECORD", "direct_url.json", "entry_points.txt"
+    ]
+    record = open(os.path.join(dist_info, "RECORD")).read()
+    assert "__editable__.demo_pkg.pth" in record
+    script = os.path.join(venv.scripts_dir, "demo-cli")
+    assert os.path.exists(script)
+    out = subprocess.check_output([script])
+    assert out.strip() == b"demo says hi"
@@ -0,0 +1,56 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, print_function
+
+import pytest
+
+from mork.entrypoints import EntryPointIndex, normalize_script_name
+
+
+@pytest.fixture
+def prefix(tmpdir, add_dist):
+    lib_dir = tmpdir.mkdir("site-packages")
+    tmpdir.mkdir("bin")
+    add_dist(lib_dir, "pytest", "3.8.0", entry_points=(
+        "[console_scripts]\npy.test = pytest:main\npytest = pytest:main\n"
+    ))
+    add_dist(lib_dir, "pytest_xdist", "1.23.0", entry_points=(
+        "[pytest11]\nxdist.plugin = xdist.plugin\nxdist.looponfail = xdist.looponfail\n"
+    ))
+    add_dist(lib_dir, "legacy", "1.0", records=["../bin/legacy-tool,,", "legacy.py,,"])
+    return tmpdir
+
+
+def test_normalize_script_name():
+    assert normalize_script_name("/venv/Scripts/pip3.exe") == "pip3"
+    assert normalize_script_name("tool-script.py") == "tool"
+    assert normalize_script_name("django-admin") == "django-admin"
+
+
+def test_entry_point_index(prefix):
+    index = EntryPointIndex.from_paths(
+        [prefix.join("site-packages").strpath], scripts_dir=prefix.join("bin").strpath
+    )
+    plugins = index.get_group("pytest11")
+    assert sorted(plugins) == ["xdist.looponfail", "xdist.plugin"]
+    assert plugins["xdist.plugin"].dist == "pytest-xdist"
+    entry_point = index.get("console_scripts", "pytest")
+    assert (entry_point.module, entry_point.attr, entry_point.version) == ("pytest", "main", "3.8.0")
+    assert index.get("console_scripts", "missing") is None
+    assert index.get_script_provider("py.test") == "pytest"
+    assert index.get_script_provider(prefix.join("bin", "legacy-tool").strpath) == "legacy"
+    assert index.get_script_provider("unknown") is None
+    assert len(index.get_distribution_entry_points("pytest_xdist")) == 2
+    assert index.get_distribution_entry_points("legacy") == []
+
+
+def test_virtualenv_entry_point_index(empty_venv, add_dist):
+    venv = empty_venv
+    index = venv.entry_point_index
+    assert venv.entry_point_index is index
+    assert index.get_group("console_scripts") == {}
+    add_dist(
+        venv.lib_dirs[0], "tool", "1.0", entry_points="[console_scripts]\ntool = tool:main\n"
+    )
+    assert venv.entry_point_index is not index
+    assert venv.entry_point_index.get_script_provider("tool") == "tool"
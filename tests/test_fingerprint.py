@@ -0,0 +1,61 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, print_function
+
+import os
+import time
+
+import mork.virtualenv
+from mork.fingerprint import get_fingerprint
+from mork.fleet import execute_operation
+
+
+def test_fingerprint_changes_with_installed_state(empty_venv, add_dist):
+    venv = empty_venv
+    lib_dir = venv.lib_dirs[0]
+    empty = venv.fingerprint()
+    assert venv.fingerprint() == empty
+    assert mork.virtualenv.VirtualEnv(venv.prefix.as_posix()).fingerprint() == empty
+    dist_info = add_dist(lib_dir, "six", "1.11.0")
+    installed = venv.fingerprint()
+    assert installed != empty
+    os.utime(dist_info, (0, 0))
+    touched = venv.fingerprint()
+    assert touched != installed
+    with open(os.path.join(lib_dir, "project.pth"), "w") as fh:
+        fh.write("/src/project\n")
+    assert venv.fingerprint() != touched
+    # Files which aren't distribution metadata don't matter
+    with open(os.path.join(lib_dir, "notes.txt"), "w") as fh:
+        fh.write("notes\n")
+    os.unlink(os.path.join(lib_dir, "project.pth"))
+    assert venv.fingerprint() == touched
+
+
+def test_fingerprint_covers_config_and_interpreter(empty_venv, tmpdir):
+    venv = empty_venv
+    prefix = venv.prefix.as_posix()
+    digest = get_fingerprint(prefix, venv.lib_dirs, python=venv.python)
+    assert get_fingerprint(prefix, venv.lib_dirs) != digest
+    assert get_fingerprint(prefix, venv.lib_dirs, python=tmpdir.join("python").strpath) != digest
+    with open(os.path.join(prefix, "pyvenv.cfg"), "a") as fh:
+        fh.write("prompt = changed\n")
+    assert get_fingerprint(prefix, venv.lib_dirs, python=venv.python) != digest
+
+
+def test_fingerprint_is_fast(empty_venv, add_dist):
+    venv = empty_venv
+    lib_dir = venv.lib_dirs[0]
+    for index in range(2000):
+        add_dist(lib_dir, "package{0}".format(index), "1.0")
+    start = time.time()
+    digest = venv.fingerprint()
+    assert time.time() - start < 1
+    assert digest == venv.fingerprint()
+
+
+def test_fingerprint_operation(empty_venv):
+    venv = empty_venv
+    result = execute_operation(venv.prefix.as_posix(), "fingerprint")
+    assert result.ok
+    assert result.result == {"fingerprint": venv.fingerprint()}
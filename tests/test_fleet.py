@@ -0,0 +1,60 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, print_function
+
+import io
+import json
+import os
+import sys
+
+import pytest
+
+from mork.fleet import Fleet
+
+
+@pytest.fixture
+def workon_home(tmpdir, make_venv):
+    home = tmpdir.mkdir("virtualenvs")
+    for name in ("first", "second"):
+        make_venv(os.path.join("virtualenvs", name))
+    home.mkdir("not-a-venv")
+    return home
+
+
+def test_from_workon_home(workon_home):
+    fleet = Fleet.from_workon_home(workon_home.strpath)
+    assert [p.rsplit("/", 1)[-1] for p in fleet] == ["first", "second"]
+
+
+def test_fleet_verify(workon_home):
+    fleet = Fleet.from_workon_home(workon_home.strpath, processes=2)
+    report = fleet.verify()
+    results = report.wait()
+    assert sorted(result.prefix for result in results) == sorted(fleet.prefixes)
+    assert all(result.ok for result in results), [r.error for r in results]
+    assert not report.failed
+
+
+def test_fleet_installed_json_lines(workon_home):
+    fleet = Fleet.from_workon_home(workon_home.strpath, processes=2)
+    stream = io.StringIO()
+    fleet.installed().write_json_lines(stream)
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert len(lines) == 2
+    assert all(line["operation"] == "installed" and line["ok"] for line in lines)
+
+
+def test_fleet_close_finishes_operations(workon_home, tmpdir):
+    markers = tmpdir.mkdir("markers")
+    script = "import os, time; time.sleep(0.5); open(os.path.join({0!r}, str(os.getpid())), 'w')"
+    fleet = Fleet.from_workon_home(workon_home.strpath, processes=1)
+    with fleet.run("run", [sys.executable, "-c", script.format(markers.strpath)]) as report:
+        for result in report:
+            assert result.ok, result.error
+            break
+    assert len(markers.listdir()) == 2
+
+
+def test_unknown_operation():
+    with pytest.raises(ValueError):
+        Fleet([]).run("explode")
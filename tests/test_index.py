@@ -0,0 +1,176 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, print_function
+
+import os
+import time
+
+import pytest
+import vistir
+
+from mork.index import IndexCache, SimpleIndex, parse_links, split_filename
+
+
+@pytest.fixture
+def index_dir(tmpdir):
+    index_dir = tmpdir.mkdir("simple")
+    requests_dir = index_dir.mkdir("requests")
+    for filename in (
+        "requests-2.19.1-py2.py3-none-any.whl", "requests-2.20.0.tar.gz",
+        "requests-2.20.0-py2.py3-none-any.whl", "requests-2.21.0rc1.tar.gz",
+    ):
+        requests_dir.join(filename).write("")
+    index_dir.mkdir("zope-interface").join("index.html").write(
+        '<a href="../../files/zope.interface-4.5.0.tar.gz#sha256=abc">zope.interface</a>\n'
+        '<a href="zope.interface-5.0.tar.gz" data-yanked="">yanked</a>\n'
+        '<a href="zope.interface-4.6.0.tar.gz" data-requires-python="&gt;=3.4">4.6</a>\n'
+    )
+    return index_dir
+
+
+@pytest.fixture
+def sources(index_dir):
+    return [{"name": "local", "url": vistir.path.path_to_url(index_dir.strpath), "verify_ssl": True}]
+
+
+def test_split_filename():
+    assert split_filename("Django-2.1-py3-none-any.whl", "django") == "2.1"
+    assert split_filename("zope.interface-4.5.0.tar.gz", "zope-interface") == "4.5.0"
+    assert split_filename("python-dateutil-2.7.3.zip", "python_dateutil") == "2.7.3"
+    assert split_filename("other-1.0.tar.gz", "django") is None
+    assert split_filename("README.txt", "django") is None
+
+
+def test_parse_links():
+    candidates = parse_links("zope.interface", "https://example.com/simple/zope-interface/", (
+        '<a href="zope.interface-4.6.0.tar.gz" data-requires-python="&gt;=3.4">x</a>'
+        '<a href="/">home</a>'
+    ))
+    assert len(candidates) == 1
+    assert candidates[0].url == "https://example.com/simple/zope-interface/zope.interface-4.6.0.tar.gz"
+    assert candidates[0].requires_python == ">=3.4"
+
+
+def test_find_best_candidate(sources):
+    finder = SimpleIndex(sources=sources)
+    best = finder.find_best_candidate("requests")
+    assert (best.version, best.is_wheel) == ("2.20.0", True)
+    assert finder.find_best_candidate("requests", prereleases=True).version == "2.21.0rc1"
+    assert finder.find_best_candidate("zope.interface").version == "4.6.0"
+    assert finder.find_best_candidate("missing") is None
+
+
+def test_find_best_candidate_for_environment(index_dir, sources):
+    index_dir.join("requests", "requests-2.22.0-cp99-cp99-win_amd64.whl").write("")
+    index_dir.mkdir("six").join("index.html").write(
+        '<a href="six-1.12.0.tar.gz" data-requires-python="&gt;=3.9">1.12</a>\n'
+        '<a href="six-1.11.5.tar.gz" data-requires-python="3.6">1.11.5</a>\n'
+        '<a href="six-1.11.0.tar.gz" data-requires-python="&gt;=2.7, !=3.0.*">1.11</a>\n'
+    )
+    finder = SimpleIndex(sources=sources)
+    assert finder.find_best_candidate("requests").version == "2.22.0"
+    assert finder.find_best_candidate("six").version == "1.12.0"
+    finder = SimpleIndex(
+        sources=sources, python_version="3.7.1",
+        supported_tags=["py3-none-any", "cp37-cp37m-manylinux1_x86_64"]
+    )
+    best = finder.find_best_candidate("requests")
+    assert (best.version, best.is_wheel) == ("2.20.0", True)
+    assert finder.find_best_candidate("six").version == "1.11.0"
+    assert finder.find_best_candidate("six", python_version="3.10.0").version == "1.12.0"
+    assert finder.find_best_candidate("requests", supported_tags=["cp99-cp99-win_amd64"]).is_wheel
+    assert not finder.find_best_candidate("requests", supported_tags=[]).is_wheel
+
+
+def test_index_cache(sources, index_dir, tmpdir):
+    cache = IndexCache(tmpdir.join("cache").strpath, ttl=0)
+    finder = SimpleIndex(sources=sources, cache=cache)
+    assert len(finder.find_all_candidates("requests")) == 4
+    entry = cache.get(sources[0]["url"], "requests")
+    assert entry["etag"] and len(entry["candidates"]) == 4
+
+    # Unchanged pages are revalidated without being parsed again
+    fetched = []
+    original_fetch = finder.fetch
+
+    def fetch(page_url, verify=True, entry=None):
+        result = original_fetch(page_url, verify=verify, entry=entry)
+        fetched.append(result[0])
+        return result
+
+    finder.fetch = fetch
+    finder.find_all_candidates("requests")
+    assert fetched == [304]
+    index_dir.join("requests", "requests-2.22.0-py2.py3-none-any.whl").write("")
+    os.utime(index_dir.join("requests").strpath, (time.time() + 5, time.time() + 5))
+    assert finder.find_best_candidate("requests").version == "2.22.0"
+    assert fetched == [304, 200]
+
+    # Fresh entries are used without contacting the index at all
+    cache.ttl = 3600
+    finder.find_all_candidates("requests")
+    assert fetched == [304, 200]
+
+    # Offline mode never fetches, and only knows about cached projects
+    offline = SimpleIndex(sources=sources, cache=IndexCache(cache.root.as_posix(), ttl=0), offline=True)
+    offline.fetch = None
+    assert offline.find_best_candidate("requests").version == "2.22.0"
+    assert offline.find_best_candidate("zope.interface") is None
+
+
+def test_get_outdated_packages(sources, tmpdir, make_venv):
+    venv = make_venv(sources=sources)
+    dist_info = os.path.join(venv.lib_dirs[0], "requests-2.19.1.dist-info")
+    os.makedirs(dist_info)
+    with open(os.path.join(dist_info, "METADATA"), "w") as fh:
+        fh.write("Metadata-Version: 2.1\nName: requests\nVersion: 2.19.1\n")
+    # Releases the environment can't install aren't reported as upgrades
+    tmpdir.join("simple", "requests", "requests-2.23.0-cp27-cp27mu-manylinux1_x86_64.whl").write("")
+    cache = IndexCache(tmpdir.join("cache").strpath)
+    outdated = venv.get_outdated_packages(cache=cache)
+    assert [(d.project_name, str(d.latest_version), d.latest_filetype) for d in outdated] == [
+        ("requests", "2.20.0", "wheel")
+    ]
+    tmpdir.join("simple").remove()
+    outdated = venv.get_outdated_packages(cache=cache, offline=True)
+    assert [str(d.latest_version) for d in outdated] == ["2.20.0"]
+
+
+def test_finder_reuses_pages(sources):
+    finder = SimpleIndex(sources=sources)
+    fetched = []
+    original_fetch = finder.fetch
+
+    def fetch(page_url, verify=True, entry=None):
+        fetched.append(page_url)
+        return original_fetch(page_url, verify=verify, entry=entry)
+
+    finder.fetch = fetch
+    finder.find_best_candidate("requests")
+    finder.find_best_candidate("Requests")
+    assert len(fetched) == 1
+    finder.ttl = 0
+    finder.find_best_candidate("requests")
+    assert len(fetched) == 2
+
+
+def test_shared_session(sources, make_venv):
+    venv = make_venv(sources=sources)
+    with venv.get_finder() as finder:
+        finder.find_best_candidate("requests")
+    with venv.get_finder() as again:
+        assert again is finder
+        assert list(again.pages) == [(sources[0]["url"], "requests")]
+    with venv.get_finder(pre=True) as pre:
+        assert pre is not finder
+        assert pre.session is finder.session is venv.session
+    session = venv.session
+    finder.close()
+    assert venv.session is session
+    with venv.get_finder() as again:
+        assert again is finder
+        assert again.session is session
+    venv.close()
+    with venv.get_finder() as finder:
+        assert not finder.pages
+        assert finder.session is not session
@@ -0,0 +1,79 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, print_function
+
+import os
+import subprocess
+
+import pytest
+
+import mork.virtualenv
+from mork.layers import LAYERS_PTH, read_layers
+
+
+@pytest.fixture
+def stack(make_venv, add_dist):
+    base = make_venv("base")
+    add_dist(base.lib_dirs[0], "basepkg", "1.0", {"basepkg.py": "VALUE = 'base'\n"})
+    add_dist(base.lib_dirs[0], "shadowed", "1.0", {"shadowed.py": "VALUE = 'base'\n"})
+    top = make_venv("top", bases=[base])
+    add_dist(top.lib_dirs[0], "shadowed", "2.0", {"shadowed.py": "VALUE = 'top'\n"},
+             requires=["basepkg"])
+    return base, top
+
+
+def run_python(venv, source):
+    return subprocess.check_output([venv.python, "-c", source]).decode("utf-8").strip()
+
+
+def test_layered_distributions(stack):
+    base, top = stack
+    assert read_layers(top.prefix.as_posix()) == [base.prefix.as_posix()]
+    assert [layer.prefix for layer in top.layers] == [base.prefix]
+    assert top.layered_lib_dirs == top.lib_dirs + base.lib_dirs
+    versions = dict((d.project_name, d.version) for d in top.get_distributions())
+    assert versions == {"basepkg": "1.0", "shadowed": "2.0"}
+    assert top.is_installed("basepkg")
+    assert not base.layers
+    working_set = top.get_working_set()
+    shadowed = working_set.find(mork.virtualenv.pkg_resources.Requirement.parse("shadowed"))
+    assert shadowed.version == "2.0"
+    deps = top.resolve_dist(shadowed, working_set)
+    assert sorted(d.project_name for d in deps) == ["basepkg", "shadowed"]
+    assert top.check().ok
+
+
+def test_layered_imports(stack):
+    base, top = stack
+    assert run_python(top, "import basepkg, shadowed; print(basepkg.VALUE, shadowed.VALUE)") == (
+        "base top"
+    )
+
+
+def test_nested_layers(stack, make_venv):
+    base, top = stack
+    project = make_venv("project", bases=[top])
+    assert project.layered_lib_dirs == project.lib_dirs + top.lib_dirs + base.lib_dirs
+    assert run_python(project, "import basepkg; print(basepkg.VALUE)") == "base"
+    with pytest.raises(ValueError):
+        base.set_layers([project])
+
+
+def test_layered_uninstall_only_touches_top(stack):
+    base, top = stack
+    with top.uninstall("basepkg") as uninstaller:
+        assert uninstaller is None
+    assert base.is_installed("basepkg")
+    with top.uninstall("shadowed") as uninstaller:
+        assert uninstaller
+    versions = dict((d.project_name, d.version) for d in top.get_distributions())
+    assert versions == {"basepkg": "1.0", "shadowed": "1.0"}
+    assert os.path.exists(os.path.join(base.lib_dirs[0], "shadowed.py"))
+
+
+def test_remove_layers(stack):
+    base, top = stack
+    top.set_layers([])
+    assert not top.layers
+    assert not os.path.exists(os.path.join(top.lib_dirs[0], LAYERS_PTH))
+    assert not top.is_installed("basepkg")
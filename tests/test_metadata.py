@@ -0,0 +1,92 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, print_function
+
+import os
+import sys
+
+import pytest
+
+from mork.metadata import EnvironmentMetadata, read_pyvenv_cfg
+
+
+def make_layout(root, cfg=None, lib="python3.7", include=None):
+    if cfg is not None:
+        root.join("pyvenv.cfg").write(cfg)
+    root.mkdir("bin")
+    root.join("lib", lib, "site-packages").ensure(dir=True)
+    if include:
+        root.join("include", include).ensure(dir=True)
+    return root
+
+
+def test_read_pyvenv_cfg(tmpdir):
+    tmpdir.join("pyvenv.cfg").write(
+        "home = /usr/bin\ninclude-system-site-packages = false\nVersion = 3.7.1\n"
+    )
+    assert read_pyvenv_cfg(tmpdir.strpath) == {
+        "home": "/usr/bin", "include-system-site-packages": "false", "version": "3.7.1"
+    }
+    assert read_pyvenv_cfg(tmpdir.join("missing").strpath) == {}
+
+
+@pytest.mark.skipif(os.name == "nt", reason="posix layout")
+def test_static_metadata_from_pyvenv_cfg(tmpdir):
+    root = make_layout(
+        tmpdir, cfg="home = /opt/python/bin\nversion_info = 3.7.1.final.0\n"
+        "implementation = CPython\n"
+    )
+    metadata = EnvironmentMetadata.from_prefix(root.strpath)
+    assert metadata.complete
+    assert metadata.version == "3.7.1"
+    assert metadata.py_version_short == "3.7"
+    assert metadata.abiflags == "m"
+    assert metadata.base_prefix == "/opt/python"
+    assert metadata.purelib == root.join("lib", "python3.7", "site-packages").strpath
+    assert metadata.scripts == root.join("bin").strpath
+
+
+@pytest.mark.skipif(os.name == "nt", reason="posix layout")
+@pytest.mark.parametrize("cfg", [None, "home = /opt/python/bin\nversion = 3.13.1\n"])
+def test_static_metadata_free_threaded(tmpdir, cfg):
+    root = make_layout(tmpdir, cfg=cfg, lib="python3.13t")
+    metadata = EnvironmentMetadata.from_prefix(root.strpath)
+    assert metadata.py_version_short == "3.13"
+    assert metadata.abiflags == "t"
+    assert metadata.purelib == root.join("lib", "python3.13t", "site-packages").strpath
+
+
+@pytest.mark.skipif(os.name == "nt", reason="posix layout")
+def test_static_metadata_from_legacy_layout(tmpdir):
+    root = make_layout(tmpdir, lib="pypy3.6")
+    root.join("lib", "pypy3.6", "orig-prefix.txt").write("/opt/pypy")
+    metadata = EnvironmentMetadata.from_prefix(root.strpath)
+    assert metadata.implementation == "PyPy"
+    assert metadata.py_version_short == "3.6"
+    assert metadata.base_prefix == "/opt/pypy"
+    assert metadata.complete
+
+
+@pytest.mark.skipif(os.name == "nt", reason="posix layout")
+def test_ambiguous_layout_is_incomplete(tmpdir):
+    root = make_layout(tmpdir)
+    root.join("lib", "python3.8", "site-packages").ensure(dir=True)
+    metadata = EnvironmentMetadata.from_prefix(root.strpath)
+    assert not metadata.complete
+    assert metadata.purelib is None
+    # Without an interpreter to probe, loading falls back to the static result
+    assert not EnvironmentMetadata.load(root.strpath).probed
+
+
+@pytest.mark.skipif(sys.version_info < (3, 3), reason="requires the venv module")
+def test_static_metadata_matches_probe(empty_venv):
+    prefix = empty_venv.prefix.as_posix()
+    static = EnvironmentMetadata.from_prefix(prefix)
+    assert static.complete
+    python = os.path.join(static.scripts, "python.exe" if os.name == "nt" else "python")
+    probed = EnvironmentMetadata.from_python(prefix, python)
+    for attr in ("py_version_short", "implementation", "abiflags"):
+        assert getattr(static, attr) == getattr(probed, attr), attr
+    for attr in ("purelib", "platlib", "scripts", "base_prefix"):
+        assert os.path.normcase(os.path.realpath(getattr(static, attr))) == \
+            os.path.normcase(os.path.realpath(getattr(probed, attr))), attr
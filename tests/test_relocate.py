@@ -0,0 +1,113 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, print_function
+
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import mork.virtualenv
+from mork.dedup import get_record_digest, hash_file
+from mork.relocate import Relocator, detect_prefix
+from mork.utils import iter_metadata_dirs
+
+
+def populate(venv):
+    prefix = venv.prefix.as_posix()
+    lib_dir = venv.lib_dirs[0]
+    script = os.path.join(venv.scripts_dir, "tool")
+    with open(script, "w") as fh:
+        fh.write("#!{0}/bin/python\nimport tool\n".format(prefix))
+    os.chmod(script, 0o755)
+    os.makedirs(os.path.join(prefix, "src", "tool"))
+    with open(os.path.join(prefix, "src", "tool", "tool.py"), "w") as fh:
+        fh.write("VALUE = 'tool'\n")
+    with open(os.path.join(lib_dir, "tool.pth"), "w") as fh:
+        fh.write("{0}/src/tool\n".format(prefix))
+    with open(os.path.join(lib_dir, "similar.txt"), "w") as fh:
+        fh.write("{0}-other/bin\n".format(prefix))
+    with open(os.path.join(lib_dir, "binary.so"), "wb") as fh:
+        fh.write(b"\0" + prefix.encode("utf-8"))
+    os.symlink(os.path.join(prefix, "src"), os.path.join(lib_dir, "src-link"))
+    dist_info = os.path.join(lib_dir, "tool-1.0.dist-info")
+    os.makedirs(dist_info)
+    with open(os.path.join(dist_info, "METADATA"), "w") as fh:
+        fh.write("Name: tool\nVersion: 1.0\n")
+    with open(os.path.join(dist_info, "RECORD"), "w") as fh:
+        fh.write("{0},{1},{2}\n".format(
+            os.path.relpath(script, lib_dir), get_record_digest(hash_file(script)),
+            os.path.getsize(script)
+        ))
+        fh.write("tool.pth,,\ntool-1.0.dist-info/METADATA,,\ntool-1.0.dist-info/RECORD,,\n")
+
+
+@pytest.fixture
+def venv(make_venv):
+    venv = make_venv("old")
+    populate(venv)
+    return venv
+
+
+def read(path):
+    with open(path, "rb") as fh:
+        return fh.read().decode("utf-8")
+
+
+def test_relocate(venv, tmpdir):
+    old_prefix = venv.prefix.as_posix()
+    assert venv.lib_dirs[0].startswith(old_prefix)
+    new_prefix = tmpdir.join("new").strpath
+    report = venv.relocate(new_prefix)
+    assert report.ok
+    assert not os.path.exists(old_prefix)
+    assert venv.prefix.as_posix() == new_prefix
+    lib_dir = venv.lib_dirs[0]
+    assert lib_dir.startswith(new_prefix)
+    assert venv.scripts_dir.startswith(new_prefix)
+    script = os.path.join(venv.scripts_dir, "tool")
+    assert read(script).startswith("#!{0}/bin/python\n".format(new_prefix))
+    assert os.access(script, os.X_OK)
+    assert read(os.path.join(lib_dir, "tool.pth")) == "{0}/src/tool\n".format(new_prefix)
+    assert read(os.path.join(lib_dir, "similar.txt")) == "{0}-other/bin\n".format(old_prefix)
+    assert old_prefix in read(os.path.join(lib_dir, "binary.so"))
+    assert os.readlink(os.path.join(lib_dir, "src-link")) == os.path.join(new_prefix, "src")
+    assert os.path.join(lib_dir, "src-link") in report.relinked
+    assert script in report.rewritten
+    metadata_dir, = [d for d in iter_metadata_dirs(venv.lib_dirs) if d.key == "tool"]
+    assert metadata_dir.record_path in report.records
+    (path, digest, size), = [f for f in metadata_dir.get_installed_files() if f[1]]
+    assert (path, digest, size) == (
+        script, get_record_digest(hash_file(script)), os.path.getsize(script)
+    )
+    output = subprocess.check_output([
+        venv.python, "-c", "import sys, tool; print(sys.prefix); print(tool.__file__)"
+    ]).decode("utf-8").split()
+    assert output == [new_prefix, os.path.join(new_prefix, "src", "tool", "tool.py")]
+
+
+def test_relocate_moved_environment(venv, tmpdir):
+    old_prefix = venv.prefix.as_posix()
+    new_prefix = tmpdir.join("restored").strpath
+    shutil.move(old_prefix, new_prefix)
+    moved = mork.virtualenv.VirtualEnv(new_prefix)
+    assert detect_prefix(moved.scripts_dir) == old_prefix
+    report = moved.relocate(new_prefix)
+    assert report.old_prefix == old_prefix
+    assert read(os.path.join(moved.lib_dirs[0], "tool.pth")) == "{0}/src/tool\n".format(
+        new_prefix
+    )
+    assert not moved.relocate(new_prefix).rewritten
+
+
+def test_relocate_refuses_existing_target(venv, tmpdir):
+    with pytest.raises(ValueError):
+        venv.relocate(tmpdir.mkdir("taken").strpath)
+
+
+def test_relocator_boundaries():
+    relocator = Relocator("/envs/a", "/srv/envs/project")
+    assert relocator.pattern.sub(relocator._replace, b"'/envs/a' /envs/a/bin /envs/ab") == (
+        b"'/srv/envs/project' /srv/envs/project/bin /envs/ab"
+    )
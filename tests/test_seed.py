@@ -0,0 +1,69 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, print_function
+
+import os
+import subprocess
+
+import pytest
+
+import mork.virtualenv
+from mork.seed import SeedStore, find_seed_wheels
+
+
+DEMO_FILES = {"demo/__init__.py": "def main():\n    print('demo')\n"}
+
+DEMO_ENTRY_POINTS = "[console_scripts]\ndemo = demo:main\ndemo-tool = demo:main\n"
+
+
+def test_find_seed_wheels(tmpdir, make_wheel):
+    make_wheel(tmpdir, "demo", "1.0")
+    newest = make_wheel(tmpdir, "demo", "1.10")
+    tmpdir.join("demo-2.0-cp37-cp37m-linux_x86_64.whl").write("")
+    assert find_seed_wheels([tmpdir.strpath], packages=("demo",)) == {"demo": newest.strpath}
+    assert find_seed_wheels([tmpdir.strpath], packages=("other",)) == {}
+
+
+def test_create(tmpdir, monkeypatch, make_wheel):
+    wheel_dir = tmpdir.mkdir("wheels")
+    make_wheel(wheel_dir, "demo", "1.0", files=DEMO_FILES, entry_points=DEMO_ENTRY_POINTS)
+    store = SeedStore(tmpdir.join("store").strpath)
+    venvs = []
+    for name in ("first", "second"):
+        venvs.append(mork.virtualenv.VirtualEnv.create(
+            tmpdir.join(name).strpath, seed_packages=("demo",), wheel_dirs=[wheel_dir.strpath],
+            seed_store=store
+        ))
+    first, second = venvs
+    assert os.path.islink(first.python) or os.name == "nt"
+    module_paths = [os.path.join(venv.metadata.purelib, "demo", "__init__.py") for venv in venvs]
+    assert os.stat(module_paths[0]).st_ino == os.stat(module_paths[1]).st_ino
+    record = os.path.join(first.metadata.purelib, "demo-1.0.dist-info", "RECORD")
+    assert os.stat(record).st_ino != os.stat(record.replace("first", "second")).st_ino
+    with open(record) as fh:
+        recorded = [line.split(",")[0] for line in fh.read().splitlines()]
+    script = os.path.join(first.scripts_dir, "demo-tool")
+    assert os.path.relpath(script, first.metadata.purelib).replace(os.sep, "/") in recorded
+    assert subprocess.check_output([script]).strip() == b"demo"
+
+    # The metadata of the new environment is known without running its interpreter
+    def fail(*args, **kwargs):
+        raise AssertionError("unexpected subprocess")
+
+    monkeypatch.setattr(subprocess, "Popen", fail)
+    assert first.metadata.complete and not first.metadata.probed
+    assert first.python_version == first.metadata.py_version_short
+    monkeypatch.undo()
+    assert first.sys_path[-1] == first.metadata.purelib
+    assert first.check().ok
+
+    with pytest.raises(ValueError):
+        mork.virtualenv.VirtualEnv.create(
+            tmpdir.join("third").strpath, seed_packages=("missing",), seed_store=store
+        )
+
+
+def test_create_sys_path(empty_venv):
+    venv = empty_venv
+    probed = mork.virtualenv.VirtualEnv.get_sys_path(venv.python)
+    assert [p for p in probed if p] == [p for p in venv.sys_path if p]
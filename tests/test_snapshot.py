@@ -0,0 +1,62 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, print_function
+
+import pytest
+
+from mork.snapshot import Snapshot
+from mork.utils import iter_metadata_dirs
+
+
+@pytest.fixture
+def lib_dir(tmpdir, add_dist):
+    lib_dir = tmpdir.mkdir("site-packages")
+    add_dist(lib_dir, "requests", "2.19.1", files=["requests/__init__.py"])
+    add_dist(lib_dir, "Django", "2.1", files=["django/__init__.py"],
+             entry_points="[console_scripts]\ndjango-admin = x:y\n")
+    lib_dir.join("pytz-2018.5-py3.7.egg-info").ensure(dir=True).join(
+        "installed-files.txt").write("../pytz/__init__.py\n")
+    return lib_dir
+
+
+def test_iter_metadata_dirs(lib_dir):
+    found = sorted((d.key, d.version, d.kind) for d in iter_metadata_dirs([lib_dir.strpath]))
+    assert found == [
+        ("django", "2.1", "dist-info"),
+        ("pytz", "2018.5", "egg-info"),
+        ("requests", "2.19.1", "dist-info"),
+    ]
+
+
+def test_snapshot_roundtrip(lib_dir, tmpdir):
+    snapshot = Snapshot.from_paths([lib_dir.strpath], prefix="/venv")
+    assert len(snapshot) == 3
+    django = snapshot.distributions["django"]
+    assert django.files == 4
+    assert django.entry_points == {"console_scripts": ["django-admin"]}
+    target = tmpdir.join("snapshot.json.gz").strpath
+    snapshot.write(target)
+    loaded = Snapshot.read(target)
+    assert loaded.prefix == "/venv"
+    assert not snapshot.diff(loaded)
+
+
+def test_snapshot_diff(lib_dir, add_dist):
+    before = Snapshot.from_paths([lib_dir.strpath])
+    lib_dir.join("requests-2.19.1.dist-info").remove()
+    add_dist(lib_dir, "requests", "2.20.0")
+    add_dist(lib_dir, "idna", "2.7")
+    lib_dir.join("Django-2.1.dist-info", "RECORD").write("changed\n")
+    lib_dir.join("pytz-2018.5-py3.7.egg-info").remove()
+    diff = before.diff(Snapshot.from_paths([lib_dir.strpath]))
+    assert diff.added == {"idna": "2.7"}
+    assert diff.removed == {"pytz": "2018.5"}
+    assert diff.upgraded == {"requests": ("2.19.1", "2.20.0")}
+    assert diff.modified == {"django": "2.1"}
+
+
+def test_snapshot_rejects_unknown_version(lib_dir):
+    data = Snapshot.from_paths([lib_dir.strpath]).as_dict()
+    data["version"] = 99
+    with pytest.raises(ValueError):
+        Snapshot.from_dict(data)
@@ -0,0 +1,67 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, print_function
+
+import sys
+
+import pytest
+
+from mork.startup import PHASE_MARKER, STDLIB, UNKNOWN, StartupReport, parse_importtime
+
+
+IMPORTTIME = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:       300 |        420 | io
+{marker}
+import time:        50 |         50 |     child
+import time:      1000 |       1050 |   parent
+""".format(marker=PHASE_MARKER)
+
+
+def test_parse_importtime():
+    site_imports, module_imports = parse_importtime(IMPORTTIME)
+    assert [(t.name, t.self_us, t.cumulative_us, t.depth) for t in site_imports] == [
+        ("_io", 120, 120, 1), ("io", 300, 420, 0)
+    ]
+    assert [(t.name, t.depth) for t in module_imports] == [("child", 2), ("parent", 1)]
+
+
+def test_check_budget():
+    report = StartupReport(total_us=50000, site_us=2000)
+    assert report.check_budget(total_us=60000, site_us=5000) == []
+    assert report.check_budget(total_us=40000, site_us=1000) == [
+        "Startup took 50000us, over the budget of 40000us",
+        "site took 2000us, over the budget of 1000us",
+    ]
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="-X importtime requires python 3.7")
+def test_profile_startup(tmpvenv, add_dist):
+    lib_dir = tmpvenv.paths["purelib"]
+    add_dist(lib_dir, "slowpth", "1.0", {
+        "slowpth.pth": b"import slowpth_hook; slowpth_hook.run()\n",
+        "slowpth_hook.py": b"import time\ndef run():\n    time.sleep(0.05)\n",
+    })
+    add_dist(lib_dir, "ns_one", "1.0", {"nspkg/one/__init__.py": b""})
+    add_dist(lib_dir, "ns_two", "1.0", {"nspkg/two/__init__.py": b""})
+    add_dist(lib_dir, "heavy", "1.0", {"heavy.py": b"import json\nVALUE = 1\n"})
+
+    report = tmpvenv.profile_startup(["heavy", "nspkg.one", "nspkg.two"])
+    slowest = report.pth_files[0]
+    assert slowest["path"].endswith("slowpth.pth")
+    assert slowest["dist"] == "slowpth"
+    assert slowest["imports"] == ["slowpth_hook"]
+    dists = dict((t.name, t.dist) for t in report.imports)
+    assert dists["slowpth_hook"] == "slowpth"
+    assert dists["heavy"] == "heavy"
+    assert dists["json"] == STDLIB
+    assert dists["nspkg.one"] == "ns-one"
+    assert dists["nspkg"] == UNKNOWN
+    assert report.namespace_packages["nspkg"] == ["ns-one", "ns-two"]
+    costs = dict(report.get_distribution_costs())
+    assert set(["slowpth", "heavy", "ns-one", "ns-two", STDLIB]) <= set(costs)
+    assert report.total_us >= report.site_us > 0
+    violations = report.check_budget(per_distribution_us=0)
+    assert any(v.startswith("heavy took") for v in violations)
+    assert not any(v.startswith(STDLIB) for v in violations)
+    assert report.as_dict()["pth_files"][0]["dist"] == "slowpth"
@@ -0,0 +1,47 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, print_function
+
+import sys
+
+from mork.streaming import stream_command
+
+
+def test_stream_lines():
+    cmd = [sys.executable, "-c", "for i in range(3): print(i)"]
+    c = stream_command(cmd)
+    assert [line.strip() for line in c] == ["0", "1", "2"]
+    assert c.returncode == 0
+
+
+def test_stream_chunks_and_returncode():
+    cmd = [sys.executable, "-c", "import sys; sys.stdout.write('x' * 100); sys.exit(3)"]
+    c = stream_command(cmd, chunk_size=10)
+    chunks = list(c)
+    assert all(len(chunk) <= 10 for chunk in chunks)
+    assert "".join(chunks) == "x" * 100
+    assert c.returncode == 3
+
+
+def test_stream_long_lines_in_parts():
+    cmd = [sys.executable, "-c", "import sys; sys.stdout.write('x' * 100 + '\\ny')"]
+    c = stream_command(cmd, max_line_length=30)
+    lines = list(c)
+    assert lines[:-1] == ["x" * 30] * 3 + ["x" * 10 + "\n"]
+    assert lines[-1] == "y"
+    assert c.returncode == 0
+
+
+def test_stream_combines_stderr():
+    cmd = [sys.executable, "-c", "import sys; sys.stderr.write('oops\\n')"]
+    assert [line.strip() for line in stream_command(cmd)] == ["oops"]
+
+
+def test_stream_to_file_descriptor(tmpdir):
+    target = tmpdir.join("output.log")
+    cmd = [sys.executable, "-c", "print('hello')"]
+    with open(target.strpath, "wb") as fh:
+        c = stream_command(cmd, output=fh)
+        assert list(c) == []
+    assert c.returncode == 0
+    assert target.read().strip() == "hello"
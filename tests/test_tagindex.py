@@ -0,0 +1,132 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, print_function
+
+import json
+import os
+
+import pytest
+
+import mork.tagindex
+from mork.metadata import EnvironmentMetadata
+from mork.tagindex import TagIndex
+from mork.tags import get_supported_tags
+from mork.wheelhouse import Wheelhouse
+
+
+TAGS = get_supported_tags(
+    EnvironmentMetadata("/env", version="3.7.1", implementation="CPython", abiflags="m"),
+    platforms=["manylinux2010_x86_64", "manylinux1_x86_64", "linux_x86_64", "any"]
+)
+
+WHEELS = [
+    "numpy-1.15.4-cp37-cp37m-manylinux1_x86_64.whl",
+    "numpy-1.15.4-cp37-cp37m-manylinux2010_x86_64.whl",
+    "numpy-1.15.4-cp36-cp36m-manylinux1_x86_64.whl",
+    "numpy-1.15.4-cp37-cp37m-win_amd64.whl",
+    "numpy-1.14.0-cp37-cp37m-manylinux1_x86_64.whl",
+    "numpy-1.16.0-1-cp38-cp38-manylinux1_x86_64.whl",
+    "six-1.11.0-py2.py3-none-any.whl",
+    "six-1.12.0-py2-none-any.whl",
+    "Django-2.1-py3-none-any.whl",
+]
+
+
+@pytest.fixture
+def wheel_dir(tmpdir):
+    directory = tmpdir.mkdir("wheels")
+    for name in WHEELS:
+        directory.join(name).write("")
+    directory.join("README.txt").write("")
+    return directory
+
+
+def test_tag_index_interns_tags(wheel_dir):
+    index = TagIndex(persist=False)
+    records = index.load(wheel_dir.strpath)
+    assert [record.filename for record in records] == sorted(WHEELS)
+    by_filename = dict((record.filename, record) for record in records)
+    numpy = by_filename["numpy-1.15.4-cp37-cp37m-manylinux1_x86_64.whl"]
+    assert (numpy.key, numpy.version, numpy.build) == ("numpy", "1.15.4", None)
+    # Wheels built for the same tags share a tag set
+    assert numpy.tagset == by_filename["numpy-1.14.0-cp37-cp37m-manylinux1_x86_64.whl"].tagset
+    assert index.get_tags(by_filename["six-1.11.0-py2.py3-none-any.whl"].tagset) == frozenset([
+        "py2-none-any", "py3-none-any"
+    ])
+    assert by_filename["Django-2.1-py3-none-any.whl"].key == "django"
+    assert len(index.tagsets) == 8
+    assert index.load(wheel_dir.strpath) is records
+
+
+def test_tag_ranking(wheel_dir):
+    index = TagIndex(persist=False)
+    records = dict((record.filename, record) for record in index.load(wheel_dir.strpath))
+    ranking = index.rank(TAGS)
+    assert index.rank(list(TAGS)) is ranking
+
+    def rank(name):
+        return ranking.get(records[name].tagset)
+
+    assert rank("numpy-1.15.4-cp37-cp37m-manylinux2010_x86_64.whl") == 0
+    assert rank("numpy-1.15.4-cp37-cp37m-manylinux1_x86_64.whl") == 1
+    assert rank("numpy-1.15.4-cp36-cp36m-manylinux1_x86_64.whl") is None
+    assert rank("numpy-1.15.4-cp37-cp37m-win_amd64.whl") is None
+    assert rank("six-1.11.0-py2.py3-none-any.whl") == TAGS.index("py3-none-any")
+    # Tags interned after the ranking was made are ranked too
+    wheel_dir.join("lib-1.0-cp37-abi3-manylinux1_x86_64.whl").write("")
+    lib, = [r for r in index.load(wheel_dir.strpath) if r.key == "lib"]
+    assert ranking.get(lib.tagset) == TAGS.index("cp37-abi3-manylinux1_x86_64")
+
+
+def test_wheelhouse_ranking(wheel_dir):
+    wheelhouse = Wheelhouse([wheel_dir.strpath])
+    assert [os.path.basename(w.path) for w in wheelhouse.get_compatible("numpy", TAGS)] == [
+        "numpy-1.15.4-cp37-cp37m-manylinux2010_x86_64.whl",
+        "numpy-1.15.4-cp37-cp37m-manylinux1_x86_64.whl",
+        "numpy-1.14.0-cp37-cp37m-manylinux1_x86_64.whl",
+    ]
+    six, = wheelhouse.get_compatible("six", TAGS)
+    assert six.version == "1.11.0"
+    assert six.tags == frozenset(["py2-none-any", "py3-none-any"])
+
+
+def test_tag_index_persistence(wheel_dir, tmpdir, monkeypatch):
+    root = tmpdir.join("index")
+    index = TagIndex(root.strpath)
+    index.load(wheel_dir.strpath)
+    stored_path = index.get_path(wheel_dir.strpath).as_posix()
+    with open(stored_path) as fh:
+        stored = json.load(fh)
+    assert stored["directory"] == wheel_dir.strpath
+    assert len(stored["wheels"]) == len(WHEELS)
+    assert len(stored["tagsets"]) == 8
+
+    parsed = []
+    original_parse = mork.tagindex.WheelFilename.parse
+
+    def parse(filename):
+        parsed.append(filename)
+        return original_parse(filename)
+
+    monkeypatch.setattr(mork.tagindex.WheelFilename, "parse", staticmethod(parse))
+    reloaded = TagIndex(root.strpath)
+    records = reloaded.load(wheel_dir.strpath)
+    assert not parsed
+    assert sorted(r.filename for r in records) == sorted(WHEELS)
+    assert reloaded.get_tags(records[0].tagset) == index.get_tags(
+        index.load(wheel_dir.strpath)[0].tagset
+    )
+    # Only new files are parsed once the directory changes
+    wheel_dir.join("six-1.12.0-py2-none-any.whl").remove()
+    wheel_dir.join("attrs-19.1.0-py2.py3-none-any.whl").write("")
+    records = TagIndex(root.strpath).load(wheel_dir.strpath)
+    assert parsed == ["README.txt", "attrs-19.1.0-py2.py3-none-any.whl"]
+    assert "six-1.12.0-py2-none-any.whl" not in [r.filename for r in records]
+
+
+def test_virtualenv_compatible_wheels(wheel_dir, tmpdir, empty_venv):
+    venv = empty_venv
+    index = TagIndex(tmpdir.join("index").strpath)
+    wheels = venv.get_compatible_wheels("six", [wheel_dir.strpath], tag_index=index)
+    assert [w.version for w in wheels] == ["1.11.0"]
+    assert os.path.exists(index.get_path(wheel_dir.strpath).as_posix())
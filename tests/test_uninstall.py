@@ -0,0 +1,88 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, print_function
+
+import os
+
+import pytest
+import vistir
+
+from mork.uninstall import TRASH_PREFIX, Uninstaller, purge_trash
+
+
+@pytest.fixture
+def prefix(tmpdir, add_dist):
+    lib_dir = tmpdir.mkdir("site-packages")
+    tmpdir.mkdir("bin")
+    add_dist(lib_dir, "numpy", "1.15.1", [
+        "numpy/__init__.py", "numpy/core/multiarray.so", "numpy/linalg/__init__.py",
+        "../bin/f2py", "nsp/numpy_part.py",
+    ])
+    lib_dir.join("numpy", "__pycache__", "__init__.cpython-37.pyc").ensure()
+    lib_dir.join("nsp", "other_part.py").ensure()
+    add_dist(lib_dir, "six", "1.11.0", ["six.py"])
+    return tmpdir
+
+
+def contents(directory):
+    return sorted(
+        os.path.relpath(os.path.join(root, name), directory.strpath)
+        for root, dirs, files in os.walk(directory.strpath) for name in dirs + files
+        if TRASH_PREFIX not in root and not name.startswith(TRASH_PREFIX)
+    )
+
+
+def test_removal_plan(prefix):
+    lib_dir = prefix.join("site-packages")
+    uninstaller = Uninstaller.from_name("NumPy", [lib_dir.strpath])
+    plan = uninstaller.get_removal_plan()
+    assert sorted(os.path.relpath(path, lib_dir.strpath) for path in plan) == [
+        os.path.join("..", "bin", "f2py"), os.path.join("nsp", "numpy_part.py"), "numpy",
+        "numpy-1.15.1.dist-info",
+    ]
+    assert len(uninstaller.paths) == 7
+    assert Uninstaller.from_name("missing", [lib_dir.strpath]) is None
+
+
+def test_remove_and_commit(prefix):
+    lib_dir = prefix.join("site-packages")
+    uninstaller = Uninstaller.from_name("numpy", [lib_dir.strpath])
+    uninstaller.remove()
+    assert not lib_dir.join("numpy").exists()
+    assert not prefix.join("bin", "f2py").exists()
+    thread = uninstaller.commit()
+    thread.join()
+    assert contents(prefix) == [
+        "bin", "site-packages", os.path.join("site-packages", "nsp"),
+        os.path.join("site-packages", "nsp", "other_part.py"),
+        os.path.join("site-packages", "six-1.11.0.dist-info"),
+        os.path.join("site-packages", "six-1.11.0.dist-info", "METADATA"),
+        os.path.join("site-packages", "six-1.11.0.dist-info", "RECORD"),
+        os.path.join("site-packages", "six.py"),
+    ]
+    assert not [name for name in os.listdir(lib_dir.strpath) if name.startswith(TRASH_PREFIX)]
+
+
+def test_remove_and_rollback(prefix):
+    before = contents(prefix)
+    uninstaller = Uninstaller.from_name("numpy", [prefix.join("site-packages").strpath])
+    uninstaller.remove()
+    assert contents(prefix) != before
+    uninstaller.rollback()
+    assert contents(prefix) == before
+    assert not purge_trash([prefix.join("site-packages").strpath, prefix.join("bin").strpath])
+
+
+def test_virtualenv_uninstall(make_venv, add_dist):
+    venv = make_venv(thread_safe=True)
+    lib_dir = vistir.compat.Path(venv.lib_dirs[0])
+    add_dist(lib_dir.as_posix(), "six", "1.11.0", ["six.py"])
+    with pytest.raises(ValueError):
+        with venv.uninstall("six") as uninstaller:
+            assert not lib_dir.joinpath("six.py").exists()
+            raise ValueError("keep it")
+    assert lib_dir.joinpath("six.py").exists()
+    with venv.uninstall("six") as uninstaller:
+        assert uninstaller
+    assert not lib_dir.joinpath("six.py").exists()
+    assert not venv.check().checked
@@ -2,6 +2,7 @@
 
 from __future__ import absolute_import, print_function
 
+import json
 import mork
 import os
 import pytest
@@ -43,7 +44,8 @@ def test_normpath(input_path, normalized, monkeypatch):
 
 def test_get_dists(tmpvenv):
     dist_names = [dist.project_name for dist in tmpvenv.get_distributions()]
-    assert all(pkg in dist_names for pkg in ['setuptools', 'pip', 'wheel']), dist_names
+    # The test environment is seeded from ensurepip, which doesn't bundle wheel
+    assert all(pkg in dist_names for pkg in ['setuptools', 'pip']), dist_names
 
 
 def test_get_sys_path():
@@ -125,3 +127,50 @@ def test_uninstall(tmpvenv):
         uninstalled_packages.extend(uninstalled)
     assert uninstalled_packages
     assert all(pkg.project_name in uninstalled_packages for pkg in requests_deps)
+
+
+def test_run_py_isolated(tmpdir, empty_venv):
+    venv = empty_venv
+    extra_dir = tmpdir.mkdir("extra")
+    marker = tmpdir.join("marker")
+    with open(os.path.join(venv.metadata.purelib, "extra.pth"), "w") as fh:
+        fh.write("{0}\n".format(extra_dir.strpath))
+        fh.write("import os; open({0!r}, 'a').close()\n".format(marker.strpath))
+    assert extra_dir.strpath in venv.sys_path
+    marker.remove()
+    c = venv.run_py(
+        ["import json, sys; print(json.dumps([sys.prefix, 'site' in sys.modules, sys.path]))"],
+        isolated=True
+    )
+    assert c.returncode == 0, c.err
+    prefix, site_loaded, sys_path = json.loads(c.out.strip())
+    assert os.path.realpath(prefix) == os.path.realpath(venv.prefix.as_posix())
+    assert not site_loaded
+    assert extra_dir.strpath in sys_path
+    assert not marker.exists()
+
+
+def test_thread_safe_mode(make_venv):
+    from multiprocessing.pool import ThreadPool
+    venvs = [make_venv(name, thread_safe=True) for name in ("first", "second")]
+    original_environ = dict(os.environ)
+    original_path = list(sys.path)
+    original_cwd = os.getcwd()
+
+    def get_prefix(venv):
+        c = venv.run_py(["import os, sys; print(sys.prefix, os.environ['VIRTUAL_ENV'])"])
+        assert c.returncode == 0, c.err
+        return c.out.split(), venv.prefix.as_posix()
+
+    pool = ThreadPool(4)
+    try:
+        results = pool.map(get_prefix, venvs * 4)
+    finally:
+        pool.close()
+    for (sys_prefix, virtual_env), expected in results:
+        assert os.path.realpath(sys_prefix) == os.path.realpath(expected)
+        assert virtual_env == expected
+    assert all(venv.paths["headers"] for venv in venvs)
+    assert dict(os.environ) == original_environ
+    assert sys.path == original_path
+    assert os.getcwd() == original_cwd
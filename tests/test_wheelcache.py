@@ -0,0 +1,80 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, print_function
+
+import os
+import sys
+
+import mork
+
+from mork.metadata import EnvironmentMetadata
+from mork.wheelcache import WheelCache, get_interpreter_tag, hash_source_tree
+
+
+SETUP_PY = """
+from setuptools import setup
+setup(name="cachedemo", version="1.0", py_modules=["cachedemo"])
+"""
+
+
+def make_project(tmpdir):
+    project = tmpdir.mkdir("cachedemo")
+    project.join("setup.py").write(SETUP_PY)
+    project.join("cachedemo.py").write("VALUE = 1\n")
+    return project
+
+
+def test_hash_source_tree_ignores_generated_files(tmpdir):
+    project = make_project(tmpdir)
+    original = hash_source_tree(project.strpath)
+    project.join("cachedemo.egg-info", "PKG-INFO").ensure().write("Name: cachedemo")
+    project.join("build", "lib", "cachedemo.py").ensure()
+    assert hash_source_tree(project.strpath) == original
+    project.join("cachedemo.py").write("VALUE = 2\n")
+    assert hash_source_tree(project.strpath) != original
+
+
+def test_interpreter_tag():
+    metadata = EnvironmentMetadata(
+        "/venv", version="3.7.1", implementation="CPython", abiflags="m"
+    )
+    assert get_interpreter_tag(metadata).startswith("cp37m-")
+
+
+def test_wheel_cache_builds_once(tmpdir):
+    cache = WheelCache(tmpdir.join("cache").strpath)
+    calls = []
+
+    def builder(wheel_dir):
+        calls.append(wheel_dir)
+        with open(os.path.join(wheel_dir, "demo-1.0-py3-none-any.whl"), "wb") as fh:
+            fh.write(b"wheel")
+        return 0
+
+    assert cache.get("abcdef", "cp37m-linux_x86_64") is None
+    wheel = cache.get_or_build("abcdef", "cp37m-linux_x86_64", builder)
+    assert wheel.endswith("demo-1.0-py3-none-any.whl")
+    assert cache.get_or_build("abcdef", "cp37m-linux_x86_64", builder) == wheel
+    assert len(calls) == 1
+    assert cache.get("abcdef", "pp36-linux_x86_64") is None
+
+
+def test_wheel_cache_failed_build(tmpdir):
+    cache = WheelCache(tmpdir.join("cache").strpath)
+    assert cache.build("abcdef", "cp37m-linux_x86_64", lambda wheel_dir: 1) is None
+    assert cache.get("abcdef", "cp37m-linux_x86_64") is None
+    assert os.listdir(cache.get_wheel_dir("abcdef", "cp37m-linux_x86_64").parent.as_posix()) == []
+
+
+def test_virtualenv_cached_wheel(tmpdir):
+    project = make_project(tmpdir)
+    venv = mork.VirtualEnv(sys.prefix)
+    cache = WheelCache(tmpdir.join("cache").strpath)
+    wheel = venv.get_cached_wheel(
+        cache, project.strpath, project.join("setup.py").strpath
+    )
+    assert wheel is not None, "failed to build wheel"
+    assert os.path.basename(wheel).startswith("cachedemo-1.0-")
+    assert venv.get_cached_wheel(
+        cache, project.strpath, project.join("setup.py").strpath
+    ) == wheel
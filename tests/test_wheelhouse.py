@@ -0,0 +1,119 @@
+# -*- coding=utf-8 -*-
+
+from __future__ import absolute_import, print_function
+
+import os
+
+import pytest
+
+from mork.check import InstalledRequirements
+from mork.metadata import EnvironmentMetadata
+from mork.tags import WheelFilename, get_supported_tags
+from mork.wheelhouse import Wheelhouse, read_wheel_metadata
+
+
+ENVIRONMENT = {
+    "implementation_name": "cpython", "implementation_version": "3.7.1",
+    "os_name": "posix", "platform_machine": "x86_64",
+    "platform_python_implementation": "CPython", "platform_release": "",
+    "platform_system": "Linux", "platform_version": "", "python_full_version": "3.7.1",
+    "python_version": "3.7", "sys_platform": "linux",
+}
+
+TAGS = get_supported_tags(
+    EnvironmentMetadata("/env", version="3.7.1", implementation="CPython", abiflags="m"),
+    platforms=["manylinux1_x86_64", "linux_x86_64", "any"]
+)
+
+
+@pytest.fixture
+def wheelhouse(tmpdir, make_wheel):
+    make_wheel(tmpdir, "app", "1.0", requires=["lib>=1.0", "extra_dep; extra == 'fast'"])
+    make_wheel(tmpdir, "app", "2.0", requires=["lib>=1.0", "shared<2"])
+    make_wheel(tmpdir, "lib", "1.0", requires=["shared"])
+    make_wheel(tmpdir, "lib", "1.5", requires=["shared", "winonly; sys_platform == 'win32'"])
+    make_wheel(tmpdir, "lib", "3.0", requires_python=">=3.8")
+    make_wheel(tmpdir, "shared", "1.0")
+    make_wheel(tmpdir, "shared", "2.0")
+    make_wheel(tmpdir, "shared", "2.1", tag="cp38-cp38-manylinux1_x86_64")
+    make_wheel(tmpdir, "extra_dep", "0.1")
+    tmpdir.join("README.txt").write("")
+    return Wheelhouse([tmpdir.strpath])
+
+
+def test_wheel_filename():
+    wheel = WheelFilename.parse("numpy-1.15.4-1-cp37-cp37m-manylinux1_x86_64.manylinux2010_x86_64.whl")
+    assert (wheel.name, wheel.version, wheel.build) == ("numpy", "1.15.4", "1")
+    assert wheel.tags == frozenset([
+        "cp37-cp37m-manylinux1_x86_64", "cp37-cp37m-manylinux2010_x86_64"
+    ])
+    assert WheelFilename.parse("numpy-1.15.4.tar.gz") is None
+
+
+def test_supported_tags():
+    assert TAGS[:3] == [
+        "cp37-cp37m-manylinux1_x86_64", "cp37-cp37m-linux_x86_64", "cp37-abi3-manylinux1_x86_64"
+    ]
+    assert TAGS.index("cp36-abi3-linux_x86_64") < TAGS.index("py37-none-linux_x86_64")
+    assert TAGS[-3:] == ["py32-none-any", "py31-none-any", "py30-none-any"]
+    assert "cp38-cp38-manylinux1_x86_64" not in TAGS
+
+
+def test_read_wheel_metadata(wheelhouse, tmpdir):
+    headers = read_wheel_metadata(tmpdir.join("lib-3.0-py3-none-any.whl").strpath)
+    assert headers["requires-python"] == [">=3.8"]
+    assert len(wheelhouse) == 9
+
+
+def test_resolve(wheelhouse):
+    plan = wheelhouse.resolve(["app[fast]"], ENVIRONMENT, TAGS)
+    assert plan.ok, plan.problems
+    # app 2.0 needs shared<2, which is known up front after the first round
+    assert [(item.name, item.version, item.action) for item in plan.items] == [
+        ("app", "2.0", "install"), ("lib", "1.5", "install"), ("shared", "1.0", "install"),
+    ]
+    assert plan.items[2].required_by == ["app", "lib"]
+    plan = wheelhouse.resolve(["app[fast]==1.0"], ENVIRONMENT, TAGS)
+    assert [item.name for item in plan.items] == ["app", "lib", "extra-dep", "shared"]
+    assert [os.path.basename(wheel) for wheel in plan.wheels][2] == "extra_dep-0.1-py3-none-any.whl"
+
+
+def test_resolve_problems_and_installed(wheelhouse):
+    plan = wheelhouse.resolve(["lib>2"], ENVIRONMENT, TAGS)
+    assert not plan.ok
+    assert plan.problems == ["No wheel satisfies lib>2"]
+    installed = {"shared": InstalledRequirements("shared", "1.0", [])}
+    plan = wheelhouse.resolve(["lib"], ENVIRONMENT, TAGS, installed=installed)
+    assert [(i.name, i.action) for i in plan.items] == [("lib", "install"), ("shared", "keep")]
+    plan = wheelhouse.resolve(["lib"], ENVIRONMENT, TAGS, installed=installed, upgrade=True)
+    assert [(i.version, i.action, i.installed_version) for i in plan.items][1] == (
+        "2.0", "upgrade", "1.0"
+    )
+
+
+def test_resolve_broken_wheels(wheelhouse, tmpdir, make_wheel):
+    make_wheel(tmpdir, "lib", "4.0", requires_python="=>3.6")
+    make_wheel(tmpdir, "lib", "3.5", requires_python="3.6")
+    tmpdir.join("lib-3.2-py3-none-any.whl").write("partial download")
+    wheelhouse = Wheelhouse([tmpdir.strpath])
+    plan = wheelhouse.resolve(["lib"], ENVIRONMENT, TAGS)
+    assert [(item.name, item.version) for item in plan.items][0] == ("lib", "1.5")
+    assert len(plan.problems) == 1
+    assert plan.problems[0].startswith("Skipped unreadable wheel {0}".format(
+        tmpdir.join("lib-3.2-py3-none-any.whl").strpath
+    ))
+    with pytest.raises(ValueError):
+        read_wheel_metadata(tmpdir.join("lib-3.2-py3-none-any.whl").strpath)
+
+
+def test_install_plan(wheelhouse, tmpdir, empty_venv):
+    venv = empty_venv
+    plan = venv.resolve_wheelhouse(["lib==1.0", "shared<2"], [tmpdir.strpath])
+    venv.install_plan(plan)
+    assert venv.is_installed("shared")
+    plan = venv.resolve_wheelhouse(["lib", "shared"], [tmpdir.strpath], upgrade=True)
+    assert [(i.name, i.action) for i in plan.items][1] == ("shared", "upgrade")
+    venv.install_plan(plan)
+    metadata_dirs = [p for p in os.listdir(venv.lib_dirs[0]) if p.startswith("shared-")]
+    # The cp38 wheel of shared 2.1 doesn't match the interpreter of the venv
+    assert metadata_dirs == ["shared-2.0.dist-info"]